@@ -1,5 +1,8 @@
 from maya.api import OpenMaya as om2
 
+from meshKernels.profiling import profiled
+from meshKernels.rotations import METHODS, RotationSamples
+
 def maya_useNewAPI():
     pass
 
@@ -9,10 +12,16 @@ class FrameRotationInterpolatorNode(om2.MPxNode):
 
     inputRotate = None
     inputTime = None
+    sampleTimes = None
+    sampleRotations = None
+    interpolation = None
     outputRotate = None
 
     def __init__(self):
         om2.MPxNode.__init__(self)
+        # RotationSamples of the sample stream, see getSamples
+        self.samples = None
+        self.samplesRead = False
 
     @staticmethod
     def creator():
@@ -31,6 +40,20 @@ class FrameRotationInterpolatorNode(om2.MPxNode):
         FrameRotationInterpolatorNode.inputTime = uAttr.create("inputTime", "inT", om2.MFnUnitAttribute.kTime, 0.0)
         FrameRotationInterpolatorNode.addAttribute(FrameRotationInterpolatorNode.inputTime)
 
+        # Rotation sample stream: sample times and Euler rotations in degrees
+        tAttr = om2.MFnTypedAttribute()
+        FrameRotationInterpolatorNode.sampleTimes = tAttr.create("sampleTimes", "smt", om2.MFnData.kDoubleArray)
+        FrameRotationInterpolatorNode.addAttribute(FrameRotationInterpolatorNode.sampleTimes)
+        FrameRotationInterpolatorNode.sampleRotations = tAttr.create("sampleRotations", "smr", om2.MFnData.kVectorArray)
+        FrameRotationInterpolatorNode.addAttribute(FrameRotationInterpolatorNode.sampleRotations)
+
+        # Interpolation between the bracketing samples
+        eAttr = om2.MFnEnumAttribute()
+        FrameRotationInterpolatorNode.interpolation = eAttr.create("interpolation", "itp", 0)
+        for index, method in enumerate(METHODS):
+            eAttr.addField(method.capitalize(), index)
+        FrameRotationInterpolatorNode.addAttribute(FrameRotationInterpolatorNode.interpolation)
+
         # Output Rotation
         FrameRotationInterpolatorNode.outputRotate = nAttr.createPoint("outputRotate", "outR")
         nAttr.writable = False
@@ -40,33 +63,23 @@ class FrameRotationInterpolatorNode(om2.MPxNode):
         # Attribute affects
         FrameRotationInterpolatorNode.attributeAffects(FrameRotationInterpolatorNode.inputRotate, FrameRotationInterpolatorNode.outputRotate)
         FrameRotationInterpolatorNode.attributeAffects(FrameRotationInterpolatorNode.inputTime, FrameRotationInterpolatorNode.outputRotate)
+        FrameRotationInterpolatorNode.attributeAffects(FrameRotationInterpolatorNode.sampleTimes, FrameRotationInterpolatorNode.outputRotate)
+        FrameRotationInterpolatorNode.attributeAffects(FrameRotationInterpolatorNode.sampleRotations, FrameRotationInterpolatorNode.outputRotate)
+        FrameRotationInterpolatorNode.attributeAffects(FrameRotationInterpolatorNode.interpolation, FrameRotationInterpolatorNode.outputRotate)
 
+    @profiled("frameRotationInterpolatorNode.compute")
     def compute(self, plug, dataBlock):
         if plug == FrameRotationInterpolatorNode.outputRotate:
             currentTime = dataBlock.inputValue(FrameRotationInterpolatorNode.inputTime).asTime().value
-            inputRotateData = dataBlock.inputValue(FrameRotationInterpolatorNode.inputRotate).asVector()
-            
-            # Convert input Euler angles (degrees) to Quaternions for stable interpolation
-            eulerCurrent = om2.MEulerRotation([om2.MAngle(angle, om2.MAngle.kDegrees).asRadians() for angle in inputRotateData])
-            quatCurrent = eulerCurrent.asQuaternion()
-
-            # Example: Estimate or calculate the next frame's rotation
-            # In practice, this might come from another data source or estimation logic
-            # Placeholder for next frame's rotation - this should be replaced with actual logic
-            nextFrameRotateData = om2.MVector(inputRotateData.x + 1, inputRotateData.y + 1, inputRotateData.z + 1)  # Simplified example
-            eulerNext = om2.MEulerRotation([om2.MAngle(angle, om2.MAngle.kDegrees).asRadians() for angle in nextFrameRotateData])
-            quatNext = eulerNext.asQuaternion()
-
-            # Interpolate between current and next quaternion based on a factor or logic defining the interpolation amount
-            # For simplicity, using a fixed blend factor; in practice, this might be dynamic or based on specific conditions
-            blendFactor = 0.5  # Example blend factor
-            quatInterpolated = om2.MQuaternion.slerp(quatCurrent, quatNext, blendFactor)
-
-            # Convert the interpolated quaternion back to Euler angles
-            eulerInterpolated = quatInterpolated.asEulerRotation()
-            outputRotate = om2.MVector(eulerInterpolated.x * om2.MAngle.kDegreesPerRadian, 
-                                    eulerInterpolated.y * om2.MAngle.kDegreesPerRadian, 
-                                    eulerInterpolated.z * om2.MAngle.kDegreesPerRadian)
+
+            # Without samples the input rotation passes through
+            samples = self.getSamples(dataBlock)
+            if samples is None:
+                outputRotate = dataBlock.inputValue(FrameRotationInterpolatorNode.inputRotate).asVector()
+            else:
+                # Binary search for the bracketing keys and one interpolation
+                method = METHODS[dataBlock.inputValue(FrameRotationInterpolatorNode.interpolation).asShort()]
+                outputRotate = om2.MVector(*samples.rotations(currentTime, method).tolist())
 
             # Set the output value
             outputRotateData = dataBlock.outputValue(FrameRotationInterpolatorNode.outputRotate)
@@ -75,14 +88,52 @@ class FrameRotationInterpolatorNode(om2.MPxNode):
         else:
             return om2.kUnknownParameter
 
+    def setDependentsDirty(self, plug, plugArray):
+        # New samples rebuild the quaternion keys on the next evaluation
+        if plug.attribute() in (FrameRotationInterpolatorNode.sampleTimes, FrameRotationInterpolatorNode.sampleRotations):
+            self.samples = None
+            self.samplesRead = False
+        return om2.MPxNode.setDependentsDirty(self, plug, plugArray)
+
+    def getSamples(self, dataBlock):
+        """
+        Return the cached RotationSamples of the sample stream, or None when
+        there are no samples or times and rotations do not pair up.
+        """
+        if self.samplesRead:
+            return self.samples
+        self.samplesRead = True
+
+        timesData = dataBlock.inputValue(FrameRotationInterpolatorNode.sampleTimes).data()
+        rotationsData = dataBlock.inputValue(FrameRotationInterpolatorNode.sampleRotations).data()
+        if timesData.isNull() or rotationsData.isNull():
+            return None
+        times = list(om2.MFnDoubleArrayData(timesData).array())
+        rotations = [(v.x, v.y, v.z) for v in om2.MFnVectorArrayData(rotationsData).array()]
+        if not times or len(times) != len(rotations):
+            if times or rotations:
+                om2.MGlobal.displayWarning("%s: %d sample times for %d rotations" % (
+                    om2.MFnDependencyNode(self.thisMObject()).name(), len(times), len(rotations)))
+            return None
+
+        self.samples = RotationSamples(times, rotations)
+        return self.samples
+
 
 # Plugin registration
 def initializePlugin(plugin):
     pluginFn = om2.MFnPlugin(plugin)
     try:
-        pluginFn.registerNode(SlerpRotationNode.kNodeName, SlerpRotationNode.kNodeID, SlerpRotationNode.creator, SlerpRotationNode.initialize)
+        pluginFn.registerNode(FrameRotationInterpolatorNode.kNodeName, FrameRotationInterpolatorNode.kNodeID,
+                              FrameRotationInterpolatorNode.creator, FrameRotationInterpolatorNode.initialize)
     except:
-        om2.MGlobal.displayError(f"Failed to register node: {SlerpRotationNode.kNodeName}")
+        om2.MGlobal.displayError("Failed to register node: %s" % FrameRotationInterpolatorNode.kNodeName)
+        raise
 
 def uninitializePlugin(plugin):
     pluginFn = om2.MFnPlugin(plugin)
+    try:
+        pluginFn.deregisterNode(FrameRotationInterpolatorNode.kNodeID)
+    except:
+        om2.MGlobal.displayError("Failed to deregister node: %s" % FrameRotationInterpolatorNode.kNodeName)
+        raise
@@ -0,0 +1,58 @@
+#include "RollPath.h"
+
+#include <cmath>
+
+namespace
+{
+double length(const double* a, const double* b)
+{
+    double dx = b[0] - a[0];
+    double dy = b[1] - a[1];
+    double dz = b[2] - a[2];
+    return std::sqrt(dx * dx + dy * dy + dz * dz);
+}
+}
+
+void RollPath::reset(double startTime, double step)
+{
+    mStartTime = startTime;
+    mStep = step;
+    mPositions.clear();
+    mPrefix.clear();
+}
+
+long RollPath::sampleIndex(double time) const
+{
+    if (time < mStartTime) {
+        return -1;
+    }
+    return static_cast<long>(std::floor((time - mStartTime) / mStep));
+}
+
+void RollPath::append(const double position[3])
+{
+    double travelled = 0.0;
+    if (!mPrefix.empty()) {
+        travelled = mPrefix.back() + length(samplePosition(mPrefix.size() - 1), position);
+    }
+    mPositions.insert(mPositions.end(), position, position + 3);
+    mPrefix.push_back(travelled);
+}
+
+void RollPath::truncate(size_t numSamples)
+{
+    if (numSamples < mPrefix.size()) {
+        mPositions.resize(numSamples * 3);
+        mPrefix.resize(numSamples);
+    }
+}
+
+double RollPath::distance(double time, const double position[3]) const
+{
+    long index = sampleIndex(time);
+    if (index < 0 || mPrefix.empty()) {
+        return 0.0;
+    }
+    size_t sample = static_cast<size_t>(index) < mPrefix.size() ? static_cast<size_t>(index) : mPrefix.size() - 1;
+    return mPrefix[sample] + length(samplePosition(sample), position);
+}
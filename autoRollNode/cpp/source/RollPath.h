@@ -0,0 +1,52 @@
+#ifndef ROLLPATH_H
+#define ROLLPATH_H
+
+#include <cstddef>
+#include <vector>
+
+// Distance travelled along a path sampled at fixed times.
+//
+// Samples are taken at startTime + i * step, so which samples exist never
+// depends on the order frames are evaluated in. Prefix sums of the segment
+// lengths give the distance at any sample in O(1), and the distance at a time
+// between two samples is the distance at the earlier one plus the straight
+// distance from it to the position at that time. The path only grows while
+// later times are evaluated, every sample is measured once.
+class RollPath
+{
+public:
+    RollPath() : mStartTime(0.0), mStep(1.0) {}
+
+    // Drops every sample and starts a new path
+    void reset(double startTime, double step);
+
+    double startTime() const { return mStartTime; }
+    double step() const { return mStep; }
+    size_t numSamples() const { return mPrefix.size(); }
+    double sampleTime(size_t index) const { return mStartTime + static_cast<double>(index) * mStep; }
+    const double* samplePosition(size_t index) const { return &mPositions[index * 3]; }
+
+    // Index of the last sample at or before time, -1 before the start
+    long sampleIndex(double time) const;
+
+    // Number of samples evaluating time needs
+    size_t samplesFor(double time) const { return static_cast<size_t>(sampleIndex(time) + 1); }
+
+    // Appends the position of the next sample, at sampleTime(numSamples())
+    void append(const double position[3]);
+
+    // Keeps the first numSamples samples
+    void truncate(size_t numSamples);
+
+    // Distance travelled at time, where the object is at position. Needs
+    // samplesFor(time) samples, times before the start are at distance 0.
+    double distance(double time, const double position[3]) const;
+
+private:
+    double mStartTime;
+    double mStep;
+    std::vector<double> mPositions; // xyz per sample
+    std::vector<double> mPrefix;    // distance at every sample
+};
+
+#endif // ROLLPATH_H
@@ -1,51 +1,52 @@
+#include "autoRollNode.h"
+
 #include <maya/MFnNumericAttribute.h>
 #include <maya/MFnEnumAttribute.h>
 #include <maya/MFnMatrixAttribute.h>
+#include <maya/MFnMatrixData.h>
 #include <maya/MFnCompoundAttribute.h>
 #include <maya/MFnUnitAttribute.h>
-#include <maya/MFnDependencyNode.h>
 #include <maya/MTypeId.h>
 #include <maya/MMatrix.h>
 #include <maya/MVector.h>
-#include <maya/MPxNode.h>
+#include <maya/MAngle.h>
+#include <maya/MEulerRotation.h>
 #include <maya/MGlobal.h>
 #include <maya/MPlug.h>
 #include <maya/MDataBlock.h>
+#include <maya/MDGContext.h>
 #include <maya/MTime.h>
+#include <maya/MAnimMessage.h>
+#include <maya/MMessage.h>
+#include <maya/MProfiler.h>
 #include <math.h>
 
-class AutoRollNode : public MPxNode {
-public:
-    AutoRollNode() {}
-    virtual ~AutoRollNode() {}
-    static void* creator() { return new AutoRollNode(); }
-    static MStatus initialize();
-    virtual MStatus compute(const MPlug& plug, MDataBlock& data);
-
-    static MTypeId typeId;
-    static MObject distance;
-    static MObject radius;
-    static MObject speed;
-    static MObject axis;
-    static MObject direction;
-    static MObject inMatrix;
-    static MObject outMatrix;
-    static MObject outRoll;
-    static MObject outPitch;
-    static MObject outYaw;
-};
-
-MTypeId AutoRollNode::typeId(0x80005);
+MTypeId AutoRollNode::id(0x80005);
+MObject AutoRollNode::inMatrix;
+MObject AutoRollNode::time;
 MObject AutoRollNode::distance;
 MObject AutoRollNode::radius;
 MObject AutoRollNode::speed;
 MObject AutoRollNode::axis;
 MObject AutoRollNode::direction;
-MObject AutoRollNode::inMatrix;
+MObject AutoRollNode::integratePath;
+MObject AutoRollNode::startFrame;
+MObject AutoRollNode::sampleStep;
 MObject AutoRollNode::outMatrix;
+MObject AutoRollNode::outRotation;
 MObject AutoRollNode::outRoll;
 MObject AutoRollNode::outPitch;
 MObject AutoRollNode::outYaw;
+MCallbackIdArray AutoRollNode::callbackIds;
+std::atomic<unsigned int> AutoRollNode::sAnimGeneration(0);
+
+AutoRollNode::AutoRollNode() : mPathGeneration(0), mPathValid(false) {}
+
+AutoRollNode::~AutoRollNode() {}
+
+void* AutoRollNode::creator() {
+    return new AutoRollNode();
+}
 
 MStatus AutoRollNode::initialize() {
     MFnNumericAttribute nAttr;
@@ -73,52 +74,77 @@ MStatus AutoRollNode::initialize() {
     eAttr.addField("Forward", 0);
     eAttr.addField("Backward", 1);
 
+    // Create the path attributes: when integratePath is on, the distance
+    // travelled by inMatrix since startFrame, sampled every sampleStep
+    // frames, is added to the distance
+    time = uAttr.create("time", "tm", MFnUnitAttribute::kTime, 0.0);
+    integratePath = nAttr.create("integratePath", "ipth", MFnNumericData::kBoolean, false);
+    nAttr.setKeyable(true);
+    startFrame = nAttr.create("startFrame", "stf", MFnNumericData::kDouble, 1.0);
+    sampleStep = nAttr.create("sampleStep", "sst", MFnNumericData::kDouble, 1.0);
+    nAttr.setMin(0.01);
+
     // Create the output attributes
     outMatrix = mAttr.create("outMatrix", "omat");
+    mAttr.setWritable(false);
+    mAttr.setStorable(false);
     outRoll = uAttr.create("outRoll", "orol", MFnUnitAttribute::kAngle, 0.0);
     outPitch = uAttr.create("outPitch", "opit", MFnUnitAttribute::kAngle, 0.0);
-    ("outYaw", "oyaw", MFnUnitAttribute::kAngle, 0.0);
+    outYaw = uAttr.create("outYaw", "oyaw", MFnUnitAttribute::kAngle, 0.0);
 
     // Create the compound attribute for the rotation values
-    MFnDependencyNode depFn;
-    MObject rotCompound = depFn.create("rotation", "rot");
-    depFn.addAttribute(outRoll);
-    depFn.addAttribute(outPitch);
-    depFn.addAttribute(outYaw);
+    outRotation = cAttr.create("rotation", "rot");
+    cAttr.addChild(outRoll);
+    cAttr.addChild(outPitch);
+    cAttr.addChild(outYaw);
+    cAttr.setWritable(false);
+    cAttr.setStorable(false);
 
-    // Create the input and output matrix attributes
+    // Create the input matrix attribute
     inMatrix = mAttr.create("inMatrix", "imat");
     mAttr.setStorable(true);
     mAttr.setConnectable(true);
     mAttr.setKeyable(false);
     mAttr.setHidden(true);
-    addAttribute(inMatrix);
-    attributeAffects(inMatrix, outMatrix);
 
-    // Create the attribute dependencies
+    // Add the attributes to the node
+    addAttribute(inMatrix);
+    addAttribute(time);
     addAttribute(distance);
     addAttribute(radius);
     addAttribute(speed);
     addAttribute(axis);
     addAttribute(direction);
+    addAttribute(integratePath);
+    addAttribute(startFrame);
+    addAttribute(sampleStep);
     addAttribute(outMatrix);
-    attributeAffects(distance, outMatrix);
-    attributeAffects(radius, outMatrix);
-    attributeAffects(speed, outMatrix);
-    attributeAffects(axis, outMatrix);
-    attributeAffects(direction, outMatrix);
+    addAttribute(outRotation);
 
-    // Add the output attributes to the node
-    addAttribute(outMatrix);
-    addAttribute(rotCompound);
+    // Create the attribute dependencies
+    const MObject inputs[] = { inMatrix, time, distance, radius, speed, axis, direction,
+                               integratePath, startFrame, sampleStep };
+    for (const MObject& attr : inputs) {
+        attributeAffects(attr, outMatrix);
+        attributeAffects(attr, outRotation);
+    }
 
     return MS::kSuccess;
 }
 
+// Category of the node's events in the Profiler window
+static int profilerCategory() {
+    static const int category = MProfiler::addCategory("autoRoll", "autoRoll plugin calls");
+    return category;
+}
+
 MStatus AutoRollNode::compute(const MPlug& plug, MDataBlock& data) {
-    if (plug != outMatrix && plug.parent() != outMatrix && plug != outRoll && plug != outPitch && plug != outYaw) {
+    MPlug target = plug.isChild() ? plug.parent() : plug;
+    if (target != outMatrix && target != outRotation) {
         return MS::kUnknownParameter;
     }
+    MProfilingScope profilingScope(profilerCategory(), MProfiler::kColorE_L3, "compute");
+
     // Get the input data
     MMatrix matrix = data.inputValue(inMatrix).asMatrix();
     double dist = data.inputValue(distance).asDouble();
@@ -134,39 +160,109 @@ MStatus AutoRollNode::compute(const MPlug& plug, MDataBlock& data) {
         dirVec *= -1.0;
     }
 
-    // Calculate the rotation angle based on the distance travelled
+    // Add the distance travelled along the inMatrix path. Time comes in
+    // through an attribute, so every context evaluates its own frame
+    if (data.inputValue(integratePath).asBool()) {
+        double frame = data.inputValue(time).asTime().as(MTime::uiUnit());
+        double travelled = 0.0;
+        MStatus status = pathDistance(data, frame, pos, travelled);
+        CHECK_MSTATUS_AND_RETURN_IT(status);
+        dist += travelled;
+    }
+
+    // Calculate the rotation angle based on the distance travelled, like
+    // meshKernels.roll.roll_angles with wrap on
     double angle = (dist / (2 * M_PI * rad)) * 360.0;
     angle *= dirVec * MVector(1.0, 0.0, 0.0);
     angle *= spd;
     angle = fmod(angle, 360.0);
 
     // Calculate the new matrix with the rotation applied
-    MMatrix rotMatrix = MMatrix::rotation(angle * M_PI / 180.0, dirVec) * matrix;
+    MMatrix rotMatrix = MQuaternion(angle * M_PI / 180.0, dirVec).asMatrix() * matrix;
     MDataHandle outMatrixHandle = data.outputValue(outMatrix);
     outMatrixHandle.setMMatrix(rotMatrix);
+    outMatrixHandle.setClean();
 
     // Calculate the roll, pitch, and yaw values from the matrix
-    double roll, pitch, yaw;
-    MTransformationMatrix transMatrix(rotMatrix);
-    transMatrix.getRotation().getValues(roll, pitch, yaw);
-    roll *= 180.0 / M_PI;
-    pitch *= 180.0 / M_PI;
-    yaw *= 180.0 / M_PI;
-    MDataHandle outRollHandle = data.outputValue(outRoll);
-    outRollHandle.setDouble(roll);
-    MDataHandle outPitchHandle = data.outputValue(outPitch);
-    outPitchHandle.setDouble(pitch);
-    MDataHandle outYawHandle = data.outputValue(outYaw);
-    outYawHandle.setDouble(yaw);
-    
+    MEulerRotation euler = MTransformationMatrix(rotMatrix).eulerRotation();
+    MDataHandle rotationHandle = data.outputValue(outRotation);
+    rotationHandle.child(outRoll).setMAngle(MAngle(euler.x, MAngle::kRadians));
+    rotationHandle.child(outPitch).setMAngle(MAngle(euler.y, MAngle::kRadians));
+    rotationHandle.child(outYaw).setMAngle(MAngle(euler.z, MAngle::kRadians));
+    rotationHandle.setClean();
+
     // Set the output data
     data.setClean(plug);
-    
+
     return MS::kSuccess;
 }
 
-void* AutoRollNode::creator() {
-    return new AutoRollNode();
+MStatus AutoRollNode::pathDistance(MDataBlock& data, double frame, const MVector& position, double& travelled) {
+    double start = data.inputValue(startFrame).asDouble();
+    double step = data.inputValue(sampleStep).asDouble();
+    const double current[3] = { position.x, position.y, position.z };
+
+    std::lock_guard<std::mutex> lock(mPathMutex);
+
+    // Edited curves or new sampling settings invalidate the whole path
+    unsigned int generation = sAnimGeneration.load();
+    if (!mPathValid || mPathGeneration != generation || mPath.startTime() != start || mPath.step() != step) {
+        mPath.reset(start, step);
+        mPathGeneration = generation;
+        mPathValid = true;
+    }
+
+    // Upstream changes that are not curve edits (constraints, parenting,
+    // expressions) show up as a cached sample that moved
+    long index = mPath.sampleIndex(frame);
+    if (index >= 0 && static_cast<size_t>(index) < mPath.numSamples() && mPath.sampleTime(index) == frame) {
+        const double* cached = mPath.samplePosition(index);
+        if (cached[0] != current[0] || cached[1] != current[1] || cached[2] != current[2]) {
+            mPath.reset(start, step);
+        }
+    }
+
+    // Pull the missing samples up to this frame from inMatrix at their own
+    // frames, so the path is the same whichever frame was evaluated first
+    MPlug matrixPlug(thisMObject(), inMatrix);
+    const size_t needed = mPath.samplesFor(frame);
+    while (mPath.numSamples() < needed) {
+        double sampleFrame = mPath.sampleTime(mPath.numSamples());
+        if (sampleFrame == frame) {
+            mPath.append(current);
+            continue;
+        }
+        MDGContext context(MTime(sampleFrame, MTime::uiUnit()));
+        MObject matrixData;
+        MStatus status = matrixPlug.getValue(matrixData, context);
+        CHECK_MSTATUS_AND_RETURN_IT(status);
+        MMatrix sampleMatrix = MFnMatrixData(matrixData).matrix();
+        const double sample[3] = { sampleMatrix[3][0], sampleMatrix[3][1], sampleMatrix[3][2] };
+        mPath.append(sample);
+    }
+
+    travelled = mPath.distance(frame, current);
+    return MS::kSuccess;
+}
+
+MStatus AutoRollNode::connectionMade(const MPlug& plug, const MPlug& otherPlug, bool asSrc) {
+    if (plug == inMatrix) {
+        std::lock_guard<std::mutex> lock(mPathMutex);
+        mPathValid = false;
+    }
+    return MPxNode::connectionMade(plug, otherPlug, asSrc);
+}
+
+MStatus AutoRollNode::connectionBroken(const MPlug& plug, const MPlug& otherPlug, bool asSrc) {
+    if (plug == inMatrix) {
+        std::lock_guard<std::mutex> lock(mPathMutex);
+        mPathValid = false;
+    }
+    return MPxNode::connectionBroken(plug, otherPlug, asSrc);
+}
+
+void AutoRollNode::animCurveEdited(MObjectArray& editedCurves, void* clientData) {
+    ++sAnimGeneration;
 }
 
 MStatus initializePlugin(MObject obj) {
@@ -177,11 +273,20 @@ MStatus initializePlugin(MObject obj) {
         return status;
     }
 
+    AutoRollNode::callbackIds.append(MAnimMessage::addAnimCurveEditedCallback(AutoRollNode::animCurveEdited, nullptr, &status));
+    if (!status) {
+        status.perror("addAnimCurveEditedCallback");
+        return status;
+    }
+
     return MS::kSuccess;
 }
 
 MStatus uninitializePlugin(MObject obj) {
     MFnPlugin plugin(obj);
+    MMessage::removeCallbacks(AutoRollNode::callbackIds);
+    AutoRollNode::callbackIds.clear();
+
     MStatus status = plugin.deregisterNode(AutoRollNode::id);
     if (!status) {
         status.perror("deregisterNode");
@@ -190,6 +295,3 @@ MStatus uninitializePlugin(MObject obj) {
 
     return MS::kSuccess;
 }
-
-
-
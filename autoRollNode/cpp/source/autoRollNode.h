@@ -13,6 +13,13 @@
 #include <maya/MVector.h>
 #include <maya/MQuaternion.h>
 #include <maya/MTransformationMatrix.h>
+#include <maya/MCallbackIdArray.h>
+#include <maya/MObjectArray.h>
+
+#include <atomic>
+#include <mutex>
+
+#include "RollPath.h"
 
 class AutoRollNode : public MPxNode {
 public:
@@ -22,18 +29,46 @@ public:
     static void* creator();
     static MStatus initialize();
 
+    // Drop the travelled path when inMatrix is connected to something else
+    virtual MStatus connectionMade(const MPlug& plug, const MPlug& otherPlug, bool asSrc);
+    virtual MStatus connectionBroken(const MPlug& plug, const MPlug& otherPlug, bool asSrc);
+
+    // Every node rebuilds its path after an animation curve was edited
+    static void animCurveEdited(MObjectArray& editedCurves, void* clientData);
+    static MCallbackIdArray callbackIds;
+
 public:
     static MTypeId id;
     static MObject inMatrix;
+    static MObject time;
     static MObject distance;
     static MObject radius;
     static MObject speed;
     static MObject axis;
     static MObject direction;
+    static MObject integratePath;
+    static MObject startFrame;
+    static MObject sampleStep;
     static MObject outMatrix;
+    static MObject outRotation;
     static MObject outRoll;
     static MObject outPitch;
     static MObject outYaw;
+
+private:
+    // Distance travelled along the inMatrix path at frame, where the wheel is
+    // at position
+    MStatus pathDistance(MDataBlock& data, double frame, const MVector& position, double& travelled);
+
+    // Generation of the animation curves, bumped by animCurveEdited
+    static std::atomic<unsigned int> sAnimGeneration;
+
+    // The path is shared by every context the node is evaluated in, so the
+    // samples are guarded and always taken at the same frames
+    std::mutex mPathMutex;
+    RollPath mPath;
+    unsigned int mPathGeneration;
+    bool mPathValid;
 };
 
 #endif // AUTOROLLNODE_H
@@ -1,5 +1,8 @@
-import math
 import maya.api.OpenMaya as om
+import numpy as np
+
+from meshKernels.profiling import profiled
+from meshKernels.roll import roll_angles
 
 # Define the autoRoll MPxNode class
 class AutoRollNode(om.MPxNode):
@@ -16,6 +19,7 @@ class AutoRollNode(om.MPxNode):
         super(AutoRollNode, self).__init__()
 
     # Compute function for evaluating the node
+    @profiled("autoRoll.compute")
     def compute(self, plug, dataBlock):
         if plug == AutoRollNode.outRotation:
             timeData = dataBlock.inputValue(AutoRollNode.inTime)
@@ -24,13 +28,12 @@ class AutoRollNode(om.MPxNode):
             rotationData = dataBlock.outputValue(AutoRollNode.outRotation)
 
             # Get the input values
-            time = timeData.asTime().value()
+            time = timeData.asTime().value
             speed = speedData.asDouble()
             radius = radiusData.asDouble()
 
-            # Calculate the rotation
-            rotation = (speed * time) / radius
-            rotation = math.degrees(rotation)
+            # Calculate the rotation with the kernel the bake scripts use
+            rotation = float(roll_angles(time, speed, radius))
 
             # Set the output value
             rotationData.setDouble(rotation)
@@ -42,6 +45,37 @@ class AutoRollNode(om.MPxNode):
 
         return om.kUnknownParameter
 
+def bakeAutoRolls(nodes, times):
+    """
+    Rotation of every autoRoll node in ``nodes`` at every time of ``times``
+    (in the current time unit), as a (len(times), len(nodes)) array computed
+    in one call instead of one compute per node and frame.
+
+    Speed and radius are read once per node, or once per frame when they are
+    driven by a connection.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    speeds = np.empty((len(times), len(nodes)))
+    radii = np.empty((len(times), len(nodes)))
+    contexts = None
+
+    selection = om.MSelectionList()
+    for node in nodes:
+        selection.add(node)
+    for column in range(len(nodes)):
+        fnNode = om.MFnDependencyNode(selection.getDependNode(column))
+        for values, name in ((speeds, "speed"), (radii, "radius")):
+            plug = fnNode.findPlug(name, False)
+            if not plug.isDestination:
+                values[:, column] = plug.asDouble()
+                continue
+            if contexts is None:
+                unit = om.MTime.uiUnit()
+                contexts = [om.MDGContext(om.MTime(time, unit)) for time in times.tolist()]
+            values[:, column] = [plug.asDouble(context) for context in contexts]
+
+    return roll_angles(times[:, None], speeds, radii)
+
 # Creator function to create an instance of the node
 def nodeCreator():
     return AutoRollNode()
@@ -49,8 +83,9 @@ def nodeCreator():
 # Initialize function to register the node
 def initialize():
     nAttr = om.MFnNumericAttribute()
+    uAttr = om.MFnUnitAttribute()
 
-    AutoRollNode.inTime = om.MTime()
+    AutoRollNode.inTime = uAttr.create("time", "tm", om.MFnUnitAttribute.kTime, 0.0)
     AutoRollNode.inSpeed = nAttr.create("speed", "spd", om.MFnNumericData.kDouble, 0.0)
     AutoRollNode.inRadius = nAttr.create("radius", "rad", om.MFnNumericData.kDouble, 1.0)
 
@@ -0,0 +1,11 @@
+"""
+Maya-free benchmarks for the kernels in ``meshKernels``.
+
+Run a benchmark from the repository root, for example::
+
+    python -m benchmarks.bench_reduce
+
+``benchmarks.suite`` runs every plugin's hot path over mesh sizes from 1k to
+2M vertices and records the results to JSON, to compare against an earlier
+run.
+"""
@@ -0,0 +1,102 @@
+"""
+Collider closest point queries: ``TriangleBVH`` against brute force.
+
+Queries are scattered in a shell around a sphere collider, the way cloth
+points sit around a body. Brute force measures every query against every
+triangle, in chunks so it stays vectorized.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks import meshes
+from meshKernels.bvh import TriangleBVH, closest_points_on_triangles
+from meshKernels.topology import triangulate
+
+
+def brute_force(points, triangles, queries, pair_budget=4000000):
+    """Nearest point over all triangles, for every query."""
+    a, b, c = (points[triangles[:, i]] for i in range(3))
+    result = np.empty(len(queries))
+    step = max(1, pair_budget // len(triangles))
+    for start in range(0, len(queries), step):
+        chunk = queries[start:start + step]
+        rows = np.repeat(chunk, len(triangles), axis=0)
+        closest = closest_points_on_triangles(rows, np.tile(a, (len(chunk), 1)), np.tile(b, (len(chunk), 1)), np.tile(c, (len(chunk), 1)))
+        distances = np.linalg.norm(rows - closest, axis=1).reshape(len(chunk), -1)
+        result[start:start + step] = distances.min(axis=1)
+    return result
+
+
+def shell_queries(count, thickness, seed=0):
+    rng = np.random.RandomState(seed)
+    directions = rng.normal(size=(count, 3))
+    directions /= np.linalg.norm(directions, axis=1)[:, None]
+    return directions * rng.uniform(1.0 - thickness, 1.0 + thickness, (count, 1))
+
+
+def run(label, mesh, queries, brute_queries):
+    points, counts, connects = mesh
+    triangles = triangulate(counts, connects)
+
+    start = time.perf_counter()
+    bvh = TriangleBVH(points, triangles)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bvh.refit(points * 1.01)
+    refit_time = time.perf_counter() - start
+    bvh.refit(points)
+
+    start = time.perf_counter()
+    _, _, distances = bvh.closest_points(queries)
+    bvh_rate = len(queries) / (time.perf_counter() - start)
+
+    line = "%-16s tris=%8d  build %6.3fs  refit %6.3fs  bvh %9.0f q/s" % (
+        label, len(triangles), build_time, refit_time, bvh_rate)
+
+    if brute_queries:
+        sample = queries[:brute_queries]
+        start = time.perf_counter()
+        expected = brute_force(points, triangles, sample)
+        brute_rate = len(sample) / (time.perf_counter() - start)
+        error = np.abs(expected - distances[:len(sample)]).max()
+        line += "  brute %8.0f q/s  speedup x%.0f  max error %.1e" % (brute_rate, bvh_rate / brute_rate, error)
+        line += "  refit error %.1e" % check_refit(bvh, points, triangles, sample)
+    print(line)
+
+
+def check_refit(bvh, points, triangles, queries, seed=0):
+    """
+    Refit to randomly moved collider points, where seed bounds can tie with
+    box distances, and check every query still finds its brute force
+    nearest triangle. Returns the largest distance error.
+    """
+    moved = points + np.random.RandomState(seed).normal(scale=0.05, size=points.shape)
+    bvh.refit(moved)
+    _, found, distances = bvh.closest_points(queries)
+    bvh.refit(points)
+    assert (found >= 0).all(), "%d queries lost their triangle after refit" % (found < 0).sum()
+    error = np.abs(brute_force(moved, triangles, queries) - distances).max()
+    assert error < 1e-9, error
+    return error
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-q", "--queries", type=int, default=100000)
+    parser.add_argument("--thickness", type=float, default=0.05,
+                        help="half width of the query shell around the unit sphere")
+    parser.add_argument("--brute-queries", type=int, default=200,
+                        help="queries timed for brute force (0 to skip)")
+    args = parser.parse_args()
+
+    queries = shell_queries(args.queries, args.thickness)
+    for rings, segments in ((32, 64), (128, 256), (512, 1024)):
+        label = "sphere %dx%d" % (rings, segments)
+        run(label, meshes.uv_sphere(rings, segments), queries, args.brute_queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Batch deform kernels against the per-point loops of the Python deformers.
+
+The loops reproduce what ``deform`` does for every point of an
+``MItGeometry`` (one position read, the math, one write) on plain Python
+tuples, so the numbers are a lower bound of the per-point cost inside Maya.
+
+The WrinkleDeformer node runs its batch ``deform`` against
+``benchmarks.maya_stub``, so its time adds the MPointArray conversions and
+the data block reads to the compression and wrinkle kernels. ``convert``
+times those conversions alone, one read and one write of every point, the
+same helpers the collision deformer uses. The stub builds its point arrays
+in Python, so both are an upper bound of the conversion cost inside Maya.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from benchmarks import maya_stub as om
+from benchmarks import meshes
+from meshKernels.compression import RestState
+from meshKernels.deform import feather_deform, wrinkle_deform
+
+
+def feather_loop(points, matrix, weights, envelope):
+    m = matrix.reshape(4, 4).tolist()
+    result = []
+    for (x, y, z), w in zip(points.tolist(), weights.tolist()):
+        tx = x * m[0][0] + y * m[1][0] + z * m[2][0] + m[3][0]
+        ty = x * m[0][1] + y * m[1][1] + z * m[2][1] + m[3][1]
+        tz = x * m[0][2] + y * m[1][2] + z * m[2][2] + m[3][2]
+        scale = w * envelope
+        result.append((x + (tx - x) * scale, y + (ty - y) * scale, z + (tz - z) * scale))
+    return result
+
+
+def wrinkle_loop(points, compression, intensity, weights, envelope):
+    result = []
+    for (x, y, z), c, w in zip(points.tolist(), compression.tolist(), weights.tolist()):
+        if c > 0:
+            y += c * intensity * envelope * w
+        result.append((x, y, z))
+    return result
+
+
+def wrinkle_node(points, counts, connects):
+    """A WrinkleDeformer and the data block of one whole-mesh batch evaluation."""
+    module = om.load_plugin(os.path.join("wrinkleDeformer", "py", "wrinkle_deformer.py"), "wrinkle_deformer")
+    Node = module.WrinkleDeformer
+    Node.initialize()
+    block = om.MDataBlock({
+        Node.intensityAttr: 0.5,
+        Node.envelope: 0.8,
+        Node.input: {0: {Node.inputGeom: om.MObject((points, counts, connects))}},
+        Node.restMeshAttr: om.MObject(),
+        Node.batchAttr: True,
+        Node.cacheAttr: False,
+    })
+    return Node(), block
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def run(label, mesh, repeats):
+    points, counts, connects = mesh
+    rng = np.random.RandomState(0)
+    weights = rng.uniform(0.0, 1.0, len(points))
+    matrix = np.eye(4)
+    matrix[3, :3] = (0.1, 0.2, 0.3)
+
+    rest = RestState(points, counts, connects)
+    squashed = points * (1.0, 1.0, 0.9)
+    compression = rest.compression(squashed)
+
+    node, block = wrinkle_node(points, counts, connects)
+    iterator = om.MItGeometry(squashed)
+
+    cases = [
+        ("feather", lambda: feather_deform(points, matrix, weights, 0.8),
+         lambda: feather_loop(points, matrix, weights, 0.8)),
+        ("wrinkle", lambda: wrinkle_deform(squashed, compression, 0.5, weights, 0.8),
+         lambda: wrinkle_loop(squashed, compression, 0.5, weights, 0.8)),
+        ("compression", lambda: rest.compression(squashed), None),
+        ("wrinkle node", lambda: node.deform(block, iterator, None, 0), None),
+        ("convert", lambda: node.toPointArray(node.toArray(iterator.allPositions())), None),
+    ]
+    for name, batch, loop in cases:
+        batch_time = min(timed(batch) for _ in range(repeats))
+        line = "%-14s %-12s verts=%8d  batch %8.2f ms (%7.0f fps)" % (
+            label, name, len(points), batch_time * 1e3, 1.0 / batch_time)
+        if loop is not None:
+            loop_time = timed(loop)
+            line += "  loop %8.2f ms  speedup x%.0f" % (loop_time * 1e3, loop_time / batch_time)
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    for vertices in (10000, 100000, 1000000):
+        run("grid %d" % vertices, meshes.grid_for_vertex_count(vertices), args.repeats)
+
+
+if __name__ == "__main__":
+    main()
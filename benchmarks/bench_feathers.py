@@ -0,0 +1,86 @@
+"""
+Instanced feather transforms against one feather deformer per feather.
+
+A grid is split into feather cards of a fixed size, each with its own random
+matrix. The per-feather side runs ``feather_deform`` once per card on its own
+points, the way a rig with one node per feather evaluates, and the instanced
+side moves every card in one call with a cached ``FeatherGroups``.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks import meshes
+from meshKernels import feathers
+from meshKernels.deform import feather_deform
+from meshKernels.feathers import FeatherGroups, feather_instances_deform
+
+
+def per_feather(points, matrices, feather_ids, weights, envelope):
+    result = points.copy()
+    for feather, matrix in enumerate(matrices):
+        card = np.flatnonzero(feather_ids == feather)
+        result[card] = feather_deform(points[card], matrix, weights[card], envelope)
+    return result
+
+
+def timed(function, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(label, mesh, card_size, repeats):
+    points = mesh[0]
+    rng = np.random.RandomState(0)
+    feather_ids = np.arange(len(points)) // card_size
+    num_feathers = int(feather_ids[-1]) + 1
+    matrices = np.tile(np.eye(4), (num_feathers, 1, 1))
+    matrices[:, :3, :3] += rng.uniform(-0.1, 0.1, (num_feathers, 3, 3))
+    matrices[:, 3, :3] = rng.uniform(-1.0, 1.0, (num_feathers, 3))
+    weights = rng.uniform(0.0, 1.0, len(points))
+
+    start = time.perf_counter()
+    groups = FeatherGroups(feather_ids)
+    build_time = time.perf_counter() - start
+
+    instanced_time, result = timed(lambda: feather_instances_deform(points, matrices, groups, weights, 0.8), repeats)
+    line = "%-14s feathers=%7d  groups %7.2f ms  instanced %8.2f ms" % (
+        label, num_feathers, build_time * 1e3, instanced_time * 1e3)
+
+    # the same call with the strategy forced to the other side of SLICE_POINTS
+    default = feathers.SLICE_POINTS
+    feathers.SLICE_POINTS = 1 if len(points) < num_feathers * default else len(points) + 1
+    try:
+        other_time, other = timed(lambda: feather_instances_deform(points, matrices, groups, weights, 0.8), repeats)
+    finally:
+        feathers.SLICE_POINTS = default
+    assert np.allclose(other, result, rtol=0.0, atol=1e-12)
+    line += "  (%s %8.2f ms)" % ("slices" if len(points) < num_feathers * default else "gather", other_time * 1e3)
+
+    if num_feathers <= 20000:
+        loop_time, expected = timed(lambda: per_feather(points, matrices, feather_ids, weights, 0.8), 1)
+        assert np.allclose(result, expected, rtol=0.0, atol=1e-12)
+        line += "  per feather %9.2f ms  speedup x%.0f" % (loop_time * 1e3, loop_time / instanced_time)
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-s", "--card-sizes", type=int, nargs="+", default=[2000, 200, 20],
+                        help="points per feather card")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    for vertices in (100000, 1000000):
+        mesh = meshes.grid_for_vertex_count(vertices)
+        for card_size in args.card_sizes:
+            run("grid %d" % vertices, mesh, card_size, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Changing the vertex budget of a progressive mesh against reducing again.
+
+The record is the full collapse sequence of one reduction. Every step moves
+the progressive mesh to a new budget and extracts the mesh, while the
+reduction side starts over from the original mesh for the same budget.
+"""
+import argparse
+import time
+
+from benchmarks import meshes
+from meshKernels.edge_collapse import EdgeCollapseReducer, QuadricReducer
+from meshKernels.progressive import ProgressiveMesh
+
+REDUCERS = {
+    "length": EdgeCollapseReducer,
+    "quadric": QuadricReducer,
+}
+
+
+def run(label, mesh, percentages, reducer_class):
+    points, counts, connects = mesh
+
+    start = time.perf_counter()
+    reducer = reducer_class(points, counts, connects)
+    reducer.reduce(0)
+    record = ProgressiveMesh.from_reducer(reducer, points, counts, connects)
+    record_time = time.perf_counter() - start
+    print("%-16s verts=%8d  record: %d collapses %.3fs" % (label, len(points), record.num_collapses, record_time))
+
+    for percentage in percentages:
+        target = int(len(points) * percentage / 100.0)
+        start = time.perf_counter()
+        record.set_vertex_count(target)
+        record.result()
+        switch_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reducer = reducer_class(points, counts, connects)
+        reducer.reduce(target)
+        reducer.result()
+        reduce_time = time.perf_counter() - start
+        print("    -> %5.1f%%  switch %8.4fs  reduce %8.3fs  speedup x%.0f" % (
+            percentage, switch_time, reduce_time, reduce_time / switch_time,
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-m", "--metric", choices=sorted(REDUCERS), default="length")
+    parser.add_argument("-p", "--percentages", type=float, nargs="+", default=[50, 10, 45, 75],
+                        help="vertex percentages visited in order")
+    args = parser.parse_args()
+
+    for label, mesh in (
+        ("grid 64x64", meshes.grid(64, noise=0.01)),
+        ("sphere 128x256", meshes.uv_sphere(128, 256)),
+    ):
+        run(label, mesh, args.percentages, REDUCERS[args.metric])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Batched quadric kernels against the per-item loops in ``generateProxyModel``.
+
+``loop_quadrics`` mirrors the old ``ProxyModelCmd.reduce_mesh`` setup: one 4x4
+``np.zeros`` per vertex and one ``calculate_plane``/``calculate_quadric`` call
+per face-vertex. ``loop_collapse_costs`` mirrors the old
+``calculate_collapse_cost``: one ``np.linalg.solve`` per edge with a
+``try/except`` midpoint fallback.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks import meshes
+from meshKernels import quadrics as qem
+from meshKernels.topology import unique_edges
+
+
+def calculate_plane(p1, p2, p3):
+    normal = np.cross(p2 - p1, p3 - p1)
+    normal = normal / np.linalg.norm(normal)
+    d = -(normal[0] * p1[0] + normal[1] * p1[1] + normal[2] * p1[2])
+    return normal[0], normal[1], normal[2], d
+
+
+def calculate_quadric(plane):
+    a, b, c, d = plane
+    return np.array([
+        [a * a, a * b, a * c, a * d],
+        [a * b, b * b, b * c, b * d],
+        [a * c, b * c, c * c, c * d],
+        [a * d, b * d, c * d, d * d]
+    ])
+
+
+def loop_quadrics(points, counts, connects):
+    quadrics = [np.zeros((4, 4)) for _ in range(len(points))]
+    offset = 0
+    for count in counts.tolist():
+        verts = connects[offset:offset + count].tolist()
+        plane = calculate_plane(points[verts[0]], points[verts[1]], points[verts[2]])
+        for vert in verts:
+            quadrics[vert] += calculate_quadric(plane)
+        offset += count
+    return quadrics
+
+
+def loop_collapse_costs(quadrics, points, edges):
+    costs = []
+    for v1, v2 in edges.tolist():
+        q = quadrics[v1] + quadrics[v2]
+        try:
+            pos = np.linalg.solve(q[:3, :3], -q[:3, 3])
+        except np.linalg.LinAlgError:
+            pos = (points[v1] + points[v2]) * 0.5
+        costs.append(np.dot(np.dot(pos, q[:3, :3]), pos) + 2 * np.dot(q[:3, 3], pos) + q[3, 3])
+    return costs
+
+
+def run(label, mesh, check):
+    points, counts, connects = mesh
+
+    start = time.perf_counter()
+    batched = qem.vertex_quadrics(points, counts, connects)
+    batched_time = time.perf_counter() - start
+    line = "%-16s faces=%8d  batched %8.4fs" % (label, len(counts), batched_time)
+
+    if check:
+        start = time.perf_counter()
+        looped = loop_quadrics(points, counts, connects)
+        loop_time = time.perf_counter() - start
+        error = np.abs(qem.unpack(batched) - np.array(looped)).max()
+        line += "  loop %8.3fs  speedup x%.0f  max error %.2e" % (
+            loop_time, loop_time / batched_time, error,
+        )
+    print(line)
+
+    edges = unique_edges(counts, connects)
+    start = time.perf_counter()
+    costs, _ = qem.optimal_collapse(batched[edges[:, 0]] + batched[edges[:, 1]], points[edges[:, 0]], points[edges[:, 1]])
+    solve_time = time.perf_counter() - start
+    line = "%-16s edges=%8d  solve   %8.4fs" % ("", len(edges), solve_time)
+
+    if check:
+        start = time.perf_counter()
+        looped = loop_collapse_costs(qem.unpack(batched), points, edges)
+        loop_time = time.perf_counter() - start
+        error = np.abs(costs - np.maximum(looped, 0.0)).max()
+        line += "  loop %8.3fs  speedup x%.0f  max error %.2e" % (
+            loop_time, loop_time / solve_time, error,
+        )
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--loop-limit", type=int, default=150000,
+                        help="largest face count the per-face loop is timed on")
+    args = parser.parse_args()
+
+    cases = [
+        ("grid 64", meshes.grid(64, triangulate=True, noise=0.01)),
+        ("grid 256", meshes.grid(256, triangulate=True, noise=0.01)),
+        ("grid 512", meshes.grid(512, triangulate=True, noise=0.01)),
+        ("sphere 256x512", meshes.uv_sphere(256, 512)),
+    ]
+    for label, mesh in cases:
+        run(label, mesh, len(mesh[1]) <= args.loop_limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Heap-based edge collapse against the original ``reduceCmd`` loop.
+
+The original loop recomputes every edge cost and scans for the minimum after
+each collapse. ``naive_reduce`` reproduces that on top of the same mesh
+bookkeeping so both sides do identical collapses and only the cost
+maintenance differs.
+"""
+import argparse
+import time
+
+from benchmarks import meshes
+from meshKernels.edge_collapse import EdgeCollapseReducer, QuadricReducer
+
+REDUCERS = {
+    "length": EdgeCollapseReducer,
+    "quadric": QuadricReducer,
+}
+
+
+def naive_reduce(reducer, collapses):
+    """Collapse ``collapses`` edges, recomputing all costs every iteration."""
+    for _ in range(collapses):
+        best = None
+        for u in range(len(reducer.points)):
+            if not reducer.alive[u]:
+                continue
+            for v in reducer.neighbours[u]:
+                if u < v and reducer.can_collapse(u, v):
+                    costs, positions = reducer.evaluate([u], [v])
+                    if best is None or costs[0] < best[0]:
+                        best = (costs[0], u, v, positions[0])
+        if best is None:
+            break
+        reducer.collapse(best[1], best[2], best[3])
+
+
+def run(label, mesh, percentage, naive_collapses, reducer_class=EdgeCollapseReducer):
+    points, counts, connects = mesh
+
+    start = time.perf_counter()
+    reducer = reducer_class(points, counts, connects)
+    target = int(len(points) * (1 - percentage / 100.0))
+    reducer.reduce(target)
+    heap_time = time.perf_counter() - start
+    heap_rate = reducer.collapse_count / heap_time if heap_time else float("inf")
+
+    line = "%-18s verts=%8d  heap: %7d collapses %8.3fs (%9.0f/s)" % (
+        label, len(points), reducer.collapse_count, heap_time, heap_rate,
+    )
+
+    if naive_collapses:
+        reducer = reducer_class(points, counts, connects)
+        start = time.perf_counter()
+        naive_reduce(reducer, naive_collapses)
+        naive_time = time.perf_counter() - start
+        naive_rate = reducer.collapse_count / naive_time if naive_time else float("inf")
+        line += "  naive: %9.1f/s  speedup x%.0f" % (naive_rate, heap_rate / naive_rate)
+
+    print(line)
+
+
+def run_lods(label, mesh, lods, reducer_class=EdgeCollapseReducer):
+    """One ``reduce_levels`` pass against a fresh reduction per level."""
+    points, counts, connects = mesh
+    targets = [int(len(points) * lod / 100.0) for lod in lods]
+
+    start = time.perf_counter()
+    reducer_class(points, counts, connects).reduce_levels(targets)
+    chain_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for target in targets:
+        reducer_class(points, counts, connects).reduce(target)
+    separate_time = time.perf_counter() - start
+
+    print("%-18s verts=%8d  lods %s: one pass %8.3fs  separate %8.3fs  speedup x%.1f" % (
+        label, len(points), "/".join("%g" % lod for lod in lods), chain_time, separate_time,
+        separate_time / chain_time,
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-p", "--percentage", type=float, default=50.0)
+    parser.add_argument("-m", "--metric", choices=sorted(REDUCERS), default="length")
+    parser.add_argument("--naive-collapses", type=int, default=20,
+                        help="collapses timed for the naive loop (0 to skip)")
+    parser.add_argument("--lods", type=float, nargs="+",
+                        help="time an LOD chain keeping these vertex percentages instead")
+    args = parser.parse_args()
+
+    cases = [
+        ("grid 32x32", meshes.grid(32, noise=0.01)),
+        ("grid 128x128", meshes.grid(128, noise=0.01)),
+        ("grid 256x256", meshes.grid(256, noise=0.01)),
+        ("sphere 64x128", meshes.uv_sphere(64, 128)),
+        ("sphere 256x512", meshes.uv_sphere(256, 512)),
+    ]
+    for label, mesh in cases:
+        if args.lods:
+            run_lods(label, mesh, args.lods, REDUCERS[args.metric])
+            continue
+        # the naive loop is O(V*E), keep it to the small meshes
+        naive = args.naive_collapses if len(mesh[0]) <= 20000 else 0
+        run(label, mesh, args.percentage, naive, REDUCERS[args.metric])
+
+
+if __name__ == "__main__":
+    main()
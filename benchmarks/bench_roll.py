@@ -0,0 +1,114 @@
+"""
+Batched autoRoll evaluation against one compute per wheel and frame.
+
+The loop reproduces what ``AutoRollNode.compute`` does for a single plug on
+plain Python floats, for every wheel on every frame of a bake. The batched
+side evaluates the whole (frames, wheels) table with one ``roll_angles`` call,
+once for the time driven node and once with the wheel matrices of the C++
+node.
+
+The path part evaluates random sub-frame times of a long shot, integrating
+the travelled distance from the first frame for every query against one
+``PathDistances`` lookup, and checks that shuffled queries give exactly the
+results of sequential playback.
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+from meshKernels.roll import PathDistances, roll_angles
+
+
+def loop_rolls(times, speeds, radii):
+    return [[math.degrees(speed * t / radius) for speed, radius in zip(speeds, radii)] for t in times]
+
+
+def timed(function, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(num_wheels, num_frames, repeats):
+    rng = np.random.RandomState(0)
+    times = np.arange(num_frames, dtype=np.float64)
+    speeds = rng.uniform(0.5, 2.0, num_wheels)
+    radii = rng.uniform(0.3, 1.0, num_wheels)
+    # one wheel matrix per frame and wheel, turning about Y over the shot
+    heading = rng.uniform(0.0, 2.0 * np.pi, num_wheels) + times[:, None] * 0.01
+    matrices = np.zeros((num_frames, num_wheels, 4, 4))
+    matrices[..., 0, 0] = np.cos(heading)
+    matrices[..., 0, 2] = -np.sin(heading)
+    matrices[..., 1, 1] = 1.0
+    matrices[..., 2, 0] = np.sin(heading)
+    matrices[..., 2, 2] = np.cos(heading)
+    matrices[..., 3, 3] = 1.0
+
+    batch_time, batch = timed(lambda: roll_angles(times[:, None], speeds, radii), repeats)
+    matrix_time, _ = timed(lambda: roll_angles(times[:, None], speeds, radii, matrices, wrap=True), repeats)
+    loop_time, loop = timed(lambda: loop_rolls(times.tolist(), speeds.tolist(), radii.tolist()), 1)
+    assert np.allclose(batch, loop, rtol=1e-12, atol=0.0)
+    evaluations = num_wheels * num_frames
+    print("wheels=%5d frames=%6d  batch %8.2f ms (%6.1f M/s)  with matrices %8.2f ms  loop %9.2f ms  speedup x%.0f" % (
+        num_wheels, num_frames, batch_time * 1e3, evaluations / batch_time / 1e6, matrix_time * 1e3,
+        loop_time * 1e3, loop_time / batch_time,
+    ))
+
+
+def wheel_path(times):
+    """Position of a wheel driving a wavy road."""
+    return np.stack([np.sin(times * 0.05) * 10.0, np.zeros_like(times), times * 0.5], axis=-1)
+
+
+def integrate_from_start(start, step, time):
+    """Distance at ``time``, sampling the path from the first frame, like an uncached node."""
+    samples = wheel_path(start + np.arange(int(np.floor((time - start) / step)) + 1) * step)
+    travelled = np.sum(np.sqrt(np.sum(np.diff(samples, axis=0) ** 2, axis=1)))
+    return travelled + np.sqrt(np.sum((wheel_path(np.array(time)) - samples[-1]) ** 2))
+
+
+def run_path(num_frames, num_queries, repeats):
+    rng = np.random.RandomState(0)
+    queries = rng.uniform(1.0, num_frames, num_queries)
+    positions = wheel_path(queries)
+
+    start = time.perf_counter()
+    path = PathDistances.uniform(1.0, 1.0, wheel_path(1.0 + np.arange(num_frames)))
+    build_time = time.perf_counter() - start
+    lookup_time, distances = timed(lambda: path.distances(queries, positions), repeats)
+
+    order = rng.permutation(num_queries)
+    shuffled = np.empty(num_queries)
+    shuffled[order] = path.distances(queries[order], positions[order])
+    sequential = np.array([path.distances(query, position) for query, position in zip(queries, positions)])
+    assert np.array_equal(shuffled, distances) and np.array_equal(sequential, distances)
+
+    loop_queries = min(num_queries, 200)
+    loop_time, expected = timed(lambda: [integrate_from_start(1.0, 1.0, query) for query in queries[:loop_queries]], 1)
+    assert np.allclose(distances[:loop_queries], expected, rtol=1e-9, atol=0.0)
+    loop_time *= num_queries / float(loop_queries)
+    print("path frames=%6d queries=%6d  prefix sums %7.2f ms  lookups %8.2f ms  "
+          "from frame zero %9.1f ms  speedup x%.0f" % (
+              num_frames, num_queries, build_time * 1e3, lookup_time * 1e3, loop_time * 1e3,
+              loop_time / (build_time + lookup_time),
+          ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    for num_wheels, num_frames in ((4, 1000), (100, 1000), (400, 5000)):
+        run(num_wheels, num_frames, args.repeats)
+    for num_frames in (1000, 20000):
+        run_path(num_frames, 10000, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Cached quaternion keys against converting and scanning samples per query.
+
+The per-query side does what an uncached node does on every evaluation: scan
+the samples for the bracketing pair, convert both Euler rotations to
+quaternions and slerp them, on plain Python floats. The cached side builds
+``RotationSamples`` once and answers every motion blur sub-frame query with a
+binary search, one query at a time like a node compute and all at once.
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+from meshKernels.rotations import SLERP, SQUAD, RotationSamples
+
+
+def euler_to_quaternion(x, y, z):
+    cx, cy, cz = math.cos(math.radians(x) / 2), math.cos(math.radians(y) / 2), math.cos(math.radians(z) / 2)
+    sx, sy, sz = math.sin(math.radians(x) / 2), math.sin(math.radians(y) / 2), math.sin(math.radians(z) / 2)
+    return (sx * cy * cz - cx * sy * sz, cx * sy * cz + sx * cy * sz,
+            cx * cy * sz - sx * sy * cz, cx * cy * cz + sx * sy * sz)
+
+
+def uncached_query(times, rotations, query):
+    index = 0
+    while index + 2 < len(times) and times[index + 1] <= query:
+        index += 1
+    a = euler_to_quaternion(*rotations[index])
+    b = euler_to_quaternion(*rotations[index + 1])
+    factor = min(max((query - times[index]) / (times[index + 1] - times[index]), 0.0), 1.0)
+    dot = sum(p * q for p, q in zip(a, b))
+    if dot < 0.0:
+        b = tuple(-q for q in b)
+        dot = -dot
+    angle = math.acos(min(dot, 1.0))
+    if angle < 1e-6:
+        return a
+    wa = math.sin((1.0 - factor) * angle) / math.sin(angle)
+    wb = math.sin(factor * angle) / math.sin(angle)
+    return tuple(p * wa + q * wb for p, q in zip(a, b))
+
+
+def timed(function, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(num_frames, num_queries, repeats):
+    rng = np.random.RandomState(0)
+    times = np.arange(num_frames, dtype=np.float64)
+    rotations = np.cumsum(rng.uniform(-5.0, 5.0, (num_frames, 3)), axis=0)
+    # five motion blur samples around random frames of the shot
+    queries = (rng.randint(0, num_frames - 1, num_queries // 5)[:, None] + np.linspace(-0.25, 0.25, 5)).ravel()
+
+    build_time, samples = timed(lambda: RotationSamples(times, rotations), repeats)
+    batch_time, batch = timed(lambda: samples.quaternions(queries, SLERP), repeats)
+    squad_time, _ = timed(lambda: samples.quaternions(queries, SQUAD), repeats)
+    single_queries = queries[:1000]
+    single_time, _ = timed(lambda: [samples.quaternions(query) for query in single_queries], 1)
+
+    loop_queries = queries[:200]
+    time_list, rotation_list = times.tolist(), rotations.tolist()
+    loop_time, loop = timed(lambda: [uncached_query(time_list, rotation_list, query) for query in loop_queries], 1)
+    signs = np.sign(np.sum(np.array(loop) * batch[:len(loop)], axis=1))[:, None]
+    assert np.allclose(np.array(loop) * signs, batch[:len(loop)], atol=1e-9)
+
+    per_loop = loop_time / len(loop_queries)
+    print("frames=%6d queries=%6d  keys %6.2f ms  slerp %7.2f ms  squad %7.2f ms  "
+          "per query %6.1f us (uncached %8.1f us, x%.0f)" % (
+              num_frames, len(queries), build_time * 1e3, batch_time * 1e3, squad_time * 1e3,
+              single_time / len(single_queries) * 1e6, per_loop * 1e6, per_loop * len(queries) / batch_time,
+          ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    for num_frames in (1000, 10000, 100000):
+        run(num_frames, 50000, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
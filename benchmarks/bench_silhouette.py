@@ -0,0 +1,70 @@
+"""
+Vectorized silhouette edges against the per-edge loop of ``generateProxyModel``.
+
+The loop reproduces the old ``MItMeshEdge`` walk on plain Python values: two
+face normals per edge and a sign test against one view direction. The
+vectorized pass is timed for that single view and for the six axis views.
+"""
+import argparse
+import time
+
+from benchmarks import meshes
+from meshKernels import quadrics as qem
+from meshKernels.silhouette import AXIS_VIEWS, silhouette_mask
+from meshKernels.topology import MeshTopology
+
+
+def loop_silhouette(normals, topology, view):
+    edges = set()
+    for edge, (a, b) in enumerate(topology.edges.tolist()):
+        faces = topology.edge_faces(edge).tolist()
+        if len(faces) == 2:
+            dot1 = sum(n * v for n, v in zip(normals[faces[0]], view))
+            dot2 = sum(n * v for n, v in zip(normals[faces[1]], view))
+            if (dot1 > 0 and dot2 < 0) or (dot1 < 0 and dot2 > 0):
+                edges.add((a, b))
+    return edges
+
+
+def run(label, mesh, loop_limit):
+    points, counts, connects = mesh
+    topology = MeshTopology(counts, connects, num_vertices=len(points))
+    view = (0.3, 0.2, 1.0)
+
+    start = time.perf_counter()
+    mask = silhouette_mask(points, counts, connects, topology, [view])
+    single_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    axis_mask = silhouette_mask(points, counts, connects, topology, AXIS_VIEWS)
+    axis_time = time.perf_counter() - start
+
+    line = "%-16s edges=%8d  one view %8.4fs (%5d edges)  six views %8.4fs (%6d edges)" % (
+        label, topology.num_edges, single_time, mask.sum(), axis_time, axis_mask.sum(),
+    )
+    if topology.num_edges <= loop_limit:
+        start = time.perf_counter()
+        normals = qem.face_planes(points, counts, connects)[:, :3].tolist()
+        loop = loop_silhouette(normals, topology, view)
+        loop_time = time.perf_counter() - start
+        assert loop == set(map(tuple, topology.edges[mask].tolist()))
+        line += "  loop %8.3fs  speedup x%.0f" % (loop_time, loop_time / single_time)
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--loop-limit", type=int, default=300000,
+                        help="largest edge count timed for the loop")
+    args = parser.parse_args()
+
+    for label, mesh in (
+        ("sphere 64x128", meshes.uv_sphere(64, 128)),
+        ("sphere 256x512", meshes.uv_sphere(256, 512)),
+        ("grid 512x512", meshes.grid(512, noise=0.05)),
+    ):
+        run(label, mesh, args.loop_limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Streaming vertex clustering of mesh dumps under a memory budget.
+
+Every case writes a sphere to a temporary mesh dump and simplifies it from
+disk, reporting the traced peak of the NumPy allocations next to the size the
+mesh would take fully loaded.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import meshes
+from meshKernels.cache import MEGABYTE
+from meshKernels.mesh_dump import MeshDump, write_mesh_dump
+from meshKernels.streaming import simplify_dump
+
+
+def run(label, dump, target, budget):
+    loaded = dump.num_points * 24 + (dump.num_faces + dump.num_corners) * 8
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        points, counts, _ = simplify_dump(dump, target, max_memory=budget * MEGABYTE)
+    except MemoryError:
+        print("%-16s target=%8d budget=%5dMB  over budget" % (label, target, budget))
+        return
+    finally:
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    print("%-16s target=%8d budget=%5dMB  -> %8d verts %8d tris %7.2fs (%9.0f faces/s)  peak %6.1fMB  loaded %6.1fMB" % (
+        label, target, budget, len(points), len(counts), elapsed, dump.num_faces / elapsed,
+        peak / float(MEGABYTE), loaded / float(MEGABYTE),
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-b", "--budget", type=int, nargs="+", default=[64, 256], help="memory budgets in MB")
+    parser.add_argument("-t", "--target", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        for rings, segments in ((256, 512), (1024, 2048)):
+            label = "sphere %dx%d" % (rings, segments)
+            path = os.path.join(directory, "sphere.mkmesh")
+            write_mesh_dump(path, *meshes.uv_sphere(rings, segments))
+            dump = MeshDump(path)
+            for target in args.target:
+                for budget in args.budget:
+                    run(label, dump, target, budget)
+            del dump
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
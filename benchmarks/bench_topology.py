@@ -0,0 +1,76 @@
+"""
+Build time, memory and lookup throughput of ``MeshTopology``.
+
+The index is compared against the per-vertex Python sets and the
+``{(min, max): edge}`` dict the tools would otherwise keep around.
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks import meshes
+from meshKernels.topology import MeshTopology
+
+
+def python_adjacency(edges, num_vertices):
+    neighbours = [set() for _ in range(num_vertices)]
+    lookup = {}
+    for index, (a, b) in enumerate(edges.tolist()):
+        neighbours[a].add(b)
+        neighbours[b].add(a)
+        lookup[(a, b)] = index
+    return neighbours, lookup
+
+
+def measure(function, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run(label, mesh, queries, compare):
+    points, counts, connects = mesh
+    topology, build_time, build_peak = measure(MeshTopology, counts, connects, None, len(points))
+
+    rng = np.random.RandomState(0)
+    picks = topology.edges[rng.randint(0, topology.num_edges, queries)]
+
+    start = time.perf_counter()
+    for a, b in picks.tolist():
+        topology.edge_index(b, a)
+    single_rate = queries / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    topology.edge_indices(picks[:, 1], picks[:, 0])
+    batch_rate = queries / (time.perf_counter() - start)
+
+    print("%-12s faces=%8d edges=%8d  build %6.2fs  index %7.1f MB (peak %7.1f MB)  "
+          "lookup %9.0f/s single %11.0f/s batched" % (
+              label, topology.num_faces, topology.num_edges, build_time,
+              topology.nbytes / 1e6, build_peak / 1e6, single_rate, batch_rate))
+
+    if compare:
+        _, python_time, python_peak = measure(python_adjacency, topology.edges, len(points))
+        print("%-12s python sets + dict: build %6.2fs  %7.1f MB" % ("", python_time, python_peak / 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=100000)
+    parser.add_argument("--no-compare", action="store_true",
+                        help="skip the pure Python adjacency baseline")
+    args = parser.parse_args()
+
+    for resolution in (100, 316, 1000):
+        mesh = meshes.grid(resolution)
+        run("grid %d" % resolution, mesh, args.queries, not args.no_compare)
+
+
+if __name__ == "__main__":
+    main()
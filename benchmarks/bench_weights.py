@@ -0,0 +1,73 @@
+"""
+Deforming only the painted points against deforming the whole mesh.
+
+A band covering a fraction of a grid is painted with random weights. The
+dense side runs the batch kernels on every point with the dense weights, the
+sparse side gathers the points of a ``WeightIndex`` built once, measures and
+deforms only those and scatters them back. Both must give the same points.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks import meshes
+from meshKernels.compression import RestState
+from meshKernels.deform import feather_deform, wrinkle_deform
+from meshKernels.weights import WeightIndex
+
+
+def timed(function, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(label, mesh, coverages, repeats):
+    points, counts, connects = mesh
+    rest = RestState(points, counts, connects)
+    squashed = points * (1.0, 1.0, 0.9)
+    matrix = np.eye(4)
+    matrix[3, :3] = (0.1, 0.2, 0.3)
+    rng = np.random.RandomState(0)
+
+    for coverage in coverages:
+        weights = np.zeros(len(points))
+        painted = int(len(points) * coverage / 100.0)
+        weights[:painted] = rng.uniform(0.1, 1.0, painted)
+        index = WeightIndex(weights)
+
+        cases = [
+            ("wrinkle",
+             lambda: wrinkle_deform(squashed, rest.compression(squashed), 0.5, weights, 0.8),
+             lambda: index.scatter(squashed, wrinkle_deform(
+                 index.gather(squashed), rest.compression(squashed, index.indices), 0.5, index.values, 0.8))),
+            ("feather",
+             lambda: feather_deform(points, matrix, weights, 0.8),
+             lambda: index.scatter(points, feather_deform(index.gather(points), matrix, index.values, 0.8))),
+        ]
+        for name, dense, sparse in cases:
+            dense_time, expected = timed(dense, repeats)
+            sparse_time, result = timed(sparse, repeats)
+            assert np.allclose(result, expected, rtol=0.0, atol=1e-12)
+            print("%-14s %-8s painted %5.1f%%  dense %8.2f ms  sparse %8.2f ms  speedup x%.1f" % (
+                label, name, coverage, dense_time * 1e3, sparse_time * 1e3, dense_time / sparse_time,
+            ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-c", "--coverages", type=float, nargs="+", default=[1, 10, 25, 100],
+                        help="painted percentages of the mesh")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    for vertices in (100000, 1000000):
+        run("grid %d" % vertices, meshes.grid_for_vertex_count(vertices), args.coverages, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
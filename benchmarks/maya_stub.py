@@ -0,0 +1,356 @@
+"""
+Stand-in for the slice of ``maya.api.OpenMaya`` and ``maya.api.OpenMayaAnim``
+the Python nodes touch.
+
+It is enough to import the FeatherSlider, WrinkleDeformer and autoRoll
+plugins and call their ``deform`` and ``compute`` outside of Maya:
+attributes are plain objects, a ``MDataBlock`` maps them to values,
+``MItGeometry`` serves and iterates a point buffer and a mesh ``MObject``
+carries its points, or its points, counts and connects. Nothing here
+evaluates a graph, it only lets the benchmarks and tests run the node code
+around the kernels. Use ``load_plugin`` to import a plugin file against the
+stub.
+"""
+import importlib.util
+import os
+import sys
+import types
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+kSuccess = 0
+kUnknownParameter = 1
+
+
+class MObject(object):
+    """An attribute, or a data object carrying ``payload``."""
+
+    def __init__(self, payload=None, name=None):
+        self.payload = payload
+        self.name = name
+
+    def isNull(self):
+        return self.payload is None and self.name is None
+
+    def __repr__(self):
+        return "MObject(%s)" % (self.name or type(self.payload).__name__)
+
+
+class MTypeId(object):
+    def __init__(self, value):
+        self.value = value
+
+
+class MTime(object):
+    def __init__(self, value=0.0, unit=None):
+        self.value = float(value)
+
+
+class MVector(tuple):
+    def __new__(cls, x=0.0, y=0.0, z=0.0):
+        return tuple.__new__(cls, (x, y, z))
+
+
+class MPoint(object):
+    def __init__(self, x=0.0, y=0.0, z=0.0, w=1.0):
+        self.x, self.y, self.z, self.w = x, y, z, w
+
+
+class MMatrix(tuple):
+    """16 row major values, iterating like the Maya matrix."""
+
+    def __new__(cls, values=None):
+        if values is None:
+            values = (1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+        return tuple.__new__(cls, (float(value) for value in values))
+
+
+class MPointArray(list):
+    """Points as (x, y, z, w) tuples, converting to an (N, 4) array like the Maya one."""
+
+    def __init__(self, points=()):
+        list.__init__(self, [(x, y, z, 1.0) for x, y, z, *_ in points])
+
+
+class MIntArray(list):
+    pass
+
+
+class MDoubleArray(list):
+    pass
+
+
+class MDataHandle(object):
+    def __init__(self, value=None):
+        self.value = value
+
+    def _get(self):
+        return self.value
+
+    asBool = asShort = asInt = asFloat = asDouble = asMatrix = asTime = asMesh = asVector = data = _get
+
+    def _set(self, value):
+        self.value = value
+
+    setBool = setShort = setInt = setFloat = setDouble = setMVector = setMObject = _set
+
+    def child(self, attribute):
+        return MDataHandle(self.value[attribute])
+
+    def setClean(self):
+        pass
+
+
+class MArrayDataHandle(object):
+    """Elements of an array attribute, a {logical index: value} dict."""
+
+    def __init__(self, elements):
+        if isinstance(elements, MDataHandle):
+            elements = elements.value
+        self.elements = elements or {}
+        self.indices = sorted(self.elements)
+        self.current = None
+
+    def __len__(self):
+        return len(self.indices)
+
+    def jumpToLogicalElement(self, index):
+        if index not in self.elements:
+            raise RuntimeError("No element %d" % index)
+        self.current = index
+
+    def jumpToPhysicalElement(self, index):
+        self.current = self.indices[index]
+
+    def elementLogicalIndex(self):
+        return self.current
+
+    def inputValue(self):
+        return MDataHandle(self.elements[self.current])
+
+    outputValue = inputValue
+
+    def builder(self):
+        return MArrayDataBuilder(self.elements)
+
+    def set(self, builder):
+        self.elements = builder
+        self.indices = sorted(builder)
+
+    def setAllClean(self):
+        pass
+
+
+class MArrayDataBuilder(dict):
+    def addElement(self, index):
+        handle = self[index] = MDataHandle()
+        return handle
+
+
+class MDataBlock(object):
+    """Attribute values of one node, keyed by attribute."""
+
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+        self.outputs = {}
+
+    def inputValue(self, attribute):
+        return MDataHandle(self.values.get(attribute))
+
+    def outputValue(self, attribute):
+        handle = self.outputs.get(attribute)
+        if handle is None:
+            handle = self.outputs[attribute] = MDataHandle(self.values.get(attribute))
+        return handle
+
+    def inputArrayValue(self, attribute):
+        return MArrayDataHandle(self.values.get(attribute))
+
+    outputArrayValue = inputArrayValue
+
+    def setClean(self, plug):
+        pass
+
+
+class MItGeometry(object):
+    """Iterator over every point of an (N, 3) array."""
+
+    def __init__(self, points):
+        self.points = MPointArray(points.tolist())
+        self.current = 0
+
+    def isDone(self):
+        return self.current >= len(self.points)
+
+    def next(self):
+        self.current += 1
+
+    def index(self):
+        return self.current
+
+    def position(self):
+        return MPoint(*self.points[self.current])
+
+    def setPosition(self, point):
+        self.points[self.current] = (point.x, point.y, point.z, 1.0)
+
+    def count(self):
+        return len(self.points)
+
+    exactCount = count
+
+    def allPositions(self):
+        return self.points
+
+    def setAllPositions(self, points):
+        self.points = points
+
+
+class MFnMesh(object):
+    def __init__(self, mesh):
+        payload = mesh.payload
+        if isinstance(payload, tuple):
+            self.points, self.counts, self.connects = payload
+        else:
+            self.points, self.counts, self.connects = payload, (), ()
+        self.numVertices = len(self.points)
+        self.numPolygons = len(self.counts)
+        self.numFaceVertices = len(self.connects)
+
+    def getPoints(self, space=None):
+        return MPointArray(self.points.tolist())
+
+    def getVertices(self):
+        return MIntArray(self.counts), MIntArray(self.connects)
+
+
+class MFnDoubleArrayData(object):
+    def create(self, values):
+        return MObject(values)
+
+
+class MFnIntArrayData(object):
+    def __init__(self, data):
+        self.payload = data.payload
+
+    def array(self):
+        return self.payload
+
+
+class _AttributeFn(object):
+    """Creates attributes and takes any setting without checking it."""
+
+    def create(self, name, *args):
+        self.attribute = MObject(name=name)
+        return self.attribute
+
+    createPoint = create
+
+    def setObject(self, attribute):
+        self.attribute = attribute
+
+    def __getattr__(self, name):
+        if name.startswith("set") or name == "addField":
+            return lambda *args: None
+        raise AttributeError(name)
+
+
+class MFnNumericAttribute(_AttributeFn):
+    pass
+
+
+class MFnMatrixAttribute(_AttributeFn):
+    pass
+
+
+class MFnTypedAttribute(_AttributeFn):
+    pass
+
+
+class MFnUnitAttribute(_AttributeFn):
+    kTime = "time"
+
+
+class MFnEnumAttribute(_AttributeFn):
+    pass
+
+
+class MFnNumericData(object):
+    kBoolean, kShort, kInt, kFloat, kDouble = "boolean", "short", "int", "float", "double"
+
+
+class MFnData(object):
+    kString, kIntArray, kDoubleArray, kVectorArray, kMesh = "string", "intArray", "doubleArray", "vectorArray", "mesh"
+
+
+class MPxNode(object):
+    def __init__(self):
+        pass
+
+    @classmethod
+    def addAttribute(cls, attribute):
+        pass
+
+    @classmethod
+    def attributeAffects(cls, source, destination):
+        pass
+
+    def setDependentsDirty(self, plug, plugArray):
+        pass
+
+    def name(self):
+        return type(self).__name__
+
+
+class MPxDeformerNode(MPxNode):
+    input = MObject(name="input")
+    inputGeom = MObject(name="inputGeometry")
+    outputGeom = MObject(name="outputGeometry")
+    envelope = MObject(name="envelope")
+    weightList = MObject(name="weightList")
+    weights = MObject(name="weights")
+
+
+class MProfiler(object):
+    kColorE_L3 = 0
+
+    @staticmethod
+    def addCategory(name, description=""):
+        return 0
+
+    @staticmethod
+    def eventBegin(category, color, name, description=""):
+        return 0
+
+    @staticmethod
+    def eventEnd(event):
+        pass
+
+
+class MGlobal(object):
+    @staticmethod
+    def displayError(message):
+        sys.stderr.write("%s\n" % message)
+
+
+def install():
+    """
+    Register the stub as ``maya.api.OpenMaya`` and ``maya.api.OpenMayaAnim``,
+    replacing any real Maya.
+    """
+    module = sys.modules[__name__]
+    maya = types.ModuleType("maya")
+    api = types.ModuleType("maya.api")
+    maya.api = api
+    api.OpenMaya = api.OpenMayaAnim = module
+    sys.modules.update({"maya": maya, "maya.api": api, "maya.api.OpenMaya": module, "maya.api.OpenMayaAnim": module})
+    return module
+
+
+def load_plugin(path, name):
+    """Import the plugin file at ``path``, relative to the repository, as module ``name``."""
+    install()
+    spec = importlib.util.spec_from_file_location(name, os.path.join(REPOSITORY, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,61 @@
+"""
+Synthetic meshes for the benchmarks.
+
+Every generator returns (points, counts, connects), matching the layout of
+``MFnMesh.getPoints`` / ``MFnMesh.getVertices``.
+"""
+import numpy as np
+
+
+def grid(resolution, size=1.0, triangulate=False, noise=0.0, seed=0):
+    """A flat ``resolution`` x ``resolution`` quad grid in the XZ plane."""
+    n = resolution + 1
+    xs = np.linspace(-size * 0.5, size * 0.5, n)
+    x, z = np.meshgrid(xs, xs, indexing="ij")
+    points = np.stack([x.ravel(), np.zeros(n * n), z.ravel()], axis=1)
+    if noise:
+        points[:, 1] = np.random.RandomState(seed).uniform(-noise, noise, n * n)
+
+    i, j = np.meshgrid(np.arange(resolution), np.arange(resolution), indexing="ij")
+    a = (i * n + j).ravel()
+    b = a + n
+    quads = np.stack([a, b, b + 1, a + 1], axis=1)
+    if triangulate:
+        tris = np.concatenate([quads[:, [0, 1, 2]], quads[:, [0, 2, 3]]])
+        return points, np.full(len(tris), 3, dtype=np.int64), tris.ravel()
+    return points, np.full(len(quads), 4, dtype=np.int64), quads.ravel()
+
+
+def uv_sphere(rings, segments, radius=1.0):
+    """A UV sphere with quads between the rings and triangle fans at the poles."""
+    theta = np.linspace(0.0, np.pi, rings + 1)[1:-1]
+    phi = np.linspace(0.0, 2.0 * np.pi, segments, endpoint=False)
+    t, p = np.meshgrid(theta, phi, indexing="ij")
+    body = np.stack([np.sin(t) * np.cos(p), np.cos(t), np.sin(t) * np.sin(p)], axis=-1).reshape(-1, 3)
+    points = np.concatenate([[[0.0, 1.0, 0.0]], body, [[0.0, -1.0, 0.0]]]) * radius
+
+    top = 0
+    bottom = len(points) - 1
+
+    def ring(r, s):
+        return 1 + r * segments + s % segments
+
+    s = np.arange(segments)
+    top_fan = np.stack([np.full(segments, top), ring(0, s + 1), ring(0, s)], axis=1)
+    bottom_fan = np.stack([np.full(segments, bottom), ring(rings - 2, s), ring(rings - 2, s + 1)], axis=1)
+
+    r, s = np.meshgrid(np.arange(rings - 2), np.arange(segments), indexing="ij")
+    r = r.ravel()
+    s = s.ravel()
+    quads = np.stack([ring(r, s), ring(r, s + 1), ring(r + 1, s + 1), ring(r + 1, s)], axis=1)
+
+    counts = np.concatenate([
+        np.full(segments, 3), np.full(len(quads), 4), np.full(segments, 3),
+    ]).astype(np.int64)
+    connects = np.concatenate([top_fan.ravel(), quads.ravel(), bottom_fan.ravel()]).astype(np.int64)
+    return points, counts, connects
+
+
+def grid_for_vertex_count(vertex_count, **kwargs):
+    """A grid with roughly ``vertex_count`` vertices."""
+    return grid(max(1, int(round(np.sqrt(vertex_count))) - 1), **kwargs)
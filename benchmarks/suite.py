@@ -0,0 +1,276 @@
+"""
+Scaling suite over the deformation and reduction code, recorded to JSON.
+
+Every case runs at every size (vertices, or evaluations for autoRoll) in its
+own worker process, so the peak RSS it reports belongs to that case alone.
+Each record holds the best time over the repeats, the throughput, the setup
+time and the peak RSS. Each case also gets the exponent of a power law
+fitted through its times, 1 for linear scaling.
+
+The FeatherSlider and autoRoll cases call the Python nodes' ``deform`` and
+``compute`` against ``benchmarks.maya_stub``. The other cases run the
+kernels the remaining deform and doIt entry points call: the ``reduceCmd``
+edge collapse, the ``generateProxyModel`` quadric reducer, wrinkle
+compression and collider queries; ``bench_deform`` times the whole
+WrinkleDeformer node.
+
+Compare a run against an earlier one to catch regressions::
+
+    python -m benchmarks.suite -o before.json
+    python -m benchmarks.suite -o after.json --baseline before.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from benchmarks import meshes
+from benchmarks import maya_stub as om
+
+MEGABYTE = 1024 * 1024
+SIZES = [1000, 10000, 100000, 1000000, 2000000]
+
+
+def setup_reduce(size):
+    from meshKernels.edge_collapse import EdgeCollapseReducer
+    points, counts, connects = meshes.grid_for_vertex_count(size, noise=0.01)
+    return lambda: EdgeCollapseReducer(points, counts, connects).reduce(len(points) // 2), len(points)
+
+
+def setup_qem(size):
+    from meshKernels.edge_collapse import reduce_proxy
+    points, counts, connects = meshes.grid_for_vertex_count(size, noise=0.01)
+    return lambda: reduce_proxy(points, counts, connects, len(points) // 2), len(points)
+
+
+def setup_wrinkle(size):
+    from meshKernels.compression import RestState
+    from meshKernels.deform import wrinkle_deform
+    points, counts, connects = meshes.grid_for_vertex_count(size)
+    rest = RestState(points, counts, connects)
+    squashed = points * (1.0, 1.0, 0.9)
+    return lambda: wrinkle_deform(squashed, rest.compression(squashed), 0.5, None, 0.8), len(points)
+
+
+def feather_node(points, instanced):
+    """A FeatherSlider and the data block of one whole-mesh evaluation."""
+    module = om.load_plugin(os.path.join("feather_slide", "py", "feather_slide.py"), "feather_slide")
+    module.FeatherSlider.nodeInitializer()
+    node = module.FeatherSlider.creator()
+
+    matrix = np.eye(4)
+    matrix[3, :3] = (0.1, 0.2, 0.3)
+    rng = np.random.RandomState(0)
+    feather_ids = np.arange(len(points)) // 64
+    matrices = {}
+    for feather in range(int(feather_ids[-1]) + 1):
+        element = np.eye(4)
+        element[3, :3] = rng.uniform(-0.1, 0.1, 3)
+        matrices[feather] = om.MMatrix(element.ravel())
+
+    block = om.MDataBlock({
+        node.envelope: 0.8,
+        node.input: {0: {node.inputGeom: om.MObject(points)}},
+        node.featherMatrixAttr: om.MMatrix(matrix.ravel()),
+        node.featherMatricesAttr: matrices,
+        node.featherIdsAttr: om.MObject(feather_ids),
+        node.instancedAttr: instanced,
+        node.batchAttr: True,
+        node.cacheAttr: False,
+    })
+    return node, block
+
+
+def setup_feather(size, instanced=False):
+    points = meshes.grid_for_vertex_count(size)[0]
+    node, block = feather_node(points, instanced)
+
+    def run():
+        node.deform(block, om.MItGeometry(points), None, 0)
+    return run, len(points)
+
+
+def setup_feather_instances(size):
+    return setup_feather(size, instanced=True)
+
+
+def setup_collision(size):
+    from meshKernels.bvh import TriangleBVH
+    from meshKernels.deform import collision_deform
+    from meshKernels.topology import triangulate
+    collider, counts, connects = meshes.uv_sphere(64, 128)
+    bvh = TriangleBVH(collider, triangulate(counts, connects))
+    # cloth draped over the collider, partly inside it
+    points = meshes.grid_for_vertex_count(size, size=2.0)[0] + (0.0, 0.8, 0.0)
+
+    def run():
+        closest, normals, distances = bvh.signed_distances(points)
+        return collision_deform(points, closest, normals, distances, 0.5, 0.2, None, 1.0)
+    return run, len(points)
+
+
+def setup_autoroll(size):
+    module = om.load_plugin(os.path.join("autoRollNode", "py", "autoRollNode.py"), "autoRollNode")
+    module.initialize()
+    Node = module.AutoRollNode
+    node = Node()
+    block = om.MDataBlock({Node.inSpeed: 1.5, Node.inRadius: 0.4})
+    times = [om.MTime(frame) for frame in range(size)]
+
+    def run():
+        for frame in times:
+            block.values[Node.inTime] = frame
+            node.compute(Node.outRotation, block)
+    return run, size
+
+
+def setup_autoroll_bake(size):
+    from meshKernels.roll import roll_angles
+    wheels = 100
+    times = np.arange(max(1, size // wheels), dtype=np.float64)[:, None]
+    rng = np.random.RandomState(0)
+    speeds = rng.uniform(0.5, 2.0, wheels)
+    radii = rng.uniform(0.3, 1.0, wheels)
+    return lambda: roll_angles(times, speeds, radii), len(times) * wheels
+
+
+# name: (setup, largest default size, unit of the size)
+CASES = {
+    "reduce": (setup_reduce, 100000, "vertices"),
+    "qem": (setup_qem, 100000, "vertices"),
+    "wrinkle": (setup_wrinkle, 2000000, "vertices"),
+    "feather": (setup_feather, 2000000, "vertices"),
+    "feather_instances": (setup_feather_instances, 2000000, "vertices"),
+    "collision": (setup_collision, 1000000, "vertices"),
+    "autoroll": (setup_autoroll, 100000, "evaluations"),
+    "autoroll_bake": (setup_autoroll_bake, 2000000, "evaluations"),
+}
+
+
+def peak_rss():
+    """Peak resident set size of this process in megabytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (MEGABYTE if sys.platform == "darwin" else 1024.0)
+
+
+def measure(case, size, repeats):
+    """Time one case at one size in this process."""
+    setup, _, unit = CASES[case]
+    start = time.perf_counter()
+    function, count = setup(size)
+    setup_time = time.perf_counter() - start
+
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return {
+        "case": case,
+        "size": count,
+        "unit": unit,
+        "seconds": best,
+        "throughput": count / best if best > 0 else float("inf"),
+        "setup_seconds": setup_time,
+        "peak_rss_mb": peak_rss(),
+    }
+
+
+def run_worker(case, size, repeats):
+    """``measure`` in a fresh interpreter, so its peak RSS is its own."""
+    command = [sys.executable, "-m", "benchmarks.suite", "--worker", case, str(size), "--repeats", str(repeats)]
+    output = subprocess.run(command, cwd=om.REPOSITORY, stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def scaling(results):
+    """Exponent of a power law through the times of every case, 1 for linear."""
+    exponents = {}
+    for case in CASES:
+        rows = [row for row in results if row["case"] == case]
+        if len(rows) > 1:
+            sizes = np.log([row["size"] for row in rows])
+            times = np.log([row["seconds"] for row in rows])
+            exponents[case] = float(np.polyfit(sizes, times, 1)[0])
+    return exponents
+
+
+def regressions(results, baseline, tolerance):
+    """Records more than ``tolerance`` slower than the same case and size of ``baseline``."""
+    previous = {(row["case"], row["size"]): row for row in baseline["results"]}
+    slower = []
+    for row in results:
+        reference = previous.get((row["case"], row["size"]))
+        if reference is not None and row["seconds"] > reference["seconds"] * (1.0 + tolerance):
+            slower.append((row, row["seconds"] / reference["seconds"]))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-c", "--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("-s", "--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--max-size", type=int,
+                        help="largest size of every case, instead of the per-case defaults")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("-o", "--output", default="benchmark_suite.json")
+    parser.add_argument("--baseline", help="earlier output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="slowdown over the baseline reported as a regression")
+    parser.add_argument("--worker", nargs=2, metavar=("CASE", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.worker[0], int(args.worker[1]), args.repeats)))
+        return
+
+    results = []
+    for case in args.cases:
+        largest = args.max_size or CASES[case][1]
+        for size in args.sizes:
+            if size > largest:
+                continue
+            row = run_worker(case, size, args.repeats)
+            results.append(row)
+            print("%-18s %8d %-11s %10.2f ms  %12.0f/s  setup %8.2f ms  peak %7.1f MB" % (
+                case, row["size"], row["unit"], row["seconds"] * 1e3, row["throughput"],
+                row["setup_seconds"] * 1e3, row["peak_rss_mb"],
+            ))
+
+    exponents = scaling(results)
+    for case, exponent in exponents.items():
+        print("%-18s scales as size^%.2f" % (case, exponent))
+
+    report = {
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "cpus": os.cpu_count(),
+        },
+        "repeats": args.repeats,
+        "results": results,
+        "scaling": exponents,
+    }
+    with open(args.output, "w") as stream:
+        json.dump(report, stream, indent=2)
+    print("wrote %s" % args.output)
+
+    if args.baseline:
+        with open(args.baseline) as stream:
+            slower = regressions(results, json.load(stream), args.tolerance)
+        for row, ratio in slower:
+            print("REGRESSION %-18s %8d %s: x%.2f slower" % (row["case"], row["size"], row["unit"], ratio))
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,23 @@
-#include <maya/MFnNumericAttribute.h>
-#include <maya/MFnMesh.h>
-#include <maya/MItGeometry.h>
-#include <maya/MPxDeformerNode.h>
-
-class CollisionDeformer : public MPxDeformerNode
-{
-public:
-    CollisionDeformer();
-    virtual ~CollisionDeformer();
-
-    static void* creator();
-    static MStatus initialize();
+#include "CollisionDeformer.h"
+#include "CollisionKernel.h"
 
-    virtual MStatus deform(MDataBlock& data, MItGeometry& itGeo, const MMatrix& localToWorldMatrix, unsigned int geomIndex);
+#include <maya/MFnMatrixAttribute.h>
+#include <maya/MFnMesh.h>
+#include <maya/MFnTypedAttribute.h>
+#include <maya/MIntArray.h>
+#include <maya/MMatrix.h>
+#include <maya/MPoint.h>
+#include <maya/MPointArray.h>
+#include <maya/MProfiler.h>
 
-    static MTypeId id;
-    static MObject aBounciness;
-    static MObject aFriction;
-};
+#include <vector>
 
 MTypeId CollisionDeformer::id(0x100000);
+MObject CollisionDeformer::aColliderMesh;
+MObject CollisionDeformer::aColliderMatrix;
 MObject CollisionDeformer::aBounciness;
 MObject CollisionDeformer::aFriction;
+MObject CollisionDeformer::aNumThreads;
 
 CollisionDeformer::CollisionDeformer() {}
 CollisionDeformer::~CollisionDeformer() {}
@@ -44,27 +40,130 @@ MStatus CollisionDeformer::initialize()
     addAttribute(aFriction);
     attributeAffects(aFriction, outputGeom);
 
+    // Threads used by the collision kernel, 0 uses every core
+    aNumThreads = nAttr.create("numThreads", "nth", MFnNumericData::kInt, 0);
+    nAttr.setMin(0);
+    addAttribute(aNumThreads);
+    attributeAffects(aNumThreads, outputGeom);
+
+    MFnTypedAttribute tAttr;
+    aColliderMesh = tAttr.create("colliderMesh", "cm", MFnData::kMesh);
+    tAttr.setStorable(false);
+    addAttribute(aColliderMesh);
+    attributeAffects(aColliderMesh, outputGeom);
+
+    // World matrix of the collider, connect its worldMatrix[0]; leave it at
+    // identity when colliderMesh comes from worldMesh
+    MFnMatrixAttribute mAttr;
+    aColliderMatrix = mAttr.create("colliderMatrix", "cmx");
+    mAttr.setStorable(false);
+    addAttribute(aColliderMatrix);
+    attributeAffects(aColliderMatrix, outputGeom);
+
+    return MS::kSuccess;
+}
+
+MStatus CollisionDeformer::setDependentsDirty(const MPlug& plug, MPlugArray& affected)
+{
+    if (plug == aColliderMesh || plug == aColliderMatrix) {
+        mColliderDirty = true;
+    }
+    return MPxDeformerNode::setDependentsDirty(plug, affected);
+}
+
+MStatus CollisionDeformer::updateCollider(MObject& colliderMesh, const MMatrix& colliderMatrix)
+{
+    MStatus status;
+    MFnMesh fnCollider(colliderMesh, &status);
+    CHECK_MSTATUS_AND_RETURN_IT(status);
+
+    bool sameTopology = fnCollider.numVertices() == mColliderVertices &&
+                        fnCollider.numPolygons() == mColliderPolygons &&
+                        fnCollider.numFaceVertices() == mColliderFaceVertices;
+    if (sameTopology && !mColliderDirty) {
+        return MS::kSuccess;
+    }
+
+    MPointArray colliderPoints;
+    fnCollider.getPoints(colliderPoints);
+    std::vector<double> points(colliderPoints.length() * 3);
+    for (unsigned int i = 0; i < colliderPoints.length(); ++i) {
+        MPoint point = colliderPoints[i] * colliderMatrix;
+        points[i * 3] = point.x;
+        points[i * 3 + 1] = point.y;
+        points[i * 3 + 2] = point.z;
+    }
+
+    if (sameTopology) {
+        mColliderBVH.refit(points);
+    } else {
+        MIntArray triangleCounts;
+        MIntArray triangleVertices;
+        fnCollider.getTriangles(triangleCounts, triangleVertices);
+        std::vector<int> triangles(triangleVertices.length());
+        triangleVertices.get(triangles.data());
+        mColliderBVH.build(points, triangles);
+
+        mColliderVertices = fnCollider.numVertices();
+        mColliderPolygons = fnCollider.numPolygons();
+        mColliderFaceVertices = fnCollider.numFaceVertices();
+    }
+    mColliderDirty = false;
     return MS::kSuccess;
 }
 
+// Category of the deformer's events in the Profiler window
+static int profilerCategory()
+{
+    static const int category = MProfiler::addCategory("CollisionDeformer", "CollisionDeformer plugin calls");
+    return category;
+}
+
 MStatus CollisionDeformer::deform(MDataBlock& data, MItGeometry& itGeo, const MMatrix& localToWorldMatrix, unsigned int geomIndex)
 {
+    MProfilingScope profilingScope(profilerCategory(), MProfiler::kColorE_L3, "deform");
+
     MStatus status;
 
+    float env = data.inputValue(envelope).asFloat();
     float bounciness = data.inputValue(aBounciness).asFloat();
     float friction = data.inputValue(aFriction).asFloat();
 
-    MFnMesh fnMesh(inputGeom, &status);
+    MObject colliderMesh = data.inputValue(aColliderMesh).asMesh();
+    if (colliderMesh.isNull()) {
+        return MS::kSuccess;
+    }
+    status = updateCollider(colliderMesh, data.inputValue(aColliderMatrix).asMatrix());
     CHECK_MSTATUS_AND_RETURN_IT(status);
 
-    for (; !itGeo.isDone(); itGeo.next()) {
-        MPoint point = it
-        // perform collision calculations here
-        // use bounciness and friction attributes to control the behavior
-        // of the collision
+    unsigned int numThreads = static_cast<unsigned int>(data.inputValue(aNumThreads).asInt());
+
+    // Copy the points and weights into flat arrays so the kernel never calls
+    // back into Maya from its threads
+    MPointArray points;
+    itGeo.allPositions(points);
+    const unsigned int numPoints = points.length();
+    std::vector<double> flatPoints(numPoints * 3);
+    std::vector<float> weights(numPoints);
+    for (unsigned int i = 0; !itGeo.isDone(); itGeo.next(), ++i) {
+        weights[i] = weightValue(data, geomIndex, itGeo.index());
+        flatPoints[i * 3] = points[i].x;
+        flatPoints[i * 3 + 1] = points[i].y;
+        flatPoints[i * 3 + 2] = points[i].z;
+    }
+
+    double localToWorld[4][4];
+    double worldToLocal[4][4];
+    localToWorldMatrix.get(localToWorld);
+    localToWorldMatrix.inverse().get(worldToLocal);
+
+    resolveCollisions(mColliderBVH, flatPoints.data(), numPoints, weights.data(), localToWorld, worldToLocal,
+                      bounciness, friction, env, numThreads);
 
-        fnMesh.setPoint(itGeo.index(), point, MSpace::kObject);
+    for (unsigned int i = 0; i < numPoints; ++i) {
+        points[i] = MPoint(flatPoints[i * 3], flatPoints[i * 3 + 1], flatPoints[i * 3 + 2]);
     }
+    itGeo.setAllPositions(points);
 
     return MS::kSuccess;
 }
@@ -6,6 +6,9 @@
 #include <maya/MItGeometry.h>
 #include <maya/MTypeId.h>
 #include <maya/MFnNumericAttribute.h>
+#include <maya/MPlugArray.h>
+
+#include "TriangleBVH.h"
 
 class CollisionDeformer : public MPxDeformerNode
 {
@@ -17,10 +20,27 @@ public:
     static MStatus initialize();
     virtual MStatus deform(MDataBlock& data, MItGeometry& itGeo, const MMatrix& localToWorldMatrix, unsigned int geomIndex);
 
+    // Marks the collider BVH for a refit when the collider mesh or matrix changes
+    virtual MStatus setDependentsDirty(const MPlug& plug, MPlugArray& affected);
+
     static MTypeId id;
-    static MObject aCollisionNode;
-    static MObject aBounce;
+    static MObject aColliderMesh;
+    static MObject aColliderMatrix;
+    static MObject aBounciness;
     static MObject aFriction;
+    static MObject aNumThreads;
+
+private:
+    // Rebuilds the BVH when the collider topology changed, refits it when
+    // only the collider points or matrix moved. Mesh data has no DAG path,
+    // so the points are taken to world space by colliderMatrix
+    MStatus updateCollider(MObject& colliderMesh, const MMatrix& colliderMatrix);
+
+    TriangleBVH mColliderBVH;
+    int mColliderVertices = -1;
+    int mColliderPolygons = -1;
+    int mColliderFaceVertices = -1;
+    bool mColliderDirty = true;
 };
 
 #endif // __COLLISIONDEFORMER_H__
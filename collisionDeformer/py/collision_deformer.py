@@ -1,35 +1,164 @@
-import maya.OpenMaya as om
-import maya.OpenMayaMPx as ommpx
+import sys
 
-class CollisionDeformer(ommpx.MPxDeformerNode):
+import maya.api.OpenMaya as om
+import maya.api.OpenMayaAnim as oma
+import numpy as np
+
+from meshKernels.bvh import TriangleBVH
+from meshKernels.cache import MEGABYTE, OutputCache, cache_key
+from meshKernels.compression import topology_signature
+from meshKernels.deform import collision_deform, transform_points
+from meshKernels.profiling import iterated_points, profiled
+
+def maya_useNewAPI():
+    pass
+
+class CollisionDeformer(oma.MPxDeformerNode):
     kNodeName = "collisionDeformer"
     kNodeClassify = "deformer"
     kNodeID = om.MTypeId(0x100000) # You should use a unique id for your node
 
     aBounciness = om.MObject()
     aFriction = om.MObject()
+    aColliderMesh = om.MObject()
+    aColliderMatrix = om.MObject()
+    aCache = om.MObject()
+    aCacheBudget = om.MObject()
+    aCacheHits = om.MObject()
+    aCacheMisses = om.MObject()
+    aCacheEvictions = om.MObject()
 
     def __init__(self):
-        ommpx.MPxDeformerNode.__init__(self)
+        oma.MPxDeformerNode.__init__(self)
+        # Acceleration structure over the collider triangles, rebuilt when the
+        # collider topology changes and refit when only its points move
+        self.colliderBVH = None
+        self.colliderSignature = None
+        self.colliderDirty = True
+        # Digest of the collider points, part of the output cache key
+        self.colliderKey = None
+        # Moved collider points the BVH has not been refit to yet
+        self.colliderPoints = None
+        # Deformed points of previously seen inputs, see the cache attribute
+        self.outputCache = OutputCache()
 
+    @profiled("CollisionDeformer.deform", points=iterated_points)
     def deform(self, data, itGeo, localToWorldMatrix, geomIndex):
-        input = ommpx.cvar.MPxDeformerNode_input
-        env = ommpx.cvar.MPxDeformerNode_envelope
+        env = data.inputValue(self.envelope).asFloat()
         bounciness = data.inputValue(CollisionDeformer.aBounciness).asFloat()
         friction = data.inputValue(CollisionDeformer.aFriction).asFloat()
 
-        while not itGeo.isDone():
-            index = itGeo.index()
-            inputGeom = ommpx.MFnMesh(input)
-            point = inputGeom.getPoint(index, om.MSpace.kObject)
-            
-            # perform collision calculations here
-            # use bounciness and friction attributes to control the behavior
-            # of the collision
+        colliderBVH = self.getColliderBVH(data)
+        if colliderBVH is None:
+            return
+
+        # Read every point once, deform the whole (N, 3) buffer and write it back once
+        points = self.toArray(itGeo.allPositions(om.MSpace.kObject))
+        weights = self.getWeights(data, geomIndex, len(points))
+
+        matrix = self.toList(localToWorldMatrix)
+        key, deformed = self.lookupCache(
+            data, (points, weights, np.frombuffer(self.colliderKey, dtype=np.uint8)),
+            [geomIndex, bounciness, friction, env] + matrix)
+        if deformed is None:
+            if self.colliderPoints is not None:
+                colliderBVH.refit(self.colliderPoints)
+                self.colliderPoints = None
+
+            # The collider is queried in world space
+            worldPoints = transform_points(points, matrix)
+            closest, normals, distances = colliderBVH.signed_distances(worldPoints)
+            worldPoints = collision_deform(worldPoints, closest, normals, distances, bounciness, friction, weights, env)
+            deformed = transform_points(worldPoints, self.toList(localToWorldMatrix.inverse()))
+            if key is not None:
+                self.outputCache.put(key, deformed)
+        self.setCacheCounters(data)
+
+        itGeo.setAllPositions(om.MPointArray(deformed.tolist()), om.MSpace.kObject)
+
+    def setDependentsDirty(self, plug, plugArray):
+        # Collider points moved, refit the BVH on the next evaluation
+        if plug.attribute() == CollisionDeformer.aColliderMesh or plug.attribute() == CollisionDeformer.aColliderMatrix:
+            self.colliderDirty = True
+        return oma.MPxDeformerNode.setDependentsDirty(self, plug, plugArray)
+
+    def getColliderBVH(self, data):
+        """
+        Return the BVH of the connected collider mesh in world space, or None
+        when there is no collider. Mesh data has no DAG path, so its points
+        are moved by the collider matrix.
+        """
+        colliderMesh = data.inputValue(CollisionDeformer.aColliderMesh).asMesh()
+        if colliderMesh.isNull():
+            self.colliderBVH = None
+            return None
+
+        fnCollider = om.MFnMesh(colliderMesh)
+        signature = topology_signature(fnCollider.numVertices, fnCollider.numPolygons, fnCollider.numFaceVertices)
+        if self.colliderBVH is not None and signature == self.colliderSignature and not self.colliderDirty:
+            return self.colliderBVH
+
+        colliderMatrix = data.inputValue(CollisionDeformer.aColliderMatrix).asMatrix()
+        points = transform_points(self.toArray(fnCollider.getPoints()), self.toList(colliderMatrix))
 
-            inputGeom.setPoint(index, point, om.MSpace.kObject)
+        if self.colliderBVH is not None and signature == self.colliderSignature:
+            # Refit on the first query, a cache hit never needs it
+            self.colliderPoints = points
+        else:
+            _, triangleVertices = fnCollider.getTriangles()
+            self.colliderBVH = TriangleBVH(points, np.array(triangleVertices, dtype=np.int64).reshape(-1, 3))
+            self.colliderSignature = signature
+            self.colliderPoints = None
+        self.colliderKey = cache_key((points,))
+        self.colliderDirty = False
+        return self.colliderBVH
 
-            itGeo.next()
+    def lookupCache(self, data, arrays, values):
+        """
+        Return the cache key and the cached output of these inputs, or
+        (None, None) when the cache is off.
+        """
+        if not data.inputValue(CollisionDeformer.aCache).asBool():
+            self.outputCache.clear()
+            return None, None
+
+        self.outputCache.set_budget(data.inputValue(CollisionDeformer.aCacheBudget).asFloat() * MEGABYTE)
+        key = cache_key(arrays, values)
+        return key, self.outputCache.get(key)
+
+    def setCacheCounters(self, data):
+        for attr, value in ((CollisionDeformer.aCacheHits, self.outputCache.hits),
+                            (CollisionDeformer.aCacheMisses, self.outputCache.misses),
+                            (CollisionDeformer.aCacheEvictions, self.outputCache.evictions)):
+            handle = data.outputValue(attr)
+            handle.setInt(value)
+            handle.setClean()
+
+    @staticmethod
+    def toList(matrix):
+        return list(matrix)
+
+    @staticmethod
+    def toArray(points):
+        """(N, 3) array of an MPointArray, converted in one call."""
+        return np.array(points, dtype=np.float64).reshape(-1, 4)[:, :3]
+
+    def getWeights(self, data, geomIndex, count):
+        """Painted deformer weights as a dense array, unpainted points weigh 1."""
+        weights = np.ones(count)
+        weightList = data.inputArrayValue(self.weightList)
+        try:
+            weightList.jumpToLogicalElement(geomIndex)
+        except RuntimeError:
+            return weights
+
+        weightHandle = om.MArrayDataHandle(weightList.inputValue().child(self.weights))
+        for i in range(len(weightHandle)):
+            weightHandle.jumpToPhysicalElement(i)
+            index = weightHandle.elementLogicalIndex()
+            if index < count:
+                weights[index] = weightHandle.inputValue().asFloat()
+        return weights
             
     def accessoryNodeSetup(self, dagMod):
         pass
@@ -38,25 +167,58 @@ class CollisionDeformer(ommpx.MPxDeformerNode):
         pass
 
 def nodeCreator():
-    return ommpx.asMPxPtr(CollisionDeformer())
+    return CollisionDeformer()
 
 def nodeInitializer():
     nAttr = om.MFnNumericAttribute()
 
     CollisionDeformer.aBounciness = nAttr.create("bounciness", "b", om.MFnNumericData.kFloat, 1.0)
-    nAttr.setKeyable(True)
+    nAttr.keyable = True
     CollisionDeformer.addAttribute(CollisionDeformer.aBounciness)
-    CollisionDeformer.attributeAffects(CollisionDeformer.aBounciness, ommpx.cvar.MPxDeformerNode_outputGeom)
+    CollisionDeformer.attributeAffects(CollisionDeformer.aBounciness, CollisionDeformer.outputGeom)
 
     CollisionDeformer.aFriction = nAttr.create("friction", "f", om.MFnNumericData.kFloat, 0.5)
-    nAttr.setKeyable(True)
+    nAttr.keyable = True
     CollisionDeformer.addAttribute(CollisionDeformer.aFriction)
-    CollisionDeformer.attributeAffects(CollisionDeformer.aFriction, ommpx.cvar.MPxDeformerNode_outputGeom)
+    CollisionDeformer.attributeAffects(CollisionDeformer.aFriction, CollisionDeformer.outputGeom)
+
+    tAttr = om.MFnTypedAttribute()
+    CollisionDeformer.aColliderMesh = tAttr.create("colliderMesh", "cm", om.MFnData.kMesh)
+    tAttr.storable = False
+    CollisionDeformer.addAttribute(CollisionDeformer.aColliderMesh)
+    CollisionDeformer.attributeAffects(CollisionDeformer.aColliderMesh, CollisionDeformer.outputGeom)
+
+    # World matrix of the collider, connect its worldMatrix[0]; leave it at
+    # identity when colliderMesh comes from worldMesh
+    mAttr = om.MFnMatrixAttribute()
+    CollisionDeformer.aColliderMatrix = mAttr.create("colliderMatrix", "cmx")
+    mAttr.storable = False
+    CollisionDeformer.addAttribute(CollisionDeformer.aColliderMatrix)
+    CollisionDeformer.attributeAffects(CollisionDeformer.aColliderMatrix, CollisionDeformer.outputGeom)
+
+    CollisionDeformer.aCache = nAttr.create("cache", "cch", om.MFnNumericData.kBoolean, False)
+    CollisionDeformer.addAttribute(CollisionDeformer.aCache)
+    CollisionDeformer.attributeAffects(CollisionDeformer.aCache, CollisionDeformer.outputGeom)
+
+    CollisionDeformer.aCacheBudget = nAttr.create("cacheBudget", "cbg", om.MFnNumericData.kFloat, 256.0)
+    nAttr.setMin(0.0)
+    CollisionDeformer.addAttribute(CollisionDeformer.aCacheBudget)
+    CollisionDeformer.attributeAffects(CollisionDeformer.aCacheBudget, CollisionDeformer.outputGeom)
+
+    # Output cache counters, read them with getAttr
+    CollisionDeformer.aCacheHits = nAttr.create("cacheHits", "chi", om.MFnNumericData.kInt, 0)
+    CollisionDeformer.aCacheMisses = nAttr.create("cacheMisses", "cmi", om.MFnNumericData.kInt, 0)
+    CollisionDeformer.aCacheEvictions = nAttr.create("cacheEvictions", "cev", om.MFnNumericData.kInt, 0)
+    for attr in (CollisionDeformer.aCacheHits, CollisionDeformer.aCacheMisses, CollisionDeformer.aCacheEvictions):
+        nAttr.setObject(attr)
+        nAttr.writable = False
+        nAttr.storable = False
+        CollisionDeformer.addAttribute(attr)
 
 def initializePlugin(mobject):
     mplugin = om.MFnPlugin(mobject)
     try:
-        mplugin.registerNode(CollisionDeformer.kNodeName, CollisionDeformer.kNodeID, nodeCreator, nodeInitializer, ommpx.MPxNode.kDeformerNode)
+        mplugin.registerNode(CollisionDeformer.kNodeName, CollisionDeformer.kNodeID, nodeCreator, nodeInitializer, om.MPxNode.kDeformerNode)
     except:
         sys.stderr.write("Failed to register node: %s" % CollisionDeformer.kNodeName)
         raise
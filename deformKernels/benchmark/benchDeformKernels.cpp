@@ -0,0 +1,214 @@
+// Thread scaling of the wrinkle and collision deform kernels.
+//
+// Builds a cloth grid and a sphere collider in memory, runs every kernel with
+// 1, 2, 4, ... threads up to the hardware count, and checks that the output is
+// bit for bit identical to the single threaded run.
+//
+//     benchDeformKernels [gridResolution] [repeats]
+
+#include "CollisionKernel.h"
+#include "ThreadPool.h"
+#include "TriangleBVH.h"
+#include "WeightIndex.h"
+#include "WrinkleKernel.h"
+
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <functional>
+#include <vector>
+
+namespace
+{
+const double kPi = 3.14159265358979323846;
+
+// Flat resolution x resolution quad grid of unit size in the XZ plane, with
+// its edges and rest lengths
+void makeGrid(unsigned int resolution, std::vector<double>& points, WrinkleRest& rest)
+{
+    unsigned int n = resolution + 1;
+    points.resize(n * n * 3);
+    for (unsigned int i = 0; i < n; ++i) {
+        for (unsigned int j = 0; j < n; ++j) {
+            double* p = &points[(i * n + j) * 3];
+            p[0] = static_cast<double>(i) / resolution - 0.5;
+            p[1] = 0.0;
+            p[2] = static_cast<double>(j) / resolution - 0.5;
+        }
+    }
+
+    rest.edgeVertices.clear();
+    rest.restLengths.clear();
+    for (unsigned int i = 0; i < n; ++i) {
+        for (unsigned int j = 0; j < n; ++j) {
+            if (i + 1 < n) {
+                rest.edgeVertices.push_back(i * n + j);
+                rest.edgeVertices.push_back((i + 1) * n + j);
+                rest.restLengths.push_back(1.0 / resolution);
+            }
+            if (j + 1 < n) {
+                rest.edgeVertices.push_back(i * n + j);
+                rest.edgeVertices.push_back(i * n + j + 1);
+                rest.restLengths.push_back(1.0 / resolution);
+            }
+        }
+    }
+    rest.buildVertexEdges(n * n);
+}
+
+// Triangulated UV sphere of radius 1
+void makeSphere(unsigned int rings, unsigned int segments, std::vector<double>& points, std::vector<int>& triangles)
+{
+    points.clear();
+    triangles.clear();
+    for (unsigned int r = 0; r <= rings; ++r) {
+        double theta = kPi * r / rings;
+        for (unsigned int s = 0; s < segments; ++s) {
+            double phi = 2.0 * kPi * s / segments;
+            points.push_back(std::sin(theta) * std::cos(phi));
+            points.push_back(std::cos(theta));
+            points.push_back(std::sin(theta) * std::sin(phi));
+        }
+    }
+    for (unsigned int r = 0; r < rings; ++r) {
+        for (unsigned int s = 0; s < segments; ++s) {
+            int a = r * segments + s;
+            int b = r * segments + (s + 1) % segments;
+            int c = a + segments;
+            int d = b + segments;
+            const int quad[6] = { a, c, d, a, d, b };
+            triangles.insert(triangles.end(), quad, quad + 6);
+        }
+    }
+}
+
+double timeIt(const std::function<void()>& run, int repeats)
+{
+    double best = 1e30;
+    for (int i = 0; i < repeats; ++i) {
+        auto start = std::chrono::steady_clock::now();
+        run();
+        best = std::min(best, std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count());
+    }
+    return best;
+}
+
+void report(const char* kernel, size_t points, unsigned int threads, double seconds, double serial, bool identical)
+{
+    std::printf("%-12s points=%9zu  threads=%3u  %9.2f ms  %11.0f points/s  speedup x%5.2f  %s\n",
+                kernel, points, threads, seconds * 1e3, points / seconds, serial / seconds,
+                identical ? "identical" : "MISMATCH");
+}
+}
+
+int main(int argc, char** argv)
+{
+    unsigned int resolution = argc > 1 ? static_cast<unsigned int>(std::atoi(argv[1])) : 1000;
+    int repeats = argc > 2 ? std::atoi(argv[2]) : 3;
+
+    std::vector<unsigned int> threadCounts;
+    for (unsigned int threads = 1; threads < ThreadPool::instance().size(); threads *= 2) {
+        threadCounts.push_back(threads);
+    }
+    threadCounts.push_back(ThreadPool::instance().size());
+
+    // Wrinkle: a grid squashed along X
+    std::vector<double> rest;
+    WrinkleRest wrinkleRest;
+    makeGrid(resolution, rest, wrinkleRest);
+    const size_t numPoints = rest.size() / 3;
+    std::vector<double> squashed(rest);
+    for (size_t i = 0; i < numPoints; ++i) {
+        squashed[i * 3] *= 0.8;
+    }
+    std::vector<float> weights(numPoints, 1.0f);
+
+    std::vector<float> compression(numPoints);
+    std::vector<double> wrinkled;
+    std::vector<float> serialCompression;
+    std::vector<double> serialWrinkled;
+    double serialTime = 0.0;
+    for (unsigned int threads : threadCounts) {
+        double seconds = timeIt([&] {
+            computeCompression(wrinkleRest, squashed.data(), compression.data(), threads);
+            wrinkled = squashed;
+            wrinkleDeform(wrinkled.data(), numPoints, nullptr, compression.data(), weights.data(), 0.5f, 1.0f, threads);
+        }, repeats);
+        if (threads == 1) {
+            serialTime = seconds;
+            serialCompression = compression;
+            serialWrinkled = wrinkled;
+        }
+        bool identical = compression == serialCompression &&
+                         std::memcmp(wrinkled.data(), serialWrinkled.data(), wrinkled.size() * sizeof(double)) == 0;
+        report("wrinkle", numPoints, threads, seconds, serialTime, identical);
+    }
+
+    // Sparse wrinkle: only a 10% band of the grid is painted, so only those
+    // vertices are measured and deformed
+    WeightIndex weightIndex;
+    weightIndex.numPoints = numPoints;
+    for (size_t i = 0; i < numPoints / 10; ++i) {
+        weightIndex.add(static_cast<unsigned int>(i), static_cast<unsigned int>(i), 1.0f);
+    }
+    const size_t numPainted = weightIndex.size();
+    std::vector<float> paintedCompression(numPainted);
+    std::vector<double> painted;
+    std::vector<float> serialPaintedCompression;
+    for (unsigned int threads : threadCounts) {
+        double seconds = timeIt([&] {
+            computeVertexCompression(wrinkleRest, squashed.data(), weightIndex.vertices.data(), numPainted,
+                                     paintedCompression.data(), threads);
+            painted.assign(squashed.begin(), squashed.begin() + numPainted * 3);
+            wrinkleDeform(painted.data(), numPainted, nullptr, paintedCompression.data(), weightIndex.weights.data(),
+                          0.5f, 1.0f, threads);
+        }, repeats);
+        if (threads == 1) {
+            serialPaintedCompression = paintedCompression;
+        }
+        // the painted points must match the dense run exactly
+        bool identical = paintedCompression == serialPaintedCompression &&
+                         std::equal(paintedCompression.begin(), paintedCompression.end(), serialCompression.begin()) &&
+                         std::memcmp(painted.data(), serialWrinkled.data(), painted.size() * sizeof(double)) == 0;
+        report("wrinkle 10%", numPainted, threads, seconds, serialTime, identical);
+    }
+
+    // Collision: the same grid wrapped onto a sphere slightly smaller than the
+    // collider, so every point penetrates
+    std::vector<double> colliderPoints;
+    std::vector<int> triangles;
+    makeSphere(256, 512, colliderPoints, triangles);
+    TriangleBVH collider;
+    collider.build(colliderPoints, triangles);
+
+    std::vector<double> cloth(rest.size());
+    for (size_t i = 0; i < numPoints; ++i) {
+        double theta = (rest[i * 3] + 0.5) * kPi;
+        double phi = (rest[i * 3 + 2] + 0.5) * 2.0 * kPi;
+        cloth[i * 3] = 0.98 * std::sin(theta) * std::cos(phi);
+        cloth[i * 3 + 1] = 0.98 * std::cos(theta);
+        cloth[i * 3 + 2] = 0.98 * std::sin(theta) * std::sin(phi);
+    }
+    const double identity[4][4] = { { 1, 0, 0, 0 }, { 0, 1, 0, 0 }, { 0, 0, 1, 0 }, { 0, 0, 0, 1 } };
+
+    std::vector<double> resolved;
+    std::vector<double> serialResolved;
+    for (unsigned int threads : threadCounts) {
+        double seconds = timeIt([&] {
+            resolved = cloth;
+            resolveCollisions(collider, resolved.data(), numPoints, weights.data(), identity, identity,
+                              1.0f, 0.5f, 1.0f, threads);
+        }, repeats);
+        if (threads == 1) {
+            serialTime = seconds;
+            serialResolved = resolved;
+        }
+        bool identical = std::memcmp(resolved.data(), serialResolved.data(), resolved.size() * sizeof(double)) == 0;
+        report("collision", numPoints, threads, seconds, serialTime, identical);
+    }
+
+    return 0;
+}
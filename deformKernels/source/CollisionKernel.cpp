@@ -0,0 +1,49 @@
+#include "CollisionKernel.h"
+#include "ThreadPool.h"
+#include "TriangleBVH.h"
+
+#include <limits>
+
+namespace
+{
+// Closest point queries cost far more than the wrinkle math, so the chunks
+// are smaller to keep the threads balanced
+const size_t kChunkSize = 1024;
+
+void transformPoint(const double p[3], const double m[4][4], double result[3])
+{
+    for (int axis = 0; axis < 3; ++axis) {
+        result[axis] = p[0] * m[0][axis] + p[1] * m[1][axis] + p[2] * m[2][axis] + m[3][axis];
+    }
+}
+}
+
+void resolveCollisions(const TriangleBVH& collider, double* points, size_t numPoints, const float* weights,
+                       const double localToWorld[4][4], const double worldToLocal[4][4],
+                       float bounciness, float friction, float envelope, unsigned int numThreads)
+{
+    const double maxDistance = std::numeric_limits<double>::infinity();
+
+    ThreadPool::instance().parallelFor(numPoints, kChunkSize, numThreads, [&](size_t begin, size_t end) {
+        for (size_t i = begin; i < end; ++i) {
+            double* point = points + i * 3;
+            double world[3];
+            transformPoint(point, localToWorld, world);
+
+            ClosestHit hit;
+            if (!collider.closestPoint(world, maxDistance, hit) || hit.distance >= 0.0) {
+                continue;
+            }
+
+            double offset[3] = { world[0] - hit.point[0], world[1] - hit.point[1], world[2] - hit.point[2] };
+            double along = offset[0] * hit.normal[0] + offset[1] * hit.normal[1] + offset[2] * hit.normal[2];
+            double scale = (weights != nullptr ? weights[i] : 1.0f) * envelope;
+            for (int axis = 0; axis < 3; ++axis) {
+                double tangent = offset[axis] - hit.normal[axis] * along;
+                double delta = hit.normal[axis] * (-hit.distance * bounciness) - tangent * friction;
+                world[axis] += delta * scale;
+            }
+            transformPoint(world, worldToLocal, point);
+        }
+    });
+}
@@ -0,0 +1,18 @@
+#ifndef __COLLISIONKERNEL_H__
+#define __COLLISIONKERNEL_H__
+
+#include <cstddef>
+
+class TriangleBVH;
+
+// Resolves numPoints flat xyz points against the collider. The points are
+// taken to world space by localToWorld (row-vector convention, like
+// MPoint * MMatrix) and brought back by worldToLocal. A point behind the
+// collider is pushed out along the normal by bounciness times its depth and
+// pulled towards the closest surface point by friction, scaled by its weight
+// (weights may be nullptr for 1) and the envelope.
+void resolveCollisions(const TriangleBVH& collider, double* points, size_t numPoints, const float* weights,
+                       const double localToWorld[4][4], const double worldToLocal[4][4],
+                       float bounciness, float friction, float envelope, unsigned int numThreads);
+
+#endif // __COLLISIONKERNEL_H__
@@ -0,0 +1,101 @@
+#include "ThreadPool.h"
+
+#include <algorithm>
+
+ThreadPool::ThreadPool(unsigned int numThreads)
+    : mNextChunk(0)
+{
+    for (unsigned int i = 1; i < std::max(numThreads, 1u); ++i) {
+        mWorkers.emplace_back(&ThreadPool::workerLoop, this, i - 1);
+    }
+}
+
+ThreadPool::~ThreadPool()
+{
+    {
+        std::lock_guard<std::mutex> lock(mMutex);
+        mStop = true;
+    }
+    mWake.notify_all();
+    for (std::thread& worker : mWorkers) {
+        worker.join();
+    }
+}
+
+ThreadPool& ThreadPool::instance()
+{
+    static ThreadPool pool(std::max(std::thread::hardware_concurrency(), 1u));
+    return pool;
+}
+
+void ThreadPool::parallelFor(size_t count, size_t chunkSize, unsigned int numThreads, const Task& task)
+{
+    if (count == 0) {
+        return;
+    }
+    chunkSize = std::max<size_t>(chunkSize, 1);
+    size_t numChunks = (count + chunkSize - 1) / chunkSize;
+
+    unsigned int threads = numThreads == 0 ? size() : std::min(numThreads, size());
+    threads = static_cast<unsigned int>(std::min<size_t>(threads, numChunks));
+
+    // One loop at a time, anything else runs serially instead of waiting
+    std::unique_lock<std::mutex> job(mJobMutex, std::try_to_lock);
+    if (threads <= 1 || !job.owns_lock()) {
+        for (size_t begin = 0; begin < count; begin += chunkSize) {
+            task(begin, std::min(begin + chunkSize, count));
+        }
+        return;
+    }
+
+    {
+        std::lock_guard<std::mutex> lock(mMutex);
+        mTask = &task;
+        mCount = count;
+        mChunkSize = chunkSize;
+        mNextChunk = 0;
+        mHelpers = threads - 1;
+        mRunning = threads - 1;
+        ++mGeneration;
+    }
+    mWake.notify_all();
+
+    runChunks();
+
+    std::unique_lock<std::mutex> lock(mMutex);
+    mDone.wait(lock, [this] { return mRunning == 0; });
+    mTask = nullptr;
+}
+
+void ThreadPool::runChunks()
+{
+    for (size_t chunk = mNextChunk++; chunk * mChunkSize < mCount; chunk = mNextChunk++) {
+        size_t begin = chunk * mChunkSize;
+        (*mTask)(begin, std::min(begin + mChunkSize, mCount));
+    }
+}
+
+void ThreadPool::workerLoop(unsigned int workerIndex)
+{
+    unsigned long long seen = 0;
+    for (;;) {
+        {
+            std::unique_lock<std::mutex> lock(mMutex);
+            mWake.wait(lock, [&] { return mStop || mGeneration != seen; });
+            if (mStop) {
+                return;
+            }
+            seen = mGeneration;
+            if (workerIndex >= mHelpers) {
+                continue;
+            }
+        }
+
+        runChunks();
+
+        std::lock_guard<std::mutex> lock(mMutex);
+        if (--mRunning == 0) {
+            mDone.notify_all();
+        }
+    }
+}
@@ -0,0 +1,58 @@
+#ifndef __THREADPOOL_H__
+#define __THREADPOOL_H__
+
+#include <atomic>
+#include <condition_variable>
+#include <cstddef>
+#include <functional>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+// Fixed pool of worker threads running data-parallel loops.
+//
+// parallelFor() splits [0, count) into chunks of a fixed size and hands them
+// out to the calling thread and up to numThreads - 1 workers. The chunk
+// boundaries never depend on the thread count, so a kernel that writes each
+// output from its own inputs only gives the same results with any number of
+// threads.
+class ThreadPool
+{
+public:
+    typedef std::function<void(size_t begin, size_t end)> Task;
+
+    explicit ThreadPool(unsigned int numThreads);
+    ~ThreadPool();
+
+    // Pool shared by the deformers, sized to the hardware threads
+    static ThreadPool& instance();
+
+    unsigned int size() const { return static_cast<unsigned int>(mWorkers.size()) + 1; }
+
+    // Runs task over every chunk of [0, count) and returns when all are done.
+    // numThreads of 0 uses the whole pool. A call made while another loop is
+    // running, for example from inside a task, runs on the calling thread.
+    void parallelFor(size_t count, size_t chunkSize, unsigned int numThreads, const Task& task);
+
+private:
+    void workerLoop(unsigned int workerIndex);
+    void runChunks();
+
+    std::vector<std::thread> mWorkers;
+    std::mutex mJobMutex;
+
+    std::mutex mMutex;
+    std::condition_variable mWake;
+    std::condition_variable mDone;
+    unsigned long long mGeneration = 0;
+    unsigned int mHelpers = 0;
+    unsigned int mRunning = 0;
+    bool mStop = false;
+
+    const Task* mTask = nullptr;
+    size_t mCount = 0;
+    size_t mChunkSize = 1;
+    std::atomic<size_t> mNextChunk;
+};
+
+#endif // __THREADPOOL_H__
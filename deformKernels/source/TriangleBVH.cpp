@@ -0,0 +1,254 @@
+#include "TriangleBVH.h"
+
+#include <algorithm>
+#include <cmath>
+#include <limits>
+
+namespace
+{
+const int kLeafSize = 2;
+const int kMaxDepth = 64;
+
+double dot(const double a[3], const double b[3])
+{
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2];
+}
+
+// Squared distance from a point to the nearest point of a box
+double boxDistance(const double query[3], const double lower[3], const double upper[3])
+{
+    double squared = 0.0;
+    for (int axis = 0; axis < 3; ++axis) {
+        double d = std::max(std::max(lower[axis] - query[axis], query[axis] - upper[axis]), 0.0);
+        squared += d * d;
+    }
+    return squared;
+}
+}
+
+void TriangleBVH::build(const std::vector<double>& points, const std::vector<int>& triangles)
+{
+    mTriangles = triangles;
+    unsigned int count = numTriangles();
+
+    std::vector<double> centroids(count * 3);
+    for (unsigned int t = 0; t < count; ++t) {
+        for (int axis = 0; axis < 3; ++axis) {
+            centroids[t * 3 + axis] = (points[triangles[t * 3] * 3 + axis] +
+                                       points[triangles[t * 3 + 1] * 3 + axis] +
+                                       points[triangles[t * 3 + 2] * 3 + axis]) / 3.0;
+        }
+    }
+
+    mOrder.resize(count);
+    for (unsigned int t = 0; t < count; ++t) {
+        mOrder[t] = t;
+    }
+
+    mNodes.clear();
+    mNodes.reserve(count > 0 ? 2 * count : 1);
+    mNodes.push_back(Node());
+    buildNode(0, 0, static_cast<int>(count), centroids);
+
+    refit(points);
+}
+
+void TriangleBVH::buildNode(int nodeIndex, int first, int count, const std::vector<double>& centroids)
+{
+    if (count <= kLeafSize) {
+        mNodes[nodeIndex].first = first;
+        mNodes[nodeIndex].count = count;
+        mNodes[nodeIndex].left = -1;
+        return;
+    }
+
+    // Split at the median of the longest axis of the centroid bounds
+    double lower[3] = { std::numeric_limits<double>::max(), std::numeric_limits<double>::max(), std::numeric_limits<double>::max() };
+    double upper[3] = { -std::numeric_limits<double>::max(), -std::numeric_limits<double>::max(), -std::numeric_limits<double>::max() };
+    for (int i = first; i < first + count; ++i) {
+        for (int axis = 0; axis < 3; ++axis) {
+            lower[axis] = std::min(lower[axis], centroids[mOrder[i] * 3 + axis]);
+            upper[axis] = std::max(upper[axis], centroids[mOrder[i] * 3 + axis]);
+        }
+    }
+    int axis = 0;
+    if (upper[1] - lower[1] > upper[axis] - lower[axis]) axis = 1;
+    if (upper[2] - lower[2] > upper[axis] - lower[axis]) axis = 2;
+
+    int half = count / 2;
+    std::nth_element(mOrder.begin() + first, mOrder.begin() + first + half, mOrder.begin() + first + count,
+                     [&](int a, int b) { return centroids[a * 3 + axis] < centroids[b * 3 + axis]; });
+
+    int left = static_cast<int>(mNodes.size());
+    mNodes.push_back(Node());
+    mNodes.push_back(Node());
+    mNodes[nodeIndex].left = left;
+    mNodes[nodeIndex].first = first;
+    mNodes[nodeIndex].count = 0;
+    buildNode(left, first, half, centroids);
+    buildNode(left + 1, first + half, count - half, centroids);
+}
+
+void TriangleBVH::refit(const std::vector<double>& points)
+{
+    mPoints = points;
+    unsigned int count = numTriangles();
+
+    mNormals.resize(count * 3);
+    for (unsigned int t = 0; t < count; ++t) {
+        const double* a = &mPoints[mTriangles[t * 3] * 3];
+        const double* b = &mPoints[mTriangles[t * 3 + 1] * 3];
+        const double* c = &mPoints[mTriangles[t * 3 + 2] * 3];
+        double ab[3] = { b[0] - a[0], b[1] - a[1], b[2] - a[2] };
+        double ac[3] = { c[0] - a[0], c[1] - a[1], c[2] - a[2] };
+        double n[3] = { ab[1] * ac[2] - ab[2] * ac[1], ab[2] * ac[0] - ab[0] * ac[2], ab[0] * ac[1] - ab[1] * ac[0] };
+        double length = std::sqrt(dot(n, n));
+        double scale = length > 0.0 ? 1.0 / length : 1.0;
+        for (int axis = 0; axis < 3; ++axis) {
+            mNormals[t * 3 + axis] = n[axis] * scale;
+        }
+    }
+
+    // Children are always stored after their parent, so a reverse sweep
+    // visits every child before its parent
+    for (int i = static_cast<int>(mNodes.size()) - 1; i >= 0; --i) {
+        Node& node = mNodes[i];
+        for (int axis = 0; axis < 3; ++axis) {
+            node.lower[axis] = std::numeric_limits<double>::max();
+            node.upper[axis] = -std::numeric_limits<double>::max();
+        }
+        if (node.left < 0) {
+            for (int k = node.first; k < node.first + node.count; ++k) {
+                for (int corner = 0; corner < 3; ++corner) {
+                    const double* p = &mPoints[mTriangles[mOrder[k] * 3 + corner] * 3];
+                    for (int axis = 0; axis < 3; ++axis) {
+                        node.lower[axis] = std::min(node.lower[axis], p[axis]);
+                        node.upper[axis] = std::max(node.upper[axis], p[axis]);
+                    }
+                }
+            }
+        } else {
+            const Node& a = mNodes[node.left];
+            const Node& b = mNodes[node.left + 1];
+            for (int axis = 0; axis < 3; ++axis) {
+                node.lower[axis] = std::min(a.lower[axis], b.lower[axis]);
+                node.upper[axis] = std::max(a.upper[axis], b.upper[axis]);
+            }
+        }
+    }
+}
+
+bool TriangleBVH::closestPoint(const double query[3], double maxDistance, ClosestHit& hit) const
+{
+    hit.triangle = -1;
+    hit.distance = std::numeric_limits<double>::infinity();
+    if (mTriangles.empty()) {
+        return false;
+    }
+
+    double best = maxDistance * maxDistance;
+    int stack[kMaxDepth];
+    int size = 0;
+    stack[size++] = 0;
+
+    while (size > 0) {
+        const Node& node = mNodes[stack[--size]];
+        if (boxDistance(query, node.lower, node.upper) > best) {
+            continue;
+        }
+
+        if (node.left < 0) {
+            for (int k = node.first; k < node.first + node.count; ++k) {
+                double point[3];
+                closestOnTriangle(mOrder[k], query, point);
+                double offset[3] = { query[0] - point[0], query[1] - point[1], query[2] - point[2] };
+                double squared = dot(offset, offset);
+                if (squared <= best) {
+                    best = squared;
+                    hit.triangle = mOrder[k];
+                    hit.point[0] = point[0];
+                    hit.point[1] = point[1];
+                    hit.point[2] = point[2];
+                }
+            }
+            continue;
+        }
+
+        // Push the farther child first so the nearer one is searched first
+        // and tightens the bound early
+        double nearLeft = boxDistance(query, mNodes[node.left].lower, mNodes[node.left].upper);
+        double nearRight = boxDistance(query, mNodes[node.left + 1].lower, mNodes[node.left + 1].upper);
+        if (nearLeft < nearRight) {
+            stack[size++] = node.left + 1;
+            stack[size++] = node.left;
+        } else {
+            stack[size++] = node.left;
+            stack[size++] = node.left + 1;
+        }
+    }
+
+    if (hit.triangle < 0) {
+        return false;
+    }
+
+    const double* normal = &mNormals[hit.triangle * 3];
+    double offset[3] = { query[0] - hit.point[0], query[1] - hit.point[1], query[2] - hit.point[2] };
+    hit.normal[0] = normal[0];
+    hit.normal[1] = normal[1];
+    hit.normal[2] = normal[2];
+    hit.distance = std::sqrt(best);
+    if (dot(offset, normal) < 0.0) {
+        hit.distance = -hit.distance;
+    }
+    return true;
+}
+
+// Voronoi region test from Ericson's "Real-Time Collision Detection"
+void TriangleBVH::closestOnTriangle(int triangle, const double query[3], double result[3]) const
+{
+    const double* a = &mPoints[mTriangles[triangle * 3] * 3];
+    const double* b = &mPoints[mTriangles[triangle * 3 + 1] * 3];
+    const double* c = &mPoints[mTriangles[triangle * 3 + 2] * 3];
+    double ab[3] = { b[0] - a[0], b[1] - a[1], b[2] - a[2] };
+    double ac[3] = { c[0] - a[0], c[1] - a[1], c[2] - a[2] };
+    double ap[3] = { query[0] - a[0], query[1] - a[1], query[2] - a[2] };
+    double bp[3] = { query[0] - b[0], query[1] - b[1], query[2] - b[2] };
+    double cp[3] = { query[0] - c[0], query[1] - c[1], query[2] - c[2] };
+
+    double s = 0.0;
+    double t = 0.0;
+    double d1 = dot(ab, ap);
+    double d2 = dot(ac, ap);
+    double d3 = dot(ab, bp);
+    double d4 = dot(ac, bp);
+    double d5 = dot(ab, cp);
+    double d6 = dot(ac, cp);
+    double vc = d1 * d4 - d3 * d2;
+    double vb = d5 * d2 - d1 * d6;
+    double va = d3 * d6 - d5 * d4;
+
+    if (d1 <= 0.0 && d2 <= 0.0) {
+        // vertex a
+    } else if (d3 >= 0.0 && d4 <= d3) {
+        s = 1.0;
+    } else if (vc <= 0.0 && d1 >= 0.0 && d3 <= 0.0) {
+        s = d1 / (d1 - d3);
+    } else if (d6 >= 0.0 && d5 <= d6) {
+        t = 1.0;
+    } else if (vb <= 0.0 && d2 >= 0.0 && d6 <= 0.0) {
+        t = d2 / (d2 - d6);
+    } else if (va <= 0.0 && (d4 - d3) >= 0.0 && (d5 - d6) >= 0.0) {
+        t = (d4 - d3) / ((d4 - d3) + (d5 - d6));
+        s = 1.0 - t;
+    } else {
+        double denom = va + vb + vc;
+        if (denom != 0.0) {
+            s = vb / denom;
+            t = vc / denom;
+        }
+    }
+
+    for (int axis = 0; axis < 3; ++axis) {
+        result[axis] = a[axis] + ab[axis] * s + ac[axis] * t;
+    }
+}
@@ -0,0 +1,54 @@
+#ifndef __TRIANGLEBVH_H__
+#define __TRIANGLEBVH_H__
+
+#include <vector>
+
+// Result of a closest point query
+struct ClosestHit
+{
+    double point[3];
+    double normal[3];
+    double distance;    // negative when the query is behind the surface
+    int triangle;       // -1 when nothing was found within the max distance
+};
+
+// Bounding volume hierarchy over the triangles of a collider mesh. It does not
+// depend on Maya: points are flat xyz arrays and triangles flat vertex ids.
+//
+// build() sorts the triangles into the tree and only has to run when the
+// collider topology changes. refit() recomputes the boxes bottom up for moved
+// points, which is much cheaper than a rebuild.
+class TriangleBVH
+{
+public:
+    void build(const std::vector<double>& points, const std::vector<int>& triangles);
+    void refit(const std::vector<double>& points);
+
+    // Closest point on the collider within maxDistance of query
+    bool closestPoint(const double query[3], double maxDistance, ClosestHit& hit) const;
+
+    unsigned int numTriangles() const { return static_cast<unsigned int>(mTriangles.size() / 3); }
+
+private:
+    // Leaves have count > 0 and own mOrder[first] .. mOrder[first + count - 1],
+    // inner nodes have their children at left and left + 1
+    struct Node
+    {
+        double lower[3];
+        double upper[3];
+        int left;
+        int first;
+        int count;
+    };
+
+    void buildNode(int nodeIndex, int first, int count, const std::vector<double>& centroids);
+    void closestOnTriangle(int triangle, const double query[3], double result[3]) const;
+
+    std::vector<Node> mNodes;
+    std::vector<int> mOrder;
+    std::vector<int> mTriangles;
+    std::vector<double> mPoints;
+    std::vector<double> mNormals;
+};
+
+#endif // __TRIANGLEBVH_H__
@@ -0,0 +1,43 @@
+#ifndef __WEIGHTINDEX_H__
+#define __WEIGHTINDEX_H__
+
+#include <cstddef>
+#include <vector>
+
+// Points of one geometry with a non-zero weight, so a deformer whose weights
+// cover a small part of the mesh only visits those. Built once from the
+// painted weights and kept until they change.
+struct WeightIndex
+{
+    // Below this fraction of weighted points the deformers measure only the
+    // edges of those points instead of the whole mesh
+    static constexpr double kSparseFraction = 0.25;
+
+    size_t numPoints = 0;                // points iterated when the index was built
+    std::vector<unsigned int> points;    // position of each weighted point in the iteration
+    std::vector<unsigned int> vertices;  // its vertex id
+    std::vector<float> weights;          // its weight
+
+    size_t size() const { return points.size(); }
+    bool isSparse() const { return points.size() < numPoints * kSparseFraction; }
+
+    void clear()
+    {
+        numPoints = 0;
+        points.clear();
+        vertices.clear();
+        weights.clear();
+    }
+
+    // Records the point when its weight is not zero
+    void add(unsigned int point, unsigned int vertex, float weight)
+    {
+        if (weight != 0.0f) {
+            points.push_back(point);
+            vertices.push_back(vertex);
+            weights.push_back(weight);
+        }
+    }
+};
+
+#endif // __WEIGHTINDEX_H__
@@ -0,0 +1,110 @@
+#include "WrinkleKernel.h"
+#include "ThreadPool.h"
+
+#include <algorithm>
+#include <cmath>
+
+namespace
+{
+const size_t kChunkSize = 4096;
+}
+
+void WrinkleRest::buildVertexEdges(size_t numVertices)
+{
+    offsets.assign(numVertices + 1, 0);
+    for (unsigned int vertex : edgeVertices) {
+        ++offsets[vertex + 1];
+    }
+    for (size_t i = 0; i < numVertices; ++i) {
+        offsets[i + 1] += offsets[i];
+    }
+
+    vertexEdges.resize(edgeVertices.size());
+    std::vector<unsigned int> fill(offsets.begin(), offsets.end() - 1);
+    for (size_t slot = 0; slot < edgeVertices.size(); ++slot) {
+        vertexEdges[fill[edgeVertices[slot]]++] = static_cast<unsigned int>(slot / 2);
+    }
+}
+
+void computeCompression(const WrinkleRest& rest, const double* points, float* compression, unsigned int numThreads)
+{
+    ThreadPool& pool = ThreadPool::instance();
+
+    // Length change of every edge, negative values are stretched edges
+    std::vector<double> distChanges(rest.numEdges());
+    pool.parallelFor(rest.numEdges(), kChunkSize, numThreads, [&](size_t begin, size_t end) {
+        for (size_t edge = begin; edge < end; ++edge) {
+            const double* a = points + rest.edgeVertices[edge * 2] * 3;
+            const double* b = points + rest.edgeVertices[edge * 2 + 1] * 3;
+            double dx = b[0] - a[0];
+            double dy = b[1] - a[1];
+            double dz = b[2] - a[2];
+            distChanges[edge] = rest.restLengths[edge] - std::sqrt(dx * dx + dy * dy + dz * dz);
+        }
+    });
+
+    pool.parallelFor(rest.numVertices(), kChunkSize, numThreads, [&](size_t begin, size_t end) {
+        for (size_t index = begin; index < end; ++index) {
+            double totalDistChange = 0.0;
+            int numAdjacentVerts = 0;
+
+            for (unsigned int slot = rest.offsets[index]; slot < rest.offsets[index + 1]; ++slot) {
+                double distChange = distChanges[rest.vertexEdges[slot]];
+
+                // Consider only compression, not expansion
+                if (distChange > 0) {
+                    totalDistChange += distChange;
+                    numAdjacentVerts++;
+                }
+            }
+
+            compression[index] = numAdjacentVerts > 0
+                ? static_cast<float>(std::min(totalDistChange / numAdjacentVerts, 1.0))
+                : 0.0f;
+        }
+    });
+}
+
+void computeVertexCompression(const WrinkleRest& rest, const double* points, const unsigned int* vertices,
+                              size_t numVertices, float* compression, unsigned int numThreads)
+{
+    ThreadPool::instance().parallelFor(numVertices, kChunkSize, numThreads, [&](size_t begin, size_t end) {
+        for (size_t i = begin; i < end; ++i) {
+            const unsigned int vertex = vertices[i];
+            double totalDistChange = 0.0;
+            int numAdjacentVerts = 0;
+
+            for (unsigned int slot = rest.offsets[vertex]; slot < rest.offsets[vertex + 1]; ++slot) {
+                const unsigned int edge = rest.vertexEdges[slot];
+                const double* a = points + rest.edgeVertices[edge * 2] * 3;
+                const double* b = points + rest.edgeVertices[edge * 2 + 1] * 3;
+                double dx = b[0] - a[0];
+                double dy = b[1] - a[1];
+                double dz = b[2] - a[2];
+                double distChange = rest.restLengths[edge] - std::sqrt(dx * dx + dy * dy + dz * dz);
+
+                // Consider only compression, not expansion
+                if (distChange > 0) {
+                    totalDistChange += distChange;
+                    numAdjacentVerts++;
+                }
+            }
+
+            compression[i] = numAdjacentVerts > 0
+                ? static_cast<float>(std::min(totalDistChange / numAdjacentVerts, 1.0))
+                : 0.0f;
+        }
+    });
+}
+
+void wrinkleDeform(double* points, size_t numPoints, const unsigned int* indices, const float* compression,
+                   const float* weights, float intensity, float envelope, unsigned int numThreads)
+{
+    ThreadPool::instance().parallelFor(numPoints, kChunkSize, numThreads, [&](size_t begin, size_t end) {
+        for (size_t i = begin; i < end; ++i) {
+            size_t index = indices != nullptr ? indices[i] : i;
+            float weight = weights != nullptr ? weights[i] : 1.0f;
+            points[i * 3 + 1] += intensity * compression[index] * weight * envelope;
+        }
+    });
+}
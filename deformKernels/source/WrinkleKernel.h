@@ -0,0 +1,42 @@
+#ifndef __WRINKLEKERNEL_H__
+#define __WRINKLEKERNEL_H__
+
+#include <cstddef>
+#include <vector>
+
+// Undirected edges of a mesh with their rest lengths, plus the edges of every
+// vertex as CSR arrays: the edges of vertex i are
+// vertexEdges[offsets[i]] .. vertexEdges[offsets[i + 1] - 1]
+struct WrinkleRest
+{
+    std::vector<unsigned int> edgeVertices; // two end points per edge
+    std::vector<double> restLengths;        // one per edge
+    std::vector<unsigned int> offsets;
+    std::vector<unsigned int> vertexEdges;
+
+    size_t numVertices() const { return offsets.empty() ? 0 : offsets.size() - 1; }
+    size_t numEdges() const { return restLengths.size(); }
+
+    // Fills offsets and vertexEdges from edgeVertices
+    void buildVertexEdges(size_t numVertices);
+};
+
+// Per-vertex compression of the current points (flat xyz): the average of the
+// positive rest minus current edge lengths, clamped to 1. Every edge is
+// measured once, then each vertex sums the changes of its own edges, so no
+// two threads ever write the same value.
+void computeCompression(const WrinkleRest& rest, const double* points, float* compression, unsigned int numThreads);
+
+// Compression of numVertices listed vertices only, compression[i] being the
+// one of vertices[i]. Each vertex measures its own edges, so the cost follows
+// the number of listed vertices and not the mesh size.
+void computeVertexCompression(const WrinkleRest& rest, const double* points, const unsigned int* vertices,
+                              size_t numVertices, float* compression, unsigned int numThreads);
+
+// Pushes every point along +Y by intensity * compression * weight * envelope.
+// points holds numPoints flat xyz positions, indices maps them to vertex ids
+// (nullptr when point i is vertex i) and weights may be nullptr for 1.
+void wrinkleDeform(double* points, size_t numPoints, const unsigned int* indices, const float* compression,
+                   const float* weights, float intensity, float envelope, unsigned int numThreads);
+
+#endif // __WRINKLEKERNEL_H__
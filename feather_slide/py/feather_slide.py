@@ -1,27 +1,158 @@
 import maya.api.OpenMaya as om
+import maya.api.OpenMayaAnim as oma
+import numpy as np
+
+from meshKernels.cache import MEGABYTE, OutputCache, cache_key
+from meshKernels.deform import as_points, feather_deform
+from meshKernels.feathers import FeatherGroups, feather_instances_deform
+from meshKernels.profiling import iterated_points, profiled
+from meshKernels.weights import WeightIndex
+
+def maya_useNewAPI():
+    pass
+
+class FeatherSlider(oma.MPxDeformerNode):
+    kPluginNodeId = om.MTypeId(0x80008)
+
+    # Attribute handles, created by nodeInitializer
+    featherMatrixAttr = om.MObject()
+    featherMatricesAttr = om.MObject()
+    featherIdsAttr = om.MObject()
+    instancedAttr = om.MObject()
+    batchAttr = om.MObject()
+    cacheAttr = om.MObject()
+    cacheBudgetAttr = om.MObject()
+    cacheHitsAttr = om.MObject()
+    cacheMissesAttr = om.MObject()
+    cacheEvictionsAttr = om.MObject()
 
-class FeatherSlider(om.MPxDeformerNode):
     def __init__(self):
-        om.MPxDeformerNode.__init__(self)
+        oma.MPxDeformerNode.__init__(self)
+        # geomIndex -> WeightIndex of the painted weights
+        self.weightIndices = {}
+        # geomIndex -> FeatherGroups of the feather id map, see instanced
+        self.featherGroups = {}
+        # Deformed points of previously seen inputs, see the cache attribute
+        self.outputCache = OutputCache()
 
+    @profiled("FeatherSlider.deform", points=iterated_points)
     def deform(self, data, itGeo, localToWorldMatrix, geomIndex):
         # Get the feather position matrix
         featherMatrix = self.getFeatherMatrix(data)
+        envelope = data.inputValue(self.envelope).asFloat()
+
+        # Painted weights are only read again after they were edited
+        weightIndex = self.getWeightIndex(data, geomIndex)
+
+        # Instanced mode: every point follows the matrix of its own feather
+        if data.inputValue(self.instancedAttr).asBool():
+            self.deformInstances(data, itGeo, geomIndex, weightIndex, envelope)
+            return
+
+        # Batch mode: one read, one array kernel and one write for every point
+        if data.inputValue(self.batchAttr).asBool() and self.isWholeGeometry(data, itGeo, geomIndex):
+            points = as_points(itGeo.allPositions())
+
+            key, deformed = self.lookupCache(data, (points, weightIndex.weights), [geomIndex, envelope] + list(featherMatrix))
+            if deformed is None:
+                if weightIndex.sparse:
+                    # Only the painted points are transformed
+                    deformed = weightIndex.scatter(points, feather_deform(
+                        weightIndex.gather(points), list(featherMatrix), weightIndex.values, envelope))
+                else:
+                    deformed = feather_deform(points, list(featherMatrix), weightIndex.weights, envelope)
+                if key is not None:
+                    self.outputCache.put(key, deformed)
+            self.setCacheCounters(data)
+
+            itGeo.setAllPositions(om.MPointArray(deformed.tolist()))
+            return
 
         # Iterate through the mesh vertices
+        weights = weightIndex.weights
         while not itGeo.isDone():
+            # Unpainted points keep their position
+            weight = weights[itGeo.index()] * envelope
+            if weight == 0.0:
+                itGeo.next()
+                continue
+
             # Get the vertex position
             position = itGeo.position()
 
             # Transform the position by the feather matrix
             newPosition = position * featherMatrix
 
-            # Set the new position of the vertex
-            itGeo.setPosition(newPosition)
+            # Set the weighted position of the vertex
+            itGeo.setPosition(position + (newPosition - position) * weight)
 
             # Move to the next vertex
             itGeo.next()
 
+    def deformInstances(self, data, itGeo, geomIndex, weightIndex, envelope):
+        """
+        Move every point by the featherMatrices element its featherIds value
+        points to, all feathers in one batched transform.
+        """
+        matrices = self.getFeatherMatrices(data)
+        groups = self.getFeatherGroups(data, geomIndex, weightIndex)
+
+        if self.isWholeGeometry(data, itGeo, geomIndex):
+            points = as_points(itGeo.allPositions())
+
+            key, deformed = self.lookupCache(data, (points, weightIndex.weights, groups.indices, groups.ids, matrices), [geomIndex, envelope])
+            if deformed is None:
+                deformed = feather_instances_deform(points, matrices, groups, weightIndex.weights, envelope)
+                if key is not None:
+                    self.outputCache.put(key, deformed)
+            self.setCacheCounters(data)
+
+            itGeo.setAllPositions(om.MPointArray(deformed.tolist()))
+            return
+
+        # Only some vertices are iterated, look their feather up one by one
+        featherIds = np.full(weightIndex.count, -1, dtype=np.int64)
+        featherIds[groups.indices] = groups.ids
+        featherMatrices = [om.MMatrix(matrix.ravel().tolist()) for matrix in matrices]
+        while not itGeo.isDone():
+            index = itGeo.index()
+            feather = featherIds[index]
+            if 0 <= feather < len(featherMatrices):
+                position = itGeo.position()
+                newPosition = position * featherMatrices[feather]
+                itGeo.setPosition(position + (newPosition - position) * (weightIndex.weights[index] * envelope))
+            itGeo.next()
+
+    def getFeatherMatrices(self, data):
+        """featherMatrices as an (M, 4, 4) array, missing elements are identities."""
+        arrayHandle = data.inputArrayValue(self.featherMatricesAttr)
+        elements = {}
+        for i in range(len(arrayHandle)):
+            arrayHandle.jumpToPhysicalElement(i)
+            elements[arrayHandle.elementLogicalIndex()] = list(arrayHandle.inputValue().asMatrix())
+
+        matrices = np.tile(np.eye(4), (max(elements) + 1 if elements else 0, 1, 1))
+        for index, values in elements.items():
+            matrices[index] = np.reshape(values, (4, 4))
+        return matrices
+
+    def getFeatherGroups(self, data, geomIndex, weightIndex):
+        """
+        Return the cached feather grouping of the painted points, rebuilding
+        it when there is none yet or the vertex count changed.
+        """
+        groups = self.featherGroups.get(geomIndex)
+        if groups is None or not groups.matches(weightIndex.count):
+            # Points past the end of the id map are not bound to a feather
+            featherIds = np.full(weightIndex.count, -1, dtype=np.int64)
+            idData = data.inputValue(self.featherIdsAttr).data()
+            if not idData.isNull():
+                values = np.array(om.MFnIntArrayData(idData).array(), dtype=np.int64)[:weightIndex.count]
+                featherIds[:len(values)] = values
+            groups = FeatherGroups(featherIds, weightIndex.indices)
+            self.featherGroups[geomIndex] = groups
+        return groups
+
     def getFeatherMatrix(self, data):
         # Get the feather matrix attribute
         featherMatrixAttr = data.inputValue(self.featherMatrixAttr)
@@ -31,22 +162,150 @@ class FeatherSlider(om.MPxDeformerNode):
 
         return featherMatrix
 
-    def nodeInitializer(self):
+    def lookupCache(self, data, arrays, values):
+        """
+        Return the cache key and the cached output of these inputs, or
+        (None, None) when the cache is off.
+        """
+        if not data.inputValue(self.cacheAttr).asBool():
+            self.outputCache.clear()
+            return None, None
+
+        self.outputCache.set_budget(data.inputValue(self.cacheBudgetAttr).asFloat() * MEGABYTE)
+        key = cache_key(arrays, values)
+        return key, self.outputCache.get(key)
+
+    def setCacheCounters(self, data):
+        for attr, value in ((self.cacheHitsAttr, self.outputCache.hits),
+                            (self.cacheMissesAttr, self.outputCache.misses),
+                            (self.cacheEvictionsAttr, self.outputCache.evictions)):
+            handle = data.outputValue(attr)
+            handle.setInt(value)
+            handle.setClean()
+
+    def isWholeGeometry(self, data, itGeo, geomIndex):
+        """
+        True when the iterator visits every vertex of the input mesh, so point
+        i of allPositions is vertex i.
+        """
+        inputHandle = data.outputArrayValue(self.input)
+        inputHandle.jumpToLogicalElement(geomIndex)
+        inputGeom = inputHandle.outputValue().child(self.inputGeom).asMesh()
+        return itGeo.exactCount() == om.MFnMesh(inputGeom).numVertices
+
+    def setDependentsDirty(self, plug, plugArray):
+        # Painting rebuilds the weight indices on the next evaluation, and the
+        # feather grouping, which only holds painted points
+        if plug.attribute() == self.weights:
+            self.weightIndices = {}
+            self.featherGroups = {}
+        if plug.attribute() == self.featherIdsAttr:
+            self.featherGroups = {}
+        return oma.MPxDeformerNode.setDependentsDirty(self, plug, plugArray)
+
+    def getWeightIndex(self, data, geomIndex):
+        """
+        Return the cached index of the points with a non-zero weight,
+        rebuilding it when there is none yet or the vertex count changed.
+        """
+        inputHandle = data.outputArrayValue(self.input)
+        inputHandle.jumpToLogicalElement(geomIndex)
+        inputGeom = inputHandle.outputValue().child(self.inputGeom).asMesh()
+        count = om.MFnMesh(inputGeom).numVertices
+
+        weightIndex = self.weightIndices.get(geomIndex)
+        if weightIndex is None or not weightIndex.matches(count):
+            weightIndex = WeightIndex(self.getWeights(data, geomIndex, count))
+            self.weightIndices[geomIndex] = weightIndex
+        return weightIndex
+
+    def getWeights(self, data, geomIndex, count):
+        """Painted deformer weights as a dense array, unpainted points weigh 1."""
+        weights = np.ones(count)
+        weightList = data.inputArrayValue(self.weightList)
+        try:
+            weightList.jumpToLogicalElement(geomIndex)
+        except RuntimeError:
+            return weights
+
+        weightHandle = om.MArrayDataHandle(weightList.inputValue().child(self.weights))
+        for i in range(len(weightHandle)):
+            weightHandle.jumpToPhysicalElement(i)
+            index = weightHandle.elementLogicalIndex()
+            if index < count:
+                weights[index] = weightHandle.inputValue().asFloat()
+        return weights
+
+    @staticmethod
+    def creator():
+        return FeatherSlider()
+
+    @staticmethod
+    def nodeInitializer():
         # Create the feather matrix attribute
         mAttr = om.MFnMatrixAttribute()
-        self.featherMatrixAttr = mAttr.create("featherMatrix", "fmat")
-        mAttr.setStorable(True)
+        FeatherSlider.featherMatrixAttr = mAttr.create("featherMatrix", "fmat")
+        mAttr.storable = True
 
         # Add the attribute to the node
-        self.addAttribute(self.featherMatrixAttr)
+        FeatherSlider.addAttribute(FeatherSlider.featherMatrixAttr)
+
+        # Create the instanced mode attributes: one matrix per feather and the
+        # feather id of every vertex, -1 for none
+        FeatherSlider.featherMatricesAttr = mAttr.create("featherMatrices", "fmts")
+        mAttr.array = True
+        mAttr.storable = True
+        FeatherSlider.addAttribute(FeatherSlider.featherMatricesAttr)
+
+        tAttr = om.MFnTypedAttribute()
+        FeatherSlider.featherIdsAttr = tAttr.create("featherIds", "fid", om.MFnData.kIntArray)
+        tAttr.storable = True
+        FeatherSlider.addAttribute(FeatherSlider.featherIdsAttr)
+
+        nAttr = om.MFnNumericAttribute()
+        FeatherSlider.instancedAttr = nAttr.create("instanced", "ins", om.MFnNumericData.kBoolean, False)
+        nAttr.storable = True
+        FeatherSlider.addAttribute(FeatherSlider.instancedAttr)
+
+        # Create the batch mode toggle
+        FeatherSlider.batchAttr = nAttr.create("batch", "bat", om.MFnNumericData.kBoolean, True)
+        nAttr.storable = True
+        FeatherSlider.addAttribute(FeatherSlider.batchAttr)
+
+        # Create the output cache attributes, the cache only serves batch mode
+        FeatherSlider.cacheAttr = nAttr.create("cache", "cch", om.MFnNumericData.kBoolean, False)
+        nAttr.storable = True
+        FeatherSlider.addAttribute(FeatherSlider.cacheAttr)
+
+        FeatherSlider.cacheBudgetAttr = nAttr.create("cacheBudget", "cbg", om.MFnNumericData.kFloat, 256.0)
+        nAttr.setMin(0.0)
+        nAttr.storable = True
+        FeatherSlider.addAttribute(FeatherSlider.cacheBudgetAttr)
+
+        # Hit, miss and eviction counters, read them with getAttr
+        FeatherSlider.cacheHitsAttr = nAttr.create("cacheHits", "chi", om.MFnNumericData.kInt, 0)
+        FeatherSlider.cacheMissesAttr = nAttr.create("cacheMisses", "cmi", om.MFnNumericData.kInt, 0)
+        FeatherSlider.cacheEvictionsAttr = nAttr.create("cacheEvictions", "cev", om.MFnNumericData.kInt, 0)
+        for attr in (FeatherSlider.cacheHitsAttr, FeatherSlider.cacheMissesAttr, FeatherSlider.cacheEvictionsAttr):
+            nAttr.setObject(attr)
+            nAttr.writable = False
+            nAttr.storable = False
+            FeatherSlider.addAttribute(attr)
 
         # Set the attribute as affect
-        self.attributeAffects(self.featherMatrixAttr, self.outputGeom)
+        FeatherSlider.attributeAffects(FeatherSlider.featherMatrixAttr, FeatherSlider.outputGeom)
+        FeatherSlider.attributeAffects(FeatherSlider.featherMatricesAttr, FeatherSlider.outputGeom)
+        FeatherSlider.attributeAffects(FeatherSlider.featherIdsAttr, FeatherSlider.outputGeom)
+        FeatherSlider.attributeAffects(FeatherSlider.instancedAttr, FeatherSlider.outputGeom)
+        FeatherSlider.attributeAffects(FeatherSlider.batchAttr, FeatherSlider.outputGeom)
+        FeatherSlider.attributeAffects(FeatherSlider.cacheAttr, FeatherSlider.outputGeom)
+        FeatherSlider.attributeAffects(FeatherSlider.cacheBudgetAttr, FeatherSlider.outputGeom)
 
 # Initialize the plugin
 def initializePlugin(obj):
     plugin = om.MFnPlugin(obj)
-    plugin.registerNode("featherSlider", FeatherSlider.kPluginNodeId, FeatherSlider.nodeInitializer, FeatherSlider.deform)
+    plugin.registerNode("featherSlider", FeatherSlider.kPluginNodeId, FeatherSlider.creator, FeatherSlider.nodeInitializer,
+                        om.MPxNode.kDeformerNode)
 
 # Uninitialize the plugin
 def uninitializePlugin(obj):
@@ -11,6 +11,8 @@ import maya.api.OpenMayaUI as OpenMayaUI
 import maya.api.OpenMayaAnim as OpenMayaAnim
 import maya.api.OpenMayaRender as OpenMayaRender
 
+from meshKernels.cache import SharedFileCache, file_key
+
 def maya_useNewAPI():
     """
     The presence of this function tells Maya that the plugin produces, and
@@ -18,6 +20,50 @@ def maya_useNewAPI():
     """
     pass
 IMAGEPATH = "file_path"
+## Seconds between two checks of the image files for a new save
+FILE_CHECK_PERIOD = 1.0
+
+#############################################################################
+##
+## Image and texture caches shared by every TestNode
+##
+#############################################################################
+def loadImage(path):
+    image = OpenMaya.MImage()
+    try:
+        image.readFromFile(path)
+    except RuntimeError:
+        return None
+    return image
+
+def acquireTexture(path):
+    textureManager = OpenMayaRender.MRenderer.getTextureManager()
+    if textureManager is None:
+        return None
+    return textureManager.acquireTexture(path, "")
+
+def releaseTexture(texture):
+    textureManager = OpenMayaRender.MRenderer.getTextureManager()
+    if textureManager is not None:
+        textureManager.releaseTexture(texture)
+
+## Decoded once per file and modification time, however many nodes show it
+imageCache = SharedFileCache(loadImage)
+textureCache = SharedFileCache(acquireTexture, releaseTexture)
+
+def checkImageFiles(*args):
+    """
+    Timer callback: redraw every TestNode whose image file was saved again,
+    each file is checked once however many nodes show it.
+    """
+    keys = {}
+    nodeIter = OpenMaya.MItDependencyNodes(OpenMaya.MFn.kPluginLocatorNode)
+    while not nodeIter.isDone():
+        fnNode = OpenMaya.MFnDependencyNode(nodeIter.thisNode())
+        if fnNode.typeId == TestNode.id:
+            fnNode.userNode().checkImageFile(keys)
+        nodeIter.next()
+
 #############################################################################
 ##
 ## Node implementation with standard viewport draw
@@ -28,21 +74,76 @@ class TestNode(OpenMayaUI.MPxLocatorNode):
     drawDbClassification = "drawdb/geometry/TestNode"
     drawRegistrantId = "TestNodePlugin"
 
+    imagePath = OpenMaya.MObject()
+    text = OpenMaya.MObject()
+    screenText = OpenMaya.MObject()
+
     @staticmethod
     def creator():
         return TestNode()
 
     @staticmethod
     def initialize():
-        pass
+        tAttr = OpenMaya.MFnTypedAttribute()
+        stringData = OpenMaya.MFnStringData()
+
+        # Image drawn on the viewport plane
+        TestNode.imagePath = tAttr.create("imagePath", "ip", OpenMaya.MFnData.kString, stringData.create(IMAGEPATH))
+        tAttr.usedAsFilename = True
+        TestNode.addAttribute(TestNode.imagePath)
+
+        # Text drawn in 3D space and on the viewport plane
+        TestNode.text = tAttr.create("text", "txt", OpenMaya.MFnData.kString, stringData.create("3D SPACE TEXT"))
+        TestNode.addAttribute(TestNode.text)
+        TestNode.screenText = tAttr.create("screenText", "stx", OpenMaya.MFnData.kString, stringData.create("2D SPACE TEXT"))
+        TestNode.addAttribute(TestNode.screenText)
 
     def __init__(self):
         OpenMayaUI.MPxLocatorNode.__init__(self)
-        # Getting all the Information
+        # Handle of the cached image the legacy draw shows
+        self.imageHandle = None
+        # (path, modification time) of imagePath, see imageKey
+        self.fileKey = None
 
     def compute(self, plug, data):
         return None
 
+    def setDependentsDirty(self, plug, plugArray):
+        # The draw override only prepares its data again when told to
+        if plug.attribute() in (TestNode.imagePath, TestNode.text, TestNode.screenText):
+            OpenMayaRender.MRenderer.setGeometryDrawDirty(self.thisMObject())
+        return OpenMayaUI.MPxLocatorNode.setDependentsDirty(self, plug, plugArray)
+
+    def imageKey(self, path):
+        """
+        (path, modification time) of the image file. The file is only looked
+        at when the path changed, checkImageFile notices a new save.
+        """
+        if self.fileKey is None or self.fileKey[0] != path:
+            self.fileKey = file_key(path)
+        return self.fileKey
+
+    def checkImageFile(self, keys):
+        """Redraw when the image file was saved again, ``keys`` holds the files already checked."""
+        if self.fileKey is None:
+            return
+        path = self.fileKey[0]
+        if path not in keys:
+            keys[path] = file_key(path)
+        if keys[path] != self.fileKey:
+            self.fileKey = keys[path]
+            OpenMayaRender.MRenderer.setGeometryDrawDirty(self.thisMObject())
+            OpenMayaUI.M3dView.scheduleRefreshAllViews()
+
+    def getImage(self):
+        """Cached image of imagePath, loaded only when the path or the file changed."""
+        path = OpenMaya.MPlug(self.thisMObject(), TestNode.imagePath).asString()
+        if self.imageHandle is None or self.imageHandle.key != self.imageKey(path):
+            if self.imageHandle is not None:
+                self.imageHandle.release()
+            self.imageHandle = imageCache.acquire(path)
+        return self.imageHandle.resource
+
     def draw(self, view, path, style, status):
     
         # Getting the OpenGL renderer
@@ -69,7 +170,8 @@ class TestNode(OpenMayaUI.MPxLocatorNode):
         view.setDrawColor( OpenMaya.MColor( (1.0, 1.0, 1.0, 1.0) ) )
         
         # Writing text on 3D space
-        view.drawText("3D SPACE TEXT", OpenMaya.MPoint(0,1,0), OpenMayaUIv1.M3dView.kCenter )
+        node = self.thisMObject()
+        view.drawText(OpenMaya.MPlug(node, TestNode.text).asString(), OpenMaya.MPoint(0,1,0), OpenMayaUIv1.M3dView.kCenter )
         
         # Getting the near and far plane for the viewport
         textPositionNearPlane = OpenMaya.MPoint()
@@ -80,14 +182,13 @@ class TestNode(OpenMayaUI.MPxLocatorNode):
         
         # Writing text in 2D space(drawing on the viewport plane)
         activeView.viewToWorld(500, 500, textPositionNearPlane, textPositionFarPlane )
-        activeView.drawText("2D SPACE TEXT", textPositionNearPlane, OpenMayaUI.M3dView.kCenter )
+        activeView.drawText(OpenMaya.MPlug(node, TestNode.screenText).asString(), textPositionNearPlane, OpenMayaUI.M3dView.kCenter )
             
-        # Drawing Image on Viewport
-        image = OpenMaya.MImage()
-        # Import image from a path
-        image.readFromFile(IMAGEPATH)
-        # Writing the image on viewport with the given x, y coordinates
-        view.writeColorBuffer(image, 100, 100)
+        # Drawing Image on Viewport, read from disk only once per file
+        image = self.getImage()
+        if image is not None:
+            # Writing the image on viewport with the given x, y coordinates
+            view.writeColorBuffer(image, 100, 100)
         
         # Disable Blend mode
         glFT.glDisable( OpenMayaRenderv1.MGL_BLEND )
@@ -104,8 +205,36 @@ class TestNode(OpenMayaUI.MPxLocatorNode):
 ##
 #############################################################################
 class TestNodeData(OpenMaya.MUserData):
+    """
+    Everything addUIDrawables needs, prepared when an attribute changes so
+    drawing neither allocates nor reads files.
+    """
     def __init__(self):
         OpenMaya.MUserData.__init__(self, False) ## don't delete after draw
+        self.text = ""
+        self.screenText = ""
+        self.textPosition = OpenMaya.MPoint(0, 1, 0)
+        self.textColor = OpenMaya.MColor((1.0, 1.0, 1.0, 1.0))
+        self.screenPosition = OpenMaya.MPoint(500, 500)
+        self.screenColor = OpenMaya.MColor((0.5, 0.3, 0.4, 1.0))
+
+        ## Shared texture of the image and where it goes on the viewport plane
+        self.texture = None
+        self.imageCenter = OpenMaya.MPoint(100, 100)
+        self.imageUp = OpenMaya.MVector(0, 1, 0)
+        self.imageScale = (0.0, 0.0)
+
+    def setTexture(self, path):
+        if self.texture is not None:
+            self.texture.release()
+        self.texture = textureCache.acquire(path) if path else None
+        if self.texture is None or self.texture.resource is None:
+            return
+
+        ## Image drawn with its lower left corner at (100, 100), like the legacy draw
+        description = self.texture.resource.textureDescription()
+        self.imageScale = (description.fWidth * 0.5, description.fHeight * 0.5)
+        self.imageCenter = OpenMaya.MPoint(100 + self.imageScale[0], 100 + self.imageScale[1])
 
 
 class TestNodeDrawOverride(OpenMayaRender.MPxDrawOverride):
@@ -118,7 +247,9 @@ class TestNodeDrawOverride(OpenMayaRender.MPxDrawOverride):
         return
 
     def __init__(self, obj):
-        OpenMayaRender.MPxDrawOverride.__init__(self, obj, TestNodeDrawOverride.draw)
+        ## not always dirty: prepareForDraw only runs after TestNode attributes
+        ## changed or checkImageFiles saw the image file saved again
+        OpenMayaRender.MPxDrawOverride.__init__(self, obj, TestNodeDrawOverride.draw, False)
         
     def supportedDrawAPIs(self):
         ## this plugin supports both GL and DX
@@ -130,6 +261,17 @@ class TestNodeDrawOverride(OpenMayaRender.MPxDrawOverride):
         if not isinstance(data, TestNodeData):
             data = TestNodeData()
 
+        node = objPath.node()
+        data.text = OpenMaya.MPlug(node, TestNode.text).asString()
+        data.screenText = OpenMaya.MPlug(node, TestNode.screenText).asString()
+
+        ## Only a new path or a file saved again acquires another texture,
+        ## decoded once for every node
+        path = OpenMaya.MPlug(node, TestNode.imagePath).asString()
+        imageKey = OpenMaya.MFnDependencyNode(node).userNode().imageKey(path)
+        if data.texture is None or data.texture.key != imageKey:
+            data.setTexture(path)
+
         return data
 
     def hasUIDrawables(self):
@@ -141,20 +283,27 @@ class TestNodeDrawOverride(OpenMayaRender.MPxDrawOverride):
             return
         drawManager.beginDrawable()
 
-        textColor = OpenMaya.MColor((1.0,1.0,1.0, 1.0))
-        drawManager.setColor( textColor )
-
-        drawManager.text( OpenMaya.MPoint(0, 1, 0), "3D SPACE TEXT", OpenMayaRender.MUIDrawManager.kCenter )
+        drawManager.setColor( locatordata.textColor )
+        drawManager.text( locatordata.textPosition, locatordata.text, OpenMayaRender.MUIDrawManager.kCenter )
 
-        textColor = OpenMaya.MColor((0.5, 0.3, 0.4, 1.0))
-        drawManager.setColor( textColor )
+        drawManager.setColor( locatordata.screenColor )
+        drawManager.text2d( locatordata.screenPosition, locatordata.screenText, OpenMayaRender.MUIDrawManager.kCenter )
 
-        drawManager.text2d( OpenMaya.MPoint(500, 500), "2D SPACE TEXT", OpenMayaRender.MUIDrawManager.kCenter )
+        texture = locatordata.texture.resource if locatordata.texture is not None else None
+        if texture is not None:
+            drawManager.setColor( locatordata.textColor )
+            drawManager.setTexture( texture )
+            drawManager.rect2d( locatordata.imageCenter, locatordata.imageUp, locatordata.imageScale[0], locatordata.imageScale[1], True )
+            drawManager.setTexture( None )
 
         drawManager.endDrawable()
 
         
+## Id of the checkImageFiles timer callback
+fileCheckCallback = None
+
 def initializePlugin(obj):
+    global fileCheckCallback
     plugin = OpenMaya.MFnPlugin(obj, "Name", "1.0", "Any")
 
     try:
@@ -169,9 +318,16 @@ def initializePlugin(obj):
         sys.stderr.write("Failed to register override\n")
         raise
 
+    fileCheckCallback = OpenMaya.MTimerMessage.addTimerCallback(FILE_CHECK_PERIOD, checkImageFiles)
+
 def uninitializePlugin(obj):
+    global fileCheckCallback
     plugin = OpenMaya.MFnPlugin(obj)
 
+    if fileCheckCallback is not None:
+        OpenMaya.MMessage.removeCallback(fileCheckCallback)
+        fileCheckCallback = None
+
     try:
         plugin.deregisterNode(TestNode.id)
     except:
@@ -183,3 +339,7 @@ def uninitializePlugin(obj):
     except:
         sys.stderr.write("Failed to deregister override\n")
         pass
+
+    ## Free the images and textures nobody released
+    imageCache.clear()
+    textureCache.clear()
@@ -0,0 +1,6 @@
+"""
+Maya-independent mesh kernels shared by the plugins in this repository.
+
+Everything in here works on plain NumPy arrays so it can be run and
+benchmarked outside of a Maya session.
+"""
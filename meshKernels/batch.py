@@ -0,0 +1,178 @@
+"""
+Batch proxy generation for many assets at once.
+
+Assets are mesh dumps (see ``meshKernels.mesh_dump``, written from Maya with
+``reduceCmd -dumpFile``), listed in a manifest or found in a directory. Every
+asset is reduced in a worker of a process pool with the same quadric
+reduction as ``generateProxyModel``, written to the output directory as soon
+as it finishes and recorded in a CSV report. Like the command, the reduction
+keeps the silhouette edges of the +Z view, or of the six axis views with
+``--axis-views``.
+
+Concurrency is the number of workers and memory is bounded per worker: an
+asset whose in-memory reduction would not fit the budget goes through the
+streaming simplifier instead, which keeps no silhouette edges, and workers
+are replaced after a fixed number of assets so their heaps do not keep
+growing over a night of jobs.
+
+A manifest lists one dump per line, optionally followed by a reduction
+percentage for that asset. Relative paths are relative to the manifest and
+``#`` starts a comment::
+
+    python -m meshKernels.batch assets.txt proxies/ --jobs 8 --reduction 50
+"""
+import argparse
+import csv
+import glob
+import multiprocessing
+import os
+import time
+
+from meshKernels.cache import MEGABYTE
+from meshKernels.edge_collapse import reduce_proxy
+from meshKernels.mesh_dump import MeshDump, write_mesh_dump
+from meshKernels.silhouette import AXIS_VIEWS, DEFAULT_VIEWS, silhouette_edges
+from meshKernels.streaming import simplify_dump
+from meshKernels.topology import MeshTopology
+
+DUMP_EXTENSION = ".mkmesh"
+REPORT_FIELDS = (
+    "asset", "output", "method", "input_vertices", "input_faces", "output_vertices",
+    "output_faces", "vertex_ratio", "face_ratio", "seconds", "error",
+)
+
+# traced peak of QuadricReducer per input vertex, mostly the per-vertex sets
+_REDUCER_BYTES_PER_VERTEX = 2048
+
+
+def read_manifest(path, reduction):
+    """Return (dump path, reduction) pairs from a manifest file."""
+    base = os.path.dirname(os.path.abspath(path))
+    assets = []
+    with open(path) as stream:
+        for line in stream:
+            fields = line.split("#", 1)[0].split()
+            if not fields:
+                continue
+            asset = os.path.join(base, os.path.expanduser(fields[0]))
+            assets.append((asset, float(fields[1]) if len(fields) > 1 else reduction))
+    return assets
+
+
+def collect_tasks(source, output_dir, reduction=50.0, max_memory=1024 * MEGABYTE, views=DEFAULT_VIEWS):
+    """
+    Build the worker tasks for a manifest file or a directory of dumps. Every
+    proxy keeps the file name of its asset, so the names must be unique, and
+    the silhouette edges of the ``views`` directions.
+    """
+    if os.path.isdir(source):
+        assets = [(path, reduction) for path in sorted(glob.glob(os.path.join(source, "*" + DUMP_EXTENSION)))]
+    else:
+        assets = read_manifest(source, reduction)
+
+    tasks = []
+    outputs = set()
+    for asset, percentage in assets:
+        output = os.path.join(output_dir, os.path.basename(asset))
+        if output in outputs:
+            raise ValueError("Several assets would be written to %s" % output)
+        outputs.add(output)
+        tasks.append((asset, output, percentage, int(max_memory), views))
+    return tasks
+
+
+def reduce_asset(task):
+    """
+    Reduce one asset and write its proxy. Runs in a worker process and
+    returns a report row; failures are reported instead of raised so that one
+    broken asset does not stop the batch.
+    """
+    asset, output, reduction, max_memory, views = task
+    row = dict.fromkeys(REPORT_FIELDS, "")
+    row.update(asset=asset, output=output)
+    start = time.perf_counter()
+    try:
+        dump = MeshDump(asset)
+        target = int(dump.num_points * (1.0 - reduction / 100.0))
+        if dump.num_points * _REDUCER_BYTES_PER_VERTEX <= max_memory:
+            row["method"] = "quadric"
+            points, counts, connects = dump.load()
+            topology = MeshTopology(counts, connects, num_vertices=len(points))
+            keep_edges = silhouette_edges(points, counts, connects, topology, views)
+            reducer = reduce_proxy(points, counts, connects, target, keep_edges, topology)
+            points, counts, connects = reducer.result()
+        else:
+            row["method"] = "streaming"
+            points, counts, connects = simplify_dump(dump, target, max_memory=max_memory)
+
+        # a proxy only appears under its final name once it is complete
+        partial = output + ".partial"
+        write_mesh_dump(partial, points, counts, connects)
+        os.replace(partial, output)
+
+        row.update(
+            input_vertices=dump.num_points,
+            input_faces=dump.num_faces,
+            output_vertices=len(points),
+            output_faces=len(counts),
+            vertex_ratio="%.4f" % (len(points) / float(max(dump.num_points, 1))),
+            face_ratio="%.4f" % (len(counts) / float(max(dump.num_faces, 1))),
+        )
+    except Exception as error:
+        row["error"] = "%s: %s" % (type(error).__name__, error)
+    row["seconds"] = "%.3f" % (time.perf_counter() - start)
+    return row
+
+
+def run_batch(tasks, report_path, jobs=None, tasks_per_worker=16, verbose=True):
+    """
+    Reduce every task on a pool of ``jobs`` processes, appending each report
+    row as soon as its asset finishes. Returns the rows in completion order.
+    """
+    rows = []
+    pool = multiprocessing.Pool(jobs or os.cpu_count(), maxtasksperchild=tasks_per_worker)
+    with pool, open(report_path, "w", newline="") as stream:
+        writer = csv.DictWriter(stream, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        for row in pool.imap_unordered(reduce_asset, tasks):
+            writer.writerow(row)
+            stream.flush()
+            rows.append(row)
+            if verbose:
+                status = row["error"] or "%s verts -> %s (%s)" % (
+                    row["input_vertices"], row["output_vertices"], row["method"])
+                print("[%d/%d] %s %ss: %s" % (len(rows), len(tasks), row["asset"], row["seconds"], status))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate proxies for many mesh dumps on a process pool.")
+    parser.add_argument("source", help="manifest file or directory of %s dumps" % DUMP_EXTENSION)
+    parser.add_argument("output", help="directory the proxies and the report are written to")
+    parser.add_argument("-r", "--reduction", type=float, default=50.0, help="default reduction percentage")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes, defaults to the CPU count")
+    parser.add_argument("-m", "--memory", type=int, default=1024, help="memory budget per worker in MB")
+    parser.add_argument("--tasks-per-worker", type=int, default=16,
+                        help="assets a worker reduces before it is replaced")
+    parser.add_argument("--axis-views", action="store_true",
+                        help="keep the silhouettes of the six axis views instead of the +Z view")
+    parser.add_argument("--report", help="CSV report path, defaults to report.csv in the output directory")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.output):
+        os.makedirs(args.output)
+    views = AXIS_VIEWS if args.axis_views else DEFAULT_VIEWS
+    tasks = collect_tasks(args.source, args.output, args.reduction, args.memory * MEGABYTE, views)
+    report = args.report or os.path.join(args.output, "report.csv")
+
+    start = time.perf_counter()
+    rows = run_batch(tasks, report, args.jobs, args.tasks_per_worker)
+    failed = sum(1 for row in rows if row["error"])
+    print("%d assets, %d failed, %.1fs wall, %.1fs in workers. Report: %s" % (
+        len(rows), failed, time.perf_counter() - start,
+        sum(float(row["seconds"]) for row in rows), report,
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Closest point queries against a triangle mesh.
+
+``TriangleBVH`` is a bounding volume hierarchy stored as a complete binary
+tree in implicit heap order (the children of node ``i`` are ``2i + 1`` and
+``2i + 2``). The triangles are split at the median of the longest axis of
+every node, level by level, and the last level holds fixed size leaves.
+
+Only the split order depends on the topology. When the collider points move
+the tree is refit by recomputing the boxes bottom up, which is a handful of
+array reductions instead of a rebuild.
+
+Queries traverse the tree for a whole batch of points at once, one level at a
+time. A greedy descent towards the nearest box first gives every point an
+upper bound on its distance, then every (point, node) pair whose box is
+farther away than that bound is pruned.
+"""
+import numpy as np
+
+_MAX_FRONTIER = 1 << 21
+
+# Relative slack on the seed bound when pruning, so a box or triangle that
+# rounds to just past the bound of its own seed leaf is still visited
+_BOUND_SLACK = 1e-9
+
+
+def closest_points_on_triangles(queries, a, b, c):
+    """
+    Closest point to every query on the matching triangle (a, b, c), for
+    (N, 3) arrays. This is the Voronoi region test from Ericson's
+    "Real-Time Collision Detection" with every branch evaluated as an array.
+    """
+    ab = b - a
+    ac = c - a
+    ap = queries - a
+    bp = queries - b
+    cp = queries - c
+
+    def dot(x, y):
+        return np.einsum("ij,ij->i", x, y)
+
+    d1 = dot(ab, ap)
+    d2 = dot(ac, ap)
+    d3 = dot(ab, bp)
+    d4 = dot(ac, bp)
+    d5 = dot(ab, cp)
+    d6 = dot(ac, cp)
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    # barycentric (s, t) of the closest point, result = a + s * ab + t * ac.
+    # Regions are assigned from the last test to the first, so the first
+    # matching test of the scalar algorithm wins.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        denom = va + vb + vc
+        s = vb / denom
+        t = vc / denom
+
+        edge = (d4 - d3) / ((d4 - d3) + (d5 - d6))
+        region = (va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0)
+        s = np.where(region, 1.0 - edge, s)
+        t = np.where(region, edge, t)
+
+        region = (vb <= 0) & (d2 >= 0) & (d6 <= 0)
+        s = np.where(region, 0.0, s)
+        t = np.where(region, d2 / (d2 - d6), t)
+
+        region = (d6 >= 0) & (d5 <= d6)
+        s = np.where(region, 0.0, s)
+        t = np.where(region, 1.0, t)
+
+        region = (vc <= 0) & (d1 >= 0) & (d3 <= 0)
+        s = np.where(region, d1 / (d1 - d3), s)
+        t = np.where(region, 0.0, t)
+
+        region = (d3 >= 0) & (d4 <= d3)
+        s = np.where(region, 1.0, s)
+        t = np.where(region, 0.0, t)
+
+        region = (d1 <= 0) & (d2 <= 0)
+        s = np.where(region, 0.0, s)
+        t = np.where(region, 0.0, t)
+
+    # degenerate triangles fall through every test with a zero denominator
+    invalid = ~(np.isfinite(s) & np.isfinite(t))
+    s[invalid] = 0.0
+    t[invalid] = 0.0
+    return a + ab * s[:, None] + ac * t[:, None]
+
+
+def median_split_order(centroids, num_leaves, leaf_size):
+    """
+    Order triangles so that every node of a complete binary tree over
+    ``num_leaves`` leaves, a power of two, is split at the median of its
+    longest axis. Returns the (num_leaves, leaf_size) triangles of every
+    leaf, slots past the number of triangles hold -1.
+    """
+    if num_leaves & (num_leaves - 1):
+        raise ValueError("num_leaves must be a power of two, got %d" % num_leaves)
+    order = np.full(num_leaves * leaf_size, -1, dtype=np.int64)
+    order[:len(centroids)] = np.arange(len(centroids))
+    # the -1 padding reads the last row, which sorts after every triangle
+    padded = np.vstack([centroids, np.full((1, 3), np.inf)])
+
+    depth = int(num_leaves - 1).bit_length()
+    for level in range(depth):
+        groups = 1 << level
+        positions = padded[order].reshape(groups, -1, 3)
+        valid = (order >= 0).reshape(groups, -1, 1)
+        lower = np.where(valid, positions, np.inf).min(axis=1)
+        upper = np.where(valid, positions, -np.inf).max(axis=1)
+        axis = (upper - lower).argmax(axis=1)
+
+        rows = np.arange(groups)[:, None]
+        keys = positions[rows, :, axis[:, None]][:, 0]
+        order = order.reshape(groups, -1)[rows, np.argsort(keys, axis=1, kind="stable")].ravel()
+    return order.reshape(num_leaves, leaf_size)
+
+
+def box_distances(queries, lower, upper):
+    """Squared distances from the queries to the nearest point of their box."""
+    near = np.maximum(np.maximum(lower - queries, queries - upper), 0.0)
+    return np.einsum("ij,ij->i", near, near)
+
+
+class TriangleBVH(object):
+    """
+    Bounding volume hierarchy over the triangles of a mesh.
+
+    Args:
+        points: (V, 3) collider points.
+        triangles: (T, 3) vertex ids of the collider triangles.
+        leaf_size: Number of triangles per leaf.
+    """
+
+    def __init__(self, points, triangles, leaf_size=2):
+        self.triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+        self.num_triangles = len(self.triangles)
+        self.leaf_size = int(leaf_size)
+        if self.leaf_size < 1:
+            raise ValueError("leaf_size must be at least 1, got %d" % self.leaf_size)
+
+        points = np.asarray(points, dtype=np.float64)[:, :3]
+        num_leaves = max(1, -(-self.num_triangles // self.leaf_size))
+        self.depth = int(num_leaves - 1).bit_length()
+        self.num_leaves = 1 << self.depth
+
+        centroids = points[self.triangles].mean(axis=1)
+        self.leaf_triangles = median_split_order(centroids, self.num_leaves, self.leaf_size)
+
+        num_nodes = 2 * self.num_leaves - 1
+        self.lower = np.empty((num_nodes, 3))
+        self.upper = np.empty((num_nodes, 3))
+        self.refit(points)
+
+    def refit(self, points):
+        """Update the boxes and normals for moved points with the same topology."""
+        self.points = np.asarray(points, dtype=np.float64)[:, :3]
+        corners = self.points[self.triangles]
+        normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        lengths = np.linalg.norm(normals, axis=1)
+        self.normals = normals / np.where(lengths > 0.0, lengths, 1.0)[:, None]
+
+        # the extra last row is the empty box of the -1 padding slots
+        lower = np.vstack([corners.min(axis=1), np.full((1, 3), np.inf)])
+        upper = np.vstack([corners.max(axis=1), np.full((1, 3), -np.inf)])
+        first_leaf = self.num_leaves - 1
+        self.lower[first_leaf:] = lower[self.leaf_triangles].min(axis=1)
+        self.upper[first_leaf:] = upper[self.leaf_triangles].max(axis=1)
+
+        for level in range(self.depth - 1, -1, -1):
+            nodes = np.arange((1 << level) - 1, (2 << level) - 1)
+            self.lower[nodes] = np.minimum(self.lower[2 * nodes + 1], self.lower[2 * nodes + 2])
+            self.upper[nodes] = np.maximum(self.upper[2 * nodes + 1], self.upper[2 * nodes + 2])
+
+    def closest_points(self, queries, max_distance=np.inf, chunk_size=8192):
+        """
+        Closest collider point to every query.
+
+        Returns (closest, triangles, distances). Queries with no triangle
+        within ``max_distance`` get triangle -1, an infinite distance and
+        their own position as the closest point.
+        """
+        queries = np.asarray(queries, dtype=np.float64)[:, :3]
+        closest = queries.copy()
+        triangles = np.full(len(queries), -1, dtype=np.int64)
+        distances = np.full(len(queries), np.inf)
+        if not self.num_triangles:
+            return closest, triangles, distances
+
+        for start in range(0, len(queries), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            closest[chunk], triangles[chunk], distances[chunk] = self._query(queries[chunk], max_distance)
+        return closest, triangles, distances
+
+    def signed_distances(self, queries, max_distance=np.inf):
+        """
+        ``closest_points`` plus the collider normals at the closest points and
+        distances that are negative behind the surface.
+        """
+        closest, triangles, distances = self.closest_points(queries, max_distance)
+        found = triangles >= 0
+        normals = np.zeros((len(closest), 3))
+        normals[found] = self.normals[triangles[found]]
+        inside = np.einsum("ij,ij->i", np.asarray(queries)[:, :3] - closest, normals) < 0.0
+        return closest, normals, np.where(inside, -distances, distances)
+
+    def _leaf_distances(self, queries, query_ids, leaves):
+        """Closest points of every query against every triangle of its leaf."""
+        candidates = self.leaf_triangles[leaves].ravel()
+        query_ids = np.repeat(query_ids, self.leaf_size)
+        valid = candidates >= 0
+        query_ids = query_ids[valid]
+        candidates = candidates[valid]
+
+        corners = self.points[self.triangles[candidates]]
+        points = closest_points_on_triangles(queries[query_ids], corners[:, 0], corners[:, 1], corners[:, 2])
+        offsets = queries[query_ids] - points
+        return query_ids, candidates, points, np.einsum("ij,ij->i", offsets, offsets)
+
+    def _query(self, queries, max_distance):
+        bound = np.minimum(self._seed_bounds(queries), float(max_distance) ** 2)
+        traversal = self._traverse(queries, bound)
+        if traversal is None:
+            # far away queries see most of the tree, halve the batch to keep
+            # the frontier within memory
+            half = len(queries) // 2
+            results = [self._query(queries[:half], max_distance), self._query(queries[half:], max_distance)]
+            return tuple(np.concatenate(arrays) for arrays in zip(*results))
+        hits, points, candidates, squared = traversal
+
+        closest = queries.copy()
+        triangles = np.full(len(queries), -1, dtype=np.int64)
+        distances = np.full(len(queries), np.inf)
+        closest[hits] = points
+        triangles[hits] = candidates
+        distances[hits] = np.sqrt(squared)
+        return closest, triangles, distances
+
+    def _seed_bounds(self, queries):
+        """
+        Squared distance from every query to the triangles of the leaf reached
+        by descending towards the nearest child box, an upper bound of the
+        true distance.
+        """
+        nodes = np.zeros(len(queries), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes + 1
+            right = left + 1
+            near_left = box_distances(queries, self.lower[left], self.upper[left])
+            near_right = box_distances(queries, self.lower[right], self.upper[right])
+            # inside both boxes, prefer the one whose centre is closer
+            with np.errstate(invalid="ignore"):
+                centre_left = queries - (self.lower[left] + self.upper[left]) * 0.5
+                centre_right = queries - (self.lower[right] + self.upper[right]) * 0.5
+            closer = np.einsum("ij,ij->i", centre_right, centre_right) < np.einsum("ij,ij->i", centre_left, centre_left)
+            nodes = np.where((near_right < near_left) | ((near_right == near_left) & closer), right, left)
+
+        query_ids, _, _, squared = self._leaf_distances(queries, np.arange(len(queries)), nodes - (self.num_leaves - 1))
+        bound = np.full(len(queries), np.inf)
+        np.minimum.at(bound, query_ids, squared)
+        return bound
+
+    def _traverse(self, queries, bound):
+        """
+        Exact nearest triangle of every query among the triangles closer than
+        its squared ``bound``. Returns the indices of the queries with a hit and
+        their closest points, triangles and squared distances, or None when
+        the frontier of a batch of several queries grows past
+        ``_MAX_FRONTIER`` (query, node) pairs.
+        """
+        bound = bound * (1.0 + _BOUND_SLACK)
+        query_ids = np.arange(len(queries))
+        nodes = np.zeros(len(queries), dtype=np.int64)
+        for _ in range(self.depth):
+            query_ids = np.repeat(query_ids, 2)
+            nodes = 2 * np.repeat(nodes, 2) + 1 + np.tile([0, 1], len(nodes))
+            near = box_distances(queries[query_ids], self.lower[nodes], self.upper[nodes])
+            keep = near <= bound[query_ids]
+            query_ids = query_ids[keep]
+            nodes = nodes[keep]
+            if len(query_ids) > _MAX_FRONTIER and len(queries) > 1:
+                return None
+
+        query_ids, candidates, points, squared = self._leaf_distances(
+            queries, query_ids, nodes - (self.num_leaves - 1))
+        within = squared <= bound[query_ids]
+        query_ids = query_ids[within]
+
+        # nearest candidate per query: sort by query then distance, keep the first
+        order = np.lexsort((squared[within], query_ids))
+        if len(order):
+            order = order[np.concatenate([[True], query_ids[order][1:] != query_ids[order][:-1]])]
+        first = np.flatnonzero(within)[order]
+        return query_ids[order], points[first], candidates[first], squared[first]
@@ -0,0 +1,188 @@
+"""
+Caches shared by the plugins.
+
+``OutputCache`` is an LRU cache of deformer outputs. A deformer fed the same
+input points and the same driving attribute values produces the same output,
+so scrubbing over frames it has already evaluated can copy the stored result
+instead of deforming again. Entries are keyed on a BLAKE2 digest of the input
+buffers and the attribute values, and the least recently used ones are
+evicted once the stored arrays exceed the byte budget.
+
+``SharedFileCache`` holds resources loaded from files (images, textures) once
+for every node that shows the same file, counting references so the last user
+to let go frees it.
+"""
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+MEGABYTE = 1024 * 1024
+
+
+def cache_key(arrays, values=()):
+    """
+    Digest of the contents of ``arrays`` (point buffers, weights) and the
+    numbers in ``values`` (attribute values, flattened matrices).
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(("%s%s" % (array.dtype.str, array.shape)).encode())
+        digest.update(array.data)
+    digest.update(np.asarray(values, dtype=np.float64).ravel().tobytes())
+    return digest.digest()
+
+
+class OutputCache(object):
+    """
+    Least recently used map from ``cache_key`` digests to output arrays.
+
+    Args:
+        budget: Maximum number of bytes held by the stored arrays.
+    """
+
+    def __init__(self, budget=256 * MEGABYTE):
+        self.budget = int(budget)
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the stored array for ``key`` or None, counting the hit or miss."""
+        array = self.entries.get(key)
+        if array is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return array
+
+    def put(self, key, array):
+        """Store a read-only copy of ``array``, evicting old entries past the budget."""
+        array = np.array(array)
+        if array.nbytes > self.budget:
+            return
+        array.setflags(write=False)
+
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.nbytes -= previous.nbytes
+        self.entries[key] = array
+        self.nbytes += array.nbytes
+        self.trim()
+
+    def set_budget(self, budget):
+        self.budget = int(budget)
+        self.trim()
+
+    def trim(self):
+        while self.nbytes > self.budget and self.entries:
+            _, array = self.entries.popitem(last=False)
+            self.nbytes -= array.nbytes
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "bytes": self.nbytes,
+            "budget": self.budget,
+        }
+
+
+def file_key(path):
+    """(path, modification time) of a file, the time is None when it does not exist."""
+    try:
+        return path, os.stat(path).st_mtime_ns
+    except OSError:
+        return path, None
+
+
+class SharedFileCache(object):
+    """
+    Reference counted map from files to the resources loaded from them.
+
+    A resource is keyed on its path and modification time, so a file that was
+    saved again loads as a new entry while nodes still holding the old one
+    keep it until they release it.
+
+    Args:
+        load: Callable loading the resource of a path.
+        unload: Optional callable freeing a resource nobody holds any more.
+    """
+
+    def __init__(self, load, unload=None):
+        self.load = load
+        self.unload = unload
+        # key -> [resource, reference count]
+        self.entries = {}
+        self.loads = 0
+
+    def acquire(self, path):
+        """Return a ``SharedFileHandle`` of the resource of ``path``, loading it if needed."""
+        key = file_key(path)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = [self.load(path), 0]
+            self.entries[key] = entry
+            self.loads += 1
+        entry[1] += 1
+        return SharedFileHandle(self, key, entry[0])
+
+    def release(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self.entries[key]
+            if self.unload is not None and entry[0] is not None:
+                self.unload(entry[0])
+
+    def clear(self):
+        """Free every resource, for plugin unloading."""
+        entries = list(self.entries.values())
+        self.entries.clear()
+        if self.unload is not None:
+            for resource, _ in entries:
+                if resource is not None:
+                    self.unload(resource)
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "references": sum(count for _, count in self.entries.values()),
+            "loads": self.loads,
+        }
+
+
+class SharedFileHandle(object):
+    """One reference to a ``SharedFileCache`` resource, released once."""
+
+    def __init__(self, cache, key, resource):
+        self.cache = cache
+        self.key = key
+        self.resource = resource
+
+    @property
+    def path(self):
+        return self.key[0]
+
+    def release(self):
+        if self.cache is not None:
+            self.cache.release(self.key)
+            self.cache = None
+            self.resource = None
+
+    def __del__(self):
+        self.release()
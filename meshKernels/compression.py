@@ -0,0 +1,89 @@
+"""
+Compression analysis for the wrinkle deformer.
+
+The compression of a vertex is the average of the positive
+``rest length - current length`` values over its edges, clamped to 1. The
+length change is a property of the edge, so it is measured once per
+undirected edge and then scattered to both end points. The edge list and the
+rest lengths only depend on the rest mesh, so they are computed once into a
+``RestState`` and reused for every evaluation.
+"""
+import numpy as np
+
+from meshKernels.topology import MeshTopology
+
+
+class RestState(object):
+    """
+    Undirected edges of a mesh and their rest lengths.
+
+    ``rest_lengths[i]`` is the rest length of ``edges[i]``, the i-th edge of
+    the topology.
+    """
+
+    def __init__(self, rest_points, counts, connects):
+        rest_points = np.asarray(rest_points, dtype=np.float64)[:, :3]
+        self.topology = MeshTopology(counts, connects, num_vertices=len(rest_points))
+        self.signature = topology_signature(len(rest_points), len(counts), len(connects))
+
+        self.edges = self.topology.edges.astype(np.int64)
+        self.rest_lengths = edge_lengths(rest_points, self.edges)
+
+    def matches(self, signature):
+        return self.signature == signature
+
+    def compression(self, points, vertices=None):
+        """
+        Per-vertex compression factors of the deformed ``points``, or only
+        those of ``vertices`` in that order, measuring just their own edges.
+        """
+        if vertices is not None:
+            return self.vertex_compression(points, vertices)
+
+        change = self.rest_lengths - edge_lengths(points, self.edges)
+        compressed = np.flatnonzero(change > 0.0)
+
+        # every compressed edge counts for both of its end points
+        ends = self.edges[compressed].ravel()
+        num_vertices = self.topology.num_vertices
+        total = np.bincount(ends, weights=np.repeat(change[compressed], 2), minlength=num_vertices)
+        count = np.bincount(ends, minlength=num_vertices)
+        result = np.zeros(num_vertices)
+        np.divide(total, count, out=result, where=count > 0)
+        return np.minimum(result, 1.0)
+
+    def vertex_compression(self, points, vertices):
+        """Compression of a subset of vertices, through the vertex -> edge CSR arrays."""
+        vertices = np.asarray(vertices, dtype=np.int64)
+        offsets = self.topology.vertex_offsets
+        starts = offsets[vertices]
+        valences = offsets[vertices + 1] - starts
+
+        # the edges of every listed vertex, one row per (vertex, edge) slot;
+        # an edge between two listed vertices is simply measured twice
+        rows = np.repeat(np.arange(len(vertices)), valences)
+        slots = np.arange(len(rows)) - np.repeat(np.cumsum(valences) - valences, valences)
+        edges = self.topology.vertex_edge_indices[np.repeat(starts, valences) + slots]
+
+        change = self.rest_lengths[edges] - edge_lengths(points, self.edges[edges])
+        compressed = change > 0.0
+        total = np.bincount(rows[compressed], weights=change[compressed], minlength=len(vertices))
+        count = np.bincount(rows[compressed], minlength=len(vertices))
+        result = np.zeros(len(vertices))
+        np.divide(total, count, out=result, where=count > 0)
+        return np.minimum(result, 1.0)
+
+
+def edge_lengths(points, edges):
+    """Length of every (E, 2) edge of the (V, 3) ``points``."""
+    points = np.asarray(points, dtype=np.float64)[:, :3]
+    delta = points[edges[:, 1]] - points[edges[:, 0]]
+    return np.sqrt(np.einsum("ij,ij->i", delta, delta))
+
+
+def topology_signature(num_vertices, num_faces, num_face_vertices):
+    """
+    Cheap identity of a mesh topology, used to invalidate cached state. The
+    three counts are available from MFnMesh without copying any mesh data.
+    """
+    return (int(num_vertices), int(num_faces), int(num_face_vertices))
@@ -0,0 +1,73 @@
+"""
+Array kernels for the Python deformers.
+
+Each kernel takes the (N, 3) positions of the points being deformed and
+returns new positions, so a deformer can read every point with
+``allPositions``, call one kernel and write the result back with
+``setAllPositions``. Per-point ``weights`` (the painted deformer weights) and
+``envelope`` blend the result with the input the way Maya deformers do.
+"""
+import numpy as np
+
+
+def as_points(points):
+    """(N, 3) float64 view of a point buffer, dropping a homogeneous w column."""
+    return np.asarray(points, dtype=np.float64).reshape(len(points), -1)[:, :3]
+
+
+def blend(points, deformed, weights=None, envelope=1.0):
+    """Return ``points + (deformed - points) * weights * envelope``."""
+    if weights is None:
+        if envelope == 1.0:
+            return deformed
+        scale = envelope
+    else:
+        scale = np.asarray(weights, dtype=np.float64)[:, None] * envelope
+    return points + (deformed - points) * scale
+
+
+def transform_points(points, matrix):
+    """
+    Multiply row-vector points by a 4x4 matrix, like ``MPoint * MMatrix``.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64).reshape(4, 4)
+    return points @ matrix[:3, :3] + matrix[3, :3]
+
+
+def feather_deform(points, matrix, weights=None, envelope=1.0):
+    """Transform every point by the feather matrix."""
+    points = as_points(points)
+    return blend(points, transform_points(points, matrix), weights, envelope)
+
+
+def wrinkle_deform(points, compression, intensity, weights=None, envelope=1.0):
+    """
+    Push points along +Y by ``compression * intensity`` where the surface is
+    compressed.
+    """
+    points = as_points(points)
+    offset = np.maximum(np.asarray(compression, dtype=np.float64), 0.0) * intensity * envelope
+    if weights is not None:
+        offset = offset * np.asarray(weights, dtype=np.float64)
+    deformed = points.copy()
+    deformed[:, 1] += offset
+    return deformed
+
+
+def collision_deform(points, closest, normals, distances, bounciness, friction, weights=None, envelope=1.0):
+    """
+    Resolve the points behind a collider, given the closest collider points,
+    normals and signed distances from ``TriangleBVH.signed_distances``.
+
+    A penetrating point is pushed out along the normal by ``bounciness`` times
+    its depth and pulled towards the closest surface point along the surface
+    by ``friction``, so bounciness and friction of 1 land it on the collider.
+    """
+    points = as_points(points)
+    inside = np.asarray(distances) < 0.0
+    depth = np.where(inside, -np.asarray(distances), 0.0)
+
+    offsets = points - closest
+    tangents = offsets - normals * np.einsum("ij,ij->i", offsets, normals)[:, None]
+    deformed = points + normals * (depth * bounciness)[:, None] - tangents * (inside * friction)[:, None]
+    return blend(points, deformed, weights, envelope)
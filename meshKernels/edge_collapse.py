@@ -0,0 +1,323 @@
+"""
+Incremental edge-collapse reduction.
+
+The mesh is described the same way ``MFnMesh.getVertices`` returns it: a flat
+array of per-polygon vertex counts and a flat array of vertex ids. Edge costs
+live in a binary heap with lazy invalidation, so each collapse only has to
+re-evaluate the edges around the surviving vertex.
+"""
+import heapq
+
+import numpy as np
+
+from meshKernels import quadrics as qem
+from meshKernels.topology import MeshTopology
+
+
+class EdgeCollapseReducer(object):
+    """
+    Collapse edges in order of increasing cost until a vertex budget is met.
+
+    The default cost is the edge length with the survivor placed at the
+    midpoint, which is what ``reduceCmd`` has always used. Subclasses can
+    override the batched ``evaluate`` to plug in a different metric.
+    """
+
+    def __init__(self, points, counts, connects, topology=None):
+        self.points = np.array(points, dtype=np.float64)[:, :3]
+        num_verts = len(self.points)
+
+        counts = np.asarray(counts, dtype=np.int64)
+        connects = np.asarray(connects, dtype=np.int64)
+        if topology is None:
+            topology = MeshTopology(counts, connects, num_vertices=num_verts)
+        self.topology = topology
+        self.edges = topology.edges.astype(np.int64)
+
+        # The topology index is immutable, the collapse loop works on mutable
+        # per-vertex sets seeded from it
+        offsets = np.cumsum(counts)[:-1]
+        self.faces = [face.tolist() for face in np.split(connects, offsets)] if len(counts) else []
+        self.vertex_faces = [set(faces.tolist()) for faces in topology.vertex_face_lists()]
+        self.neighbours = [set(verts.tolist()) for verts in topology.neighbour_lists()]
+
+        self.alive = np.ones(num_verts, dtype=bool)
+        self.version = [0] * num_verts
+        self.vertex_count = num_verts
+        self.collapse_count = 0
+        # (u, v, x, y, z) of every collapse in order, for progressive meshes
+        self.history = []
+        self.locked = set()
+        self.pinned = np.zeros(num_verts, dtype=bool)
+        self.heap = []
+
+    def evaluate(self, a, b):
+        """
+        Return (costs, positions) for collapsing the edges ``(a[i], b[i])``,
+        where ``a`` and ``b`` are integer arrays of vertex ids.
+        """
+        pa = self.points[a]
+        pb = self.points[b]
+        delta = pa - pb
+        return np.sqrt(np.einsum("ij,ij->i", delta, delta)), (pa + pb) * 0.5
+
+    def cost_at(self, a, b, positions):
+        """Cost of collapsing the edges ``(a[i], b[i])`` onto ``positions``."""
+        return self.evaluate(a, b)[0]
+
+    def placement(self, a, b):
+        """
+        ``evaluate``, except that an edge with a pinned end collapses onto
+        that end, at the cost of doing so.
+        """
+        costs, positions = self.evaluate(a, b)
+        if not self.pinned.any():
+            return costs, positions
+        a = np.asarray(a, dtype=np.int64)
+        b = np.asarray(b, dtype=np.int64)
+        on_a = self.pinned[a]
+        on_b = self.pinned[b] & ~on_a
+        positions[on_a] = self.points[a[on_a]]
+        positions[on_b] = self.points[b[on_b]]
+        moved = on_a | on_b
+        if moved.any():
+            costs[moved] = self.cost_at(a[moved], b[moved], positions[moved])
+        return costs, positions
+
+    def lock_edges(self, pairs):
+        """Exclude the given vertex pairs from ever being collapsed."""
+        self.locked.update((min(a, b), max(a, b)) for a, b in pairs)
+
+    def pin_vertices(self, vertices):
+        """Keep the given vertices where they are, edges only collapse onto them."""
+        self.pinned[np.asarray(vertices, dtype=np.int64)] = True
+
+    def build_heap(self):
+        edges = self.edges
+        if self.locked:
+            keep = [(a, b) not in self.locked for a, b in edges.tolist()]
+            edges = edges[np.array(keep, dtype=bool)]
+        costs, _ = self.placement(edges[:, 0], edges[:, 1])
+        self.heap = [
+            (cost, u, v, 0, 0)
+            for cost, (u, v) in zip(costs.tolist(), edges.tolist())
+        ]
+        heapq.heapify(self.heap)
+
+    def push_around(self, u):
+        """Re-evaluate and push every edge around vertex ``u``."""
+        others = [vert for vert in self.neighbours[u] if (min(u, vert), max(u, vert)) not in self.locked]
+        if not others:
+            return
+        others = np.array(others, dtype=np.int64)
+        costs, _ = self.placement(np.full(len(others), u), others)
+        version = self.version
+        for cost, vert in zip(costs.tolist(), others.tolist()):
+            if u < vert:
+                heapq.heappush(self.heap, (cost, u, vert, version[u], version[vert]))
+            else:
+                heapq.heappush(self.heap, (cost, vert, u, version[vert], version[u]))
+
+    def is_current(self, u, v, version_u, version_v):
+        return (
+            self.alive[u] and self.alive[v]
+            and self.version[u] == version_u and self.version[v] == version_v
+            and v in self.neighbours[u]
+        )
+
+    def is_boundary(self, u):
+        """True when an edge of vertex ``u`` belongs to a single face."""
+        edge_counts = {}
+        for face_id in self.vertex_faces[u]:
+            face = self.faces[face_id]
+            i = face.index(u)
+            for vert in (face[i - 1], face[(i + 1) % len(face)]):
+                edge_counts[vert] = edge_counts.get(vert, 0) + 1
+        return 1 in edge_counts.values()
+
+    def can_collapse(self, u, v):
+        """
+        Link condition: every vertex adjacent to both u and v must belong to a
+        face that contains the edge, otherwise the collapse pinches the surface.
+        An interior edge between two boundary vertices and a collapse leaving
+        a vertex without faces are rejected too, as ``result`` would drop
+        vertices that ``vertex_count`` still counts.
+        """
+        edge_faces = self.vertex_faces[u] & self.vertex_faces[v]
+        if not edge_faces:
+            return False
+        allowed = set()
+        for face_id in edge_faces:
+            face = self.faces[face_id]
+            # u and v must be consecutive, collapsing a polygon diagonal is not an edge collapse
+            i = face.index(u)
+            if v != face[i - 1] and v != face[(i + 1) % len(face)]:
+                return False
+            allowed.update(face)
+        if not (self.neighbours[u] & self.neighbours[v]) <= allowed:
+            return False
+
+        # The triangles on the edge disappear with it
+        removed = {face_id for face_id in edge_faces if len(self.faces[face_id]) == 3}
+        if (self.vertex_faces[u] | self.vertex_faces[v]) <= removed:
+            return False
+        for vert in allowed - {u, v}:
+            if self.vertex_faces[vert] <= removed:
+                return False
+
+        if len(edge_faces) > 1 and self.is_boundary(u) and self.is_boundary(v):
+            return False
+        return True
+
+    def collapse(self, u, v, position):
+        """Merge vertex v into vertex u and move u to ``position``."""
+        self.points[u] = position
+
+        for face_id in self.vertex_faces[v]:
+            face = [u if vert == v else vert for vert in self.faces[face_id]]
+            face = [vert for i, vert in enumerate(face) if vert != face[i - 1]]
+            if len(face) < 3:
+                for vert in self.faces[face_id]:
+                    if vert != v:
+                        self.vertex_faces[vert].discard(face_id)
+                self.faces[face_id] = None
+            else:
+                self.faces[face_id] = face
+                self.vertex_faces[u].add(face_id)
+        self.vertex_faces[v] = set()
+
+        touched = (self.neighbours[u] | self.neighbours[v]) - {u, v}
+        new_neighbours = set()
+        for face_id in self.vertex_faces[u]:
+            face = self.faces[face_id]
+            i = face.index(u)
+            new_neighbours.add(face[i - 1])
+            new_neighbours.add(face[(i + 1) % len(face)])
+        for vert in touched:
+            self.neighbours[vert].discard(v)
+            if vert in new_neighbours:
+                self.neighbours[vert].add(u)
+            else:
+                self.neighbours[vert].discard(u)
+        self.neighbours[u] = new_neighbours
+        self.neighbours[v] = set()
+
+        self.alive[v] = False
+        self.history.append((u, v) + tuple(self.points[u].tolist()))
+        self.version[u] += 1
+        self.vertex_count -= 1
+        self.collapse_count += 1
+
+    def reduce(self, target_vertex_count):
+        """Collapse edges until at most ``target_vertex_count`` vertices remain."""
+        if not self.heap:
+            self.build_heap()
+
+        heap = self.heap
+        while heap and self.vertex_count > target_vertex_count:
+            _, u, v, version_u, version_v = heapq.heappop(heap)
+            if not self.is_current(u, v, version_u, version_v):
+                continue
+            if not self.can_collapse(u, v):
+                continue
+            if self.pinned[v]:
+                if self.pinned[u]:
+                    continue
+                # The pinned vertex survives
+                u, v = v, u
+
+            _, positions = self.placement([u], [v])
+            self.collapse(u, v, positions[0])
+            self.push_around(u)
+
+        return self.vertex_count
+
+    def reduce_levels(self, target_vertex_counts):
+        """
+        Collapse through several vertex budgets in a single pass and return
+        the ``result`` snapshot taken at each one, in the order given. The
+        collapse sequence is the same as reducing to the smallest budget, so
+        a chain of levels costs about as much as its most reduced level.
+        """
+        snapshots = {}
+        for target in sorted(set(target_vertex_counts), reverse=True):
+            self.reduce(target)
+            snapshots[target] = self.result()
+        return [snapshots[target] for target in target_vertex_counts]
+
+    def result(self):
+        """
+        Return the reduced mesh as (points, counts, connects) with vertices
+        renumbered so that only those referenced by a face are kept.
+        """
+        faces = [face for face in self.faces if face is not None]
+        used = np.zeros(len(self.points), dtype=bool)
+        counts = np.array([len(face) for face in faces], dtype=np.int64)
+        connects = np.fromiter(
+            (vert for face in faces for vert in face), dtype=np.int64, count=int(counts.sum())
+        )
+        used[connects] = True
+
+        remap = np.full(len(self.points), -1, dtype=np.int64)
+        remap[used] = np.arange(int(used.sum()))
+        return self.points[used].copy(), counts, remap[connects]
+
+
+class QuadricReducer(EdgeCollapseReducer):
+    """
+    Edge collapse driven by the quadric error metric.
+
+    Seeding the heap solves every edge in one batched call, and each collapse
+    re-solves the edges around the survivor as one small batch.
+    """
+
+    def __init__(self, points, counts, connects, topology=None):
+        EdgeCollapseReducer.__init__(self, points, counts, connects, topology)
+        self.quadrics = qem.vertex_quadrics(self.points, counts, connects)
+
+    def evaluate(self, a, b):
+        return qem.optimal_collapse(
+            self.quadrics[a] + self.quadrics[b], self.points[a], self.points[b]
+        )
+
+    def cost_at(self, a, b, positions):
+        return qem.quadric_error(self.quadrics[a] + self.quadrics[b], positions)
+
+    def collapse(self, u, v, position):
+        EdgeCollapseReducer.collapse(self, u, v, position)
+        self.quadrics[u] += self.quadrics[v]
+        self.quadrics[v] = 0.0
+
+
+def reduce_mesh(points, counts, connects, target_vertex_count, reducer_class=EdgeCollapseReducer):
+    """Convenience wrapper: reduce a mesh and return (points, counts, connects)."""
+    reducer = reducer_class(points, counts, connects)
+    reducer.reduce(target_vertex_count)
+    return reducer.result()
+
+
+def proxy_reducer(points, counts, connects, keep_edges=(), topology=None):
+    """
+    The ``generateProxyModel`` reducer: quadric collapses that never touch
+    ``keep_edges`` or, like the old ``is_edge_valid`` check, border and
+    non-manifold edges. Border vertices are pinned, so the outline of the
+    proxy stays where it is.
+    """
+    if topology is None:
+        topology = MeshTopology(counts, connects, num_vertices=len(points))
+    reducer = QuadricReducer(points, counts, connects, topology)
+    reducer.lock_edges(keep_edges)
+    border = topology.edges[topology.boundary_edges()]
+    reducer.lock_edges(border.tolist())
+    reducer.pin_vertices(border.ravel())
+    return reducer
+
+
+def reduce_proxy(points, counts, connects, target_vertex_count, keep_edges=(), topology=None):
+    """
+    Run the ``proxy_reducer`` down to ``target_vertex_count``. Returns the
+    reducer, so callers can read the result and the collapse count.
+    """
+    reducer = proxy_reducer(points, counts, connects, keep_edges, topology)
+    reducer.reduce(target_vertex_count)
+    return reducer
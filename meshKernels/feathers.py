@@ -0,0 +1,100 @@
+"""
+Instanced feather transforms for the feather slider.
+
+A groom or wing mesh holds many feather cards, each following its own
+matrix. A per-vertex feather id map binds every point to one matrix of an
+array (ids outside the array leave the point alone), and one evaluation moves
+every feather at once.
+
+``FeatherGroups`` is the part that only depends on the id map: the bound
+points sorted by feather id, with the range of every feather. It is built
+when the map is painted and reused while only the matrices animate. Points
+then either go through one gathered (N, 3, 3) multiply, or through one
+matrix product per feather on its contiguous slice, which is several times
+faster once feathers average a few dozen points.
+"""
+import numpy as np
+
+from meshKernels.deform import as_points, blend
+
+# Average points per feather above which the per-feather slices beat the
+# gathered multiply (about 50 on a 1M point mesh)
+SLICE_POINTS = 48
+
+
+class FeatherGroups(object):
+    """
+    Points bound to a feather, sorted by feather id.
+
+    Args:
+        feather_ids: Feather id of every point, negative for none.
+        indices: Optional subset of the points to consider, for example the
+            ones with a non-zero weight.
+    """
+
+    def __init__(self, feather_ids, indices=None):
+        feather_ids = np.asarray(feather_ids, dtype=np.int64).ravel()
+        self.count = len(feather_ids)
+        points = np.arange(self.count) if indices is None else np.asarray(indices, dtype=np.int64)
+        points = points[feather_ids[points] >= 0]
+
+        order = np.argsort(feather_ids[points], kind="stable")
+        self.indices = points[order]
+        self.ids = feather_ids[self.indices]
+        self.num_feathers = int(self.ids[-1]) + 1 if len(self.ids) else 0
+        # points of feather f are indices[offsets[f]:offsets[f + 1]]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(self.ids, minlength=self.num_feathers))])
+
+    def __len__(self):
+        return len(self.indices)
+
+    def matches(self, count):
+        return self.count == count
+
+    def bound(self, num_matrices):
+        """Number of leading sorted points whose feather has a matrix."""
+        return int(self.offsets[min(num_matrices, self.num_feathers)])
+
+    def transform(self, points, matrices):
+        """
+        Move the bound points of the (N, 3) ``points`` by the (M, 4, 4)
+        ``matrices`` of their feathers, as row vectors like
+        ``MPoint * MMatrix``. Returns the moved points in sorted order, the
+        first ``bound(M)`` of ``indices``.
+        """
+        matrices = np.asarray(matrices, dtype=np.float64).reshape(-1, 4, 4)
+        num_feathers = min(len(matrices), self.num_feathers)
+        bound = self.bound(len(matrices))
+        selected = points[self.indices[:bound]]
+        if not bound:
+            return selected
+
+        if bound >= num_feathers * SLICE_POINTS:
+            moved = np.empty_like(selected)
+            offsets = self.offsets.tolist()
+            for feather in range(num_feathers):
+                start, end = offsets[feather], offsets[feather + 1]
+                if start < end:
+                    matrix = matrices[feather]
+                    np.matmul(selected[start:end], matrix[:3, :3], out=moved[start:end])
+                    moved[start:end] += matrix[3, :3]
+            return moved
+
+        ids = self.ids[:bound]
+        return np.einsum("ni,nij->nj", selected, matrices[:, :3, :3][ids]) + matrices[:, 3, :3][ids]
+
+
+def feather_instances_deform(points, matrices, groups, weights=None, envelope=1.0):
+    """
+    Transform every point bound by ``groups`` by the matrix of its feather,
+    blended by its weight and the envelope. Other points are returned as is.
+    """
+    points = as_points(points)
+    moved = groups.transform(points, matrices)
+    indices = groups.indices[:len(moved)]
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)[indices]
+
+    result = points.copy()
+    result[indices] = blend(points[indices], moved, weights, envelope)
+    return result
@@ -0,0 +1,116 @@
+"""
+Flat binary mesh dumps that can be memory-mapped.
+
+A dump is a 32 byte header followed by three raw little-endian arrays::
+
+    magic        8 bytes   b"MKMESH01"
+    num_points   uint64
+    num_faces    uint64
+    num_corners  uint64
+    points       float64 (num_points, 3)
+    counts       int32   (num_faces,)
+    connects     int32   (num_corners,)
+
+which is the layout of ``MFnMesh.getPoints`` / ``MFnMesh.getVertices``.
+Opening a dump maps the arrays instead of reading them, so a batch job only
+pages in the parts of a very large scan it is currently working on.
+"""
+import numpy as np
+
+MAGIC = b"MKMESH01"
+HEADER = np.dtype([
+    ("magic", "S8"),
+    ("num_points", "<u8"),
+    ("num_faces", "<u8"),
+    ("num_corners", "<u8"),
+])
+
+_POINT_DTYPE = np.dtype("<f8")
+_INDEX_DTYPE = np.dtype("<i4")
+_WRITE_CHUNK = 1 << 20
+
+
+def write_mesh_dump(path, points, counts, connects):
+    """
+    Write (points, counts, connects) to ``path``. The arrays are copied in
+    chunks, so they can themselves be memory-mapped.
+    """
+    header = np.zeros((), dtype=HEADER)
+    header["magic"] = MAGIC
+    header["num_points"] = len(points)
+    header["num_faces"] = len(counts)
+    header["num_corners"] = len(connects)
+
+    with open(path, "wb") as stream:
+        stream.write(header.tobytes())
+        for start in range(0, len(points), _WRITE_CHUNK):
+            chunk = np.asarray(points[start:start + _WRITE_CHUNK])[:, :3]
+            np.ascontiguousarray(chunk, dtype=_POINT_DTYPE).tofile(stream)
+        for array in (counts, connects):
+            for start in range(0, len(array), _WRITE_CHUNK):
+                np.ascontiguousarray(array[start:start + _WRITE_CHUNK], dtype=_INDEX_DTYPE).tofile(stream)
+
+
+class MeshDump(object):
+    """
+    Read-only memory-mapped view of a mesh dump.
+
+    Args:
+        path: File written by ``write_mesh_dump``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        header = np.fromfile(path, dtype=HEADER, count=1)
+        if not len(header) or header["magic"][0] != MAGIC:
+            raise ValueError("%s is not a mesh dump" % path)
+        self.num_points = int(header["num_points"][0])
+        self.num_faces = int(header["num_faces"][0])
+        self.num_corners = int(header["num_corners"][0])
+
+        offset = HEADER.itemsize
+        self.points = self._map(offset, _POINT_DTYPE, (self.num_points, 3))
+        offset += self.points.nbytes
+        self.counts = self._map(offset, _INDEX_DTYPE, (self.num_faces,))
+        offset += self.counts.nbytes
+        self.connects = self._map(offset, _INDEX_DTYPE, (self.num_corners,))
+
+    def _map(self, offset, dtype, shape):
+        if not shape[0]:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+    def iter_faces(self, chunk_faces):
+        """
+        Yield (counts, connects) for consecutive blocks of ``chunk_faces``
+        faces, with ``connects`` holding the original vertex ids.
+        """
+        corner = 0
+        for start in range(0, self.num_faces, chunk_faces):
+            counts = np.asarray(self.counts[start:start + chunk_faces], dtype=np.int64)
+            end = corner + int(counts.sum())
+            yield counts, np.asarray(self.connects[corner:end], dtype=np.int64)
+            corner = end
+
+    def bounds(self, chunk_points=_WRITE_CHUNK):
+        """(lower, upper) corners of the bounding box, scanned in chunks."""
+        lower = np.full(3, np.inf)
+        upper = np.full(3, -np.inf)
+        for start in range(0, self.num_points, chunk_points):
+            chunk = self.points[start:start + chunk_points]
+            lower = np.minimum(lower, chunk.min(axis=0))
+            upper = np.maximum(upper, chunk.max(axis=0))
+        return lower, upper
+
+    def load(self):
+        """Copy the whole mesh into memory as (points, counts, connects)."""
+        return (
+            np.array(self.points, dtype=np.float64),
+            np.array(self.counts, dtype=np.int64),
+            np.array(self.connects, dtype=np.int64),
+        )
+
+
+def read_mesh_dump(path):
+    """Load a mesh dump into memory as (points, counts, connects)."""
+    return MeshDump(path).load()
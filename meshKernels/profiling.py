@@ -0,0 +1,182 @@
+"""
+Call timers for the deform, compute and doIt entry points of the plugins.
+
+Every instrumented method is wrapped by ``profiled`` and, while the shared
+``profiler`` is enabled, adds its wall time, one call and the number of
+points it processed to the totals of its node. The totals dump to JSON or
+CSV, one row per entry point and node, to see which deformer of a rig takes
+the frame budget. Inside Maya every call is also an event of the plugin's
+category in the Profiler window.
+
+While disabled a wrapped call costs one attribute check. Profiling starts
+with ``profiler.enable()`` or when the ``MESHKERNELS_PROFILE`` environment
+variable is set; if it names a ``.json`` or ``.csv`` file the totals are
+written there when the session exits::
+
+    from meshKernels.profiling import profiler
+    profiler.enable()
+    # play the shot
+    profiler.dump("/tmp/rig_profile.csv")
+"""
+import atexit
+import csv
+import functools
+import json
+import os
+import time
+
+try:
+    from maya.api import OpenMaya
+except ImportError:
+    OpenMaya = None
+
+ENVIRONMENT_VARIABLE = "MESHKERNELS_PROFILE"
+FIELDS = ("name", "node", "calls", "points", "total", "mean", "best", "worst", "points_per_second")
+
+
+class CallStats(object):
+    """Totals of one entry point on one node."""
+
+    __slots__ = ("calls", "points", "total", "best", "worst")
+
+    def __init__(self):
+        self.calls = 0
+        self.points = 0
+        self.total = 0.0
+        self.best = float("inf")
+        self.worst = 0.0
+
+    def add(self, elapsed, points):
+        self.calls += 1
+        self.points += points
+        self.total += elapsed
+        self.best = min(self.best, elapsed)
+        self.worst = max(self.worst, elapsed)
+
+
+class Profiler(object):
+    """
+    Totals of every profiled call, by entry point name and node name.
+
+    Args:
+        enabled: Record calls from the start.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        # (name, node) -> CallStats
+        self.stats = {}
+        # category name -> MProfiler category id
+        self.categories = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.stats.clear()
+
+    def record(self, name, node, elapsed, points=0):
+        stats = self.stats.get((name, node))
+        if stats is None:
+            stats = self.stats[(name, node)] = CallStats()
+        stats.add(elapsed, points)
+
+    def category(self, name):
+        """MProfiler category of the plugin owning ``name``, None outside Maya."""
+        if OpenMaya is None:
+            return None
+        plugin = name.split(".", 1)[0]
+        category = self.categories.get(plugin)
+        if category is None:
+            category = self.categories[plugin] = OpenMaya.MProfiler.addCategory(plugin, "%s plugin calls" % plugin)
+        return category
+
+    def call(self, name, function, instance, args, kwargs, points=None):
+        """Run and time ``function(instance, *args, **kwargs)``."""
+        category = self.category(name)
+        event = None
+        if category is not None:
+            event = OpenMaya.MProfiler.eventBegin(category, OpenMaya.MProfiler.kColorE_L3, name)
+
+        start = time.perf_counter()
+        try:
+            return function(instance, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            if event is not None:
+                OpenMaya.MProfiler.eventEnd(event)
+            count = points(instance, *args) if points is not None else 0
+            self.record(name, node_name(instance), elapsed, count)
+
+    def rows(self):
+        """One dict of ``FIELDS`` per entry point and node, slowest first."""
+        rows = []
+        for (name, node), stats in self.stats.items():
+            rows.append({
+                "name": name,
+                "node": node,
+                "calls": stats.calls,
+                "points": stats.points,
+                "total": stats.total,
+                "mean": stats.total / stats.calls,
+                "best": stats.best,
+                "worst": stats.worst,
+                "points_per_second": stats.points / stats.total if stats.total > 0 else 0.0,
+            })
+        rows.sort(key=lambda row: row["total"], reverse=True)
+        return rows
+
+    def dump(self, path):
+        """Write the totals to ``path``, as CSV for a ``.csv`` file and JSON otherwise."""
+        rows = self.rows()
+        with open(path, "w", newline="") as stream:
+            if path.lower().endswith(".csv"):
+                writer = csv.DictWriter(stream, FIELDS)
+                writer.writeheader()
+                writer.writerows(rows)
+            else:
+                json.dump({"calls": rows}, stream, indent=2)
+
+
+def node_name(instance):
+    """Name of the node a method runs on, None for commands."""
+    name = getattr(instance, "name", None)
+    if not callable(name):
+        return None
+    try:
+        return name()
+    except RuntimeError:
+        # Not attached to a node yet
+        return None
+
+
+def iterated_points(instance, data, iterator, *args):
+    """Point count of a deform call, from its geometry iterator."""
+    return iterator.count()
+
+
+def profiled(name, points=None):
+    """
+    Time every call of the decorated method under ``name``, for example
+    ``"WrinkleDeformer.deform"``; the part before the dot is the MProfiler
+    category. ``points`` optionally counts the points of a call from the
+    method arguments, like ``iterated_points``.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(instance, *args, **kwargs):
+            if not profiler.enabled:
+                return function(instance, *args, **kwargs)
+            return profiler.call(name, function, instance, args, kwargs, points)
+        return wrapper
+    return decorator
+
+
+profiler = Profiler(enabled=bool(os.environ.get(ENVIRONMENT_VARIABLE)))
+
+_profile_path = os.environ.get(ENVIRONMENT_VARIABLE, "")
+if _profile_path.lower().endswith((".json", ".csv")):
+    atexit.register(profiler.dump, _profile_path)
@@ -0,0 +1,160 @@
+"""
+Progressive meshes built from a recorded collapse sequence.
+
+A reducer logs every collapse it makes (``EdgeCollapseReducer.history``).
+Together with the original mesh that sequence describes the mesh at every
+vertex budget between the original and the most reduced one: the first ``k``
+collapses give the mesh with ``k`` fewer vertices. ``ProgressiveMesh`` keeps
+the current level and moves between levels by replaying collapses forwards or
+undoing them as vertex splits, so changing the budget costs time linear in
+the number of original vertices whose representative changes and no edge
+cost is ever evaluated again.
+
+Records are saved as a compact binary file::
+
+    magic          8 bytes   b"MKPMESH1"
+    num_points     uint64
+    num_faces      uint64
+    num_corners    uint64
+    num_collapses  uint64
+    points         float64 (num_points, 3)     original mesh
+    counts         int32   (num_faces,)
+    connects       int32   (num_corners,)
+    pairs          int32   (num_collapses, 2)  (u, v): v merged into u
+    positions      float64 (num_collapses, 3)  position of u after the merge
+"""
+import numpy as np
+
+MAGIC = b"MKPMESH1"
+HEADER = np.dtype([
+    ("magic", "S8"),
+    ("num_points", "<u8"),
+    ("num_faces", "<u8"),
+    ("num_corners", "<u8"),
+    ("num_collapses", "<u8"),
+])
+
+
+class ProgressiveMesh(object):
+    """
+    Original mesh plus an ordered collapse sequence, positioned at one level.
+
+    Args:
+        points: (V, 3) original points.
+        counts: Number of vertices of every original polygon.
+        connects: Flat original polygon vertex ids.
+        pairs: (K, 2) collapsed vertex pairs, the second merged into the first.
+        positions: (K, 3) position of the surviving vertex after each collapse.
+    """
+
+    def __init__(self, points, counts, connects, pairs, positions):
+        self.points = np.array(points, dtype=np.float64)[:, :3]
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.connects = np.asarray(connects, dtype=np.int64)
+        self.pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        self.positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        self.num_points = len(self.points)
+
+        # previous corner of every corner within its polygon, and its face
+        starts = np.repeat(np.cumsum(self.counts) - self.counts, self.counts)
+        local = np.arange(len(self.connects)) - starts
+        self.corner_faces = np.repeat(np.arange(len(self.counts)), self.counts)
+        self.previous_corners = starts + (local - 1) % np.repeat(self.counts, self.counts)
+
+        # representative of every original vertex at the current level, the
+        # original vertices each representative stands for and the positions
+        # overwritten by the applied collapses, for undoing them
+        self.representatives = np.arange(self.num_points)
+        self.members = [[vert] for vert in range(self.num_points)]
+        self.current = self.points.copy()
+        self.replaced = np.empty_like(self.positions)
+        self.level = 0
+
+    @classmethod
+    def from_reducer(cls, reducer, points, counts, connects):
+        """Progressive mesh of the collapses ``reducer`` made to the given original mesh."""
+        history = np.array(reducer.history, dtype=np.float64).reshape(-1, 5)
+        return cls(points, counts, connects, history[:, :2].astype(np.int64), history[:, 2:])
+
+    @classmethod
+    def load(cls, path):
+        header = np.fromfile(path, dtype=HEADER, count=1)
+        if not len(header) or header["magic"][0] != MAGIC:
+            raise ValueError("%s is not a progressive mesh record" % path)
+        sizes = [int(header[field][0]) for field in HEADER.names[1:]]
+        num_points, num_faces, num_corners, num_collapses = sizes
+
+        with open(path, "rb") as stream:
+            stream.seek(HEADER.itemsize)
+            points = np.fromfile(stream, dtype="<f8", count=num_points * 3).reshape(-1, 3)
+            counts = np.fromfile(stream, dtype="<i4", count=num_faces)
+            connects = np.fromfile(stream, dtype="<i4", count=num_corners)
+            pairs = np.fromfile(stream, dtype="<i4", count=num_collapses * 2).reshape(-1, 2)
+            positions = np.fromfile(stream, dtype="<f8", count=num_collapses * 3).reshape(-1, 3)
+        return cls(points, counts, connects, pairs, positions)
+
+    def save(self, path):
+        header = np.zeros((), dtype=HEADER)
+        header["magic"] = MAGIC
+        header["num_points"] = self.num_points
+        header["num_faces"] = len(self.counts)
+        header["num_corners"] = len(self.connects)
+        header["num_collapses"] = len(self.pairs)
+        with open(path, "wb") as stream:
+            stream.write(header.tobytes())
+            self.points.astype("<f8").tofile(stream)
+            self.counts.astype("<i4").tofile(stream)
+            self.connects.astype("<i4").tofile(stream)
+            self.pairs.astype("<i4").tofile(stream)
+            self.positions.astype("<f8").tofile(stream)
+
+    @property
+    def num_collapses(self):
+        return len(self.pairs)
+
+    @property
+    def vertex_count(self):
+        """Vertex count at the current level, counting like ``EdgeCollapseReducer.vertex_count``."""
+        return self.num_points - self.level
+
+    def set_level(self, level):
+        """Apply or undo collapses until exactly ``level`` of them are applied."""
+        level = min(max(int(level), 0), self.num_collapses)
+        representatives = self.representatives
+        members = self.members
+        while self.level < level:
+            u, v = self.pairs[self.level].tolist()
+            representatives[members[v]] = u
+            members[u].extend(members[v])
+            self.replaced[self.level] = self.current[u]
+            self.current[u] = self.positions[self.level]
+            self.level += 1
+        while self.level > level:
+            self.level -= 1
+            u, v = self.pairs[self.level].tolist()
+            # collapses are undone in reverse order, so the members of v are
+            # still the last ones appended to u
+            del members[u][len(members[u]) - len(members[v]):]
+            representatives[members[v]] = v
+            self.current[u] = self.replaced[self.level]
+
+    def set_vertex_count(self, vertex_count):
+        """Move to the level with ``vertex_count`` vertices, or the closest recorded one."""
+        self.set_level(self.num_points - int(vertex_count))
+
+    def result(self):
+        """
+        Return the mesh at the current level as (points, counts, connects),
+        renumbered like ``EdgeCollapseReducer.result``.
+        """
+        corners = self.representatives[self.connects]
+        keep = corners != corners[self.previous_corners]
+        counts = np.bincount(self.corner_faces[keep], minlength=len(self.counts))
+        faces = counts >= 3
+        keep &= faces[self.corner_faces]
+        corners = corners[keep]
+
+        used = np.zeros(self.num_points, dtype=bool)
+        used[corners] = True
+        remap = np.cumsum(used) - 1
+        return self.current[used].copy(), counts[faces], remap[corners]
@@ -0,0 +1,139 @@
+"""
+Quadric error metric (QEM) helpers.
+
+A quadric is the symmetric 4x4 matrix ``p p^T`` of a plane ``p = (a, b, c, d)``.
+Only the upper triangle is stored, packed as ten floats in the order::
+
+    aa ab ac ad bb bc bd cc cd dd
+
+so the quadrics of a whole mesh fit in one contiguous (V, 10) array.
+"""
+import numpy as np
+
+# (row, column) of each packed entry in the full 4x4 matrix
+PACKED_INDICES = np.array([
+    (0, 0), (0, 1), (0, 2), (0, 3),
+    (1, 1), (1, 2), (1, 3),
+    (2, 2), (2, 3),
+    (3, 3),
+])
+
+# packed slot of every entry of the full 4x4 matrix
+_FULL_TO_PACKED = np.zeros((4, 4), dtype=np.int64)
+for _slot, (_row, _col) in enumerate(PACKED_INDICES):
+    _FULL_TO_PACKED[_row, _col] = _slot
+    _FULL_TO_PACKED[_col, _row] = _slot
+
+
+def face_starts(counts):
+    """Offset of the first vertex of every face in the flat connects array."""
+    counts = np.asarray(counts, dtype=np.int64)
+    return np.cumsum(counts) - counts
+
+
+def face_planes(points, counts, connects):
+    """
+    Return the (F, 4) plane equations of every face.
+
+    Like ``ProxyModelCmd.calculate_plane`` the plane goes through the first
+    three vertices of the polygon. Degenerate faces get a zero plane, so they
+    contribute nothing to the quadrics.
+    """
+    points = np.asarray(points, dtype=np.float64)[:, :3]
+    connects = np.asarray(connects, dtype=np.int64)
+    starts = face_starts(counts)
+
+    p1 = points[connects[starts]]
+    p2 = points[connects[starts + 1]]
+    p3 = points[connects[starts + 2]]
+    normals = np.cross(p2 - p1, p3 - p1)
+    lengths = np.linalg.norm(normals, axis=1)
+    valid = lengths > 0.0
+    normals[valid] /= lengths[valid, None]
+    normals[~valid] = 0.0
+
+    d = -np.einsum("ij,ij->i", normals, p1)
+    return np.concatenate([normals, d[:, None]], axis=1)
+
+
+def plane_quadrics(planes):
+    """Packed (N, 10) quadrics of an (N, 4) array of planes."""
+    planes = np.asarray(planes, dtype=np.float64)
+    return planes[:, PACKED_INDICES[:, 0]] * planes[:, PACKED_INDICES[:, 1]]
+
+
+def vertex_quadrics(points, counts, connects):
+    """
+    Accumulate the face quadrics onto their vertices.
+
+    Returns a contiguous (V, 10) array where row ``i`` is the sum of the
+    quadrics of every face that uses vertex ``i``.
+    """
+    num_verts = len(points)
+    counts = np.asarray(counts, dtype=np.int64)
+    connects = np.asarray(connects, dtype=np.int64)
+
+    face_q = plane_quadrics(face_planes(points, counts, connects))
+    corner_q = np.repeat(face_q, counts, axis=0)
+
+    quadrics = np.empty((num_verts, 10), dtype=np.float64)
+    for slot in range(10):
+        quadrics[:, slot] = np.bincount(connects, weights=corner_q[:, slot], minlength=num_verts)
+    return quadrics
+
+
+def unpack(quadrics):
+    """Expand packed (..., 10) quadrics into full (..., 4, 4) matrices."""
+    return np.asarray(quadrics)[..., _FULL_TO_PACKED]
+
+
+def quadric_error(quadrics, positions):
+    """Evaluate ``v^T Q v`` for packed (N, 10) quadrics at (N, 3) positions."""
+    q = np.asarray(quadrics, dtype=np.float64)
+    x, y, z = np.asarray(positions, dtype=np.float64).T
+    return (
+        q[:, 0] * x * x + q[:, 4] * y * y + q[:, 7] * z * z
+        + 2.0 * (q[:, 1] * x * y + q[:, 2] * x * z + q[:, 5] * y * z)
+        + 2.0 * (q[:, 3] * x + q[:, 6] * y + q[:, 8] * z)
+        + q[:, 9]
+    )
+
+
+def optimal_collapse(quadrics, points_a, points_b, tolerance=1e-10):
+    """
+    Solve the collapse position and cost for a batch of edges at once.
+
+    ``quadrics`` holds the packed (E, 10) sum of both end-point quadrics. The
+    3x3 system ``A x = -b`` is solved in closed form through the adjugate of
+    the symmetric matrix ``A``. Rows whose determinant is too small relative
+    to the size of ``A`` fall back to the edge midpoint instead.
+
+    Returns (costs, positions) as (E,) and (E, 3) arrays.
+    """
+    q = np.asarray(quadrics, dtype=np.float64)
+    midpoints = (np.asarray(points_a, dtype=np.float64) + np.asarray(points_b, dtype=np.float64)) * 0.5
+
+    a, b, c, d, e, f = q[:, 0], q[:, 1], q[:, 2], q[:, 4], q[:, 5], q[:, 7]
+    r0, r1, r2 = -q[:, 3], -q[:, 6], -q[:, 8]
+
+    # unique entries of the (symmetric) adjugate
+    c00 = d * f - e * e
+    c01 = c * e - b * f
+    c02 = b * e - c * d
+    c11 = a * f - c * c
+    c12 = b * c - a * e
+    c22 = a * d - b * b
+    det = a * c00 + b * c01 + c * c02
+    scale = np.abs(q[:, [0, 1, 2, 4, 5, 7]]).max(axis=1) ** 3
+
+    solvable = np.abs(det) > tolerance * scale
+    positions = midpoints.copy()
+    if solvable.any():
+        inv_det = 1.0 / det[solvable]
+        r0, r1, r2 = r0[solvable], r1[solvable], r2[solvable]
+        positions[solvable, 0] = (c00[solvable] * r0 + c01[solvable] * r1 + c02[solvable] * r2) * inv_det
+        positions[solvable, 1] = (c01[solvable] * r0 + c11[solvable] * r1 + c12[solvable] * r2) * inv_det
+        positions[solvable, 2] = (c02[solvable] * r0 + c12[solvable] * r1 + c22[solvable] * r2) * inv_det
+
+    costs = np.maximum(quadric_error(q, positions), 0.0)
+    return costs, positions
@@ -0,0 +1,107 @@
+"""
+Wheel roll angles for the autoRoll nodes, for many wheels and frames at once.
+
+A wheel of radius ``r`` that travels ``d`` turns by ``d / r`` radians. The
+Python node drives the travel with time and speed, the C++ node with a
+distance and a speed multiplier and scales the angle by how much the wheel
+axis faces world X; both are the same formula::
+
+    angle = degrees(distance * speed / radius) * facing
+
+Every argument broadcasts like NumPy arrays, so times of shape (F, 1) against
+per-wheel speeds and radii of shape (W,) give the (F, W) angles of every wheel
+on every frame in one call. Bake scripts call this directly and the nodes
+call it for their single value.
+
+``PathDistances`` measures the distance a wheel travelled along its animated
+path, the array twin of the C++ ``RollPath``: prefix sums over the sampled
+positions make any frame an O(log n) lookup instead of an integration from
+the first frame.
+"""
+import numpy as np
+
+AXES = ("X", "Y", "Z")
+
+
+def wheel_facing(matrices, axis=0, backward=False):
+    """
+    World X component of the ``axis`` row of (..., 4, 4) wheel matrices,
+    negated for wheels rolling backward.
+    """
+    facing = np.asarray(matrices, dtype=np.float64)[..., axis, 0]
+    return -facing if backward else facing
+
+
+def roll_angles(distances, speeds=1.0, radii=1.0, matrices=None, axis=0, backward=False, wrap=False):
+    """
+    Roll angles in degrees.
+
+    Args:
+        distances: Travelled distances, or times for the time driven node.
+        speeds: Speed multipliers.
+        radii: Wheel radii.
+        matrices: Optional (..., 4, 4) wheel matrices, scaling every angle by
+            ``wheel_facing``.
+        axis: Matrix row of the wheel axis, 0, 1 or 2 for X, Y and Z.
+        backward: Roll the other way along the axis.
+        wrap: Keep the angles within (-360, 360) like ``fmod``.
+    """
+    angles = np.degrees(
+        np.asarray(distances, dtype=np.float64) * np.asarray(speeds, dtype=np.float64)
+        / np.asarray(radii, dtype=np.float64)
+    )
+    if matrices is not None:
+        angles = angles * wheel_facing(matrices, axis, backward)
+    if wrap:
+        angles = np.fmod(angles, 360.0)
+    return angles
+
+
+class PathDistances(object):
+    """
+    Distance travelled along a path sampled at increasing times.
+
+    The distance at a sample is the sum of the segment lengths before it. At
+    a time between two samples it is the distance at the earlier one plus
+    the straight distance to the position at that time, or the interpolated
+    segment length when no position is given. Times before the first sample
+    are at distance 0.
+
+    Args:
+        times: (S,) increasing sample times.
+        positions: (S, 3) positions at the sample times.
+    """
+
+    def __init__(self, times, positions):
+        self.times = np.asarray(times, dtype=np.float64).ravel()
+        self.positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        self.segments = np.sqrt(np.sum(np.diff(self.positions, axis=0) ** 2, axis=1))
+        self.prefix = np.concatenate([[0.0], np.cumsum(self.segments)])
+
+    @classmethod
+    def uniform(cls, start, step, positions):
+        """Path sampled every ``step`` from ``start``, like the autoRoll node samples it."""
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        return cls(start + np.arange(len(positions)) * float(step), positions)
+
+    def sample_indices(self, times):
+        """Index of the last sample at or before every time, -1 before the first."""
+        return np.searchsorted(self.times, times, side="right") - 1
+
+    def distances(self, times, positions=None):
+        """Distance travelled at every time, at the given (N, 3) positions if any."""
+        times = np.asarray(times, dtype=np.float64)
+        index = self.sample_indices(times)
+        started = index >= 0
+        index = np.clip(index, 0, len(self.times) - 1)
+
+        if positions is None:
+            # walk the segment to the next sample, nothing past the last one
+            following = np.minimum(index + 1, len(self.times) - 1)
+            span = self.times[following] - self.times[index]
+            fraction = np.divide(times - self.times[index], span, out=np.zeros_like(times), where=span > 0)
+            offset = np.append(self.segments, 0.0)[index] * np.minimum(fraction, 1.0)
+        else:
+            delta = np.asarray(positions, dtype=np.float64).reshape(times.shape + (3,)) - self.positions[index]
+            offset = np.sqrt(np.sum(delta ** 2, axis=-1))
+        return np.where(started, self.prefix[index] + offset, 0.0)
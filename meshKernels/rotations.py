@@ -0,0 +1,217 @@
+"""
+Rotation sample streams for the frame rotation interpolator.
+
+A stream is a list of (time, Euler rotation) samples. The Euler angles are
+turned into quaternion keys once, with every key on the same hemisphere as
+the one before so consecutive keys take the short way round, together with
+the squad control points between them. Evaluating any time is then a binary
+search for the bracketing keys and a slerp or squad between them, so sub-frame
+queries over a long shot cost O(log n) each and many of them go through in
+one call.
+
+Quaternions are (x, y, z, w) arrays and Euler angles are in degrees in the XYZ
+rotation order, the defaults of ``MEulerRotation`` and ``MQuaternion``. The
+interpolated angles are the solution closest to the samples' own angles, so
+they stay continuous through 90 degrees of Y and past 180 degrees on any axis.
+"""
+import numpy as np
+
+SLERP = "slerp"
+SQUAD = "squad"
+METHODS = (SLERP, SQUAD)
+
+# Below this angle between keys slerp falls back to a normalized lerp
+_LINEAR_DOT = 1.0 - 1e-9
+
+# Past this sine of Y the rotation is taken as gimbal locked, X and Z only
+# turn together and their split comes from the reference angles
+_GIMBAL_SIN = 1.0 - 1e-14
+
+
+def euler_to_quaternions(rotations):
+    """(..., 4) quaternions of (..., 3) XYZ Euler angles in degrees."""
+    half = np.radians(np.asarray(rotations, dtype=np.float64)) * 0.5
+    cx, cy, cz = np.cos(half[..., 0]), np.cos(half[..., 1]), np.cos(half[..., 2])
+    sx, sy, sz = np.sin(half[..., 0]), np.sin(half[..., 1]), np.sin(half[..., 2])
+    # X first, then Y, then Z
+    return np.stack([
+        sx * cy * cz - cx * sy * sz,
+        cx * sy * cz + sx * cy * sz,
+        cx * cy * sz - sx * sy * cz,
+        cx * cy * cz + sx * sy * sz,
+    ], axis=-1)
+
+
+def quaternions_to_euler(quaternions, reference=None):
+    """
+    (..., 3) XYZ Euler angles in degrees of (..., 4) unit quaternions.
+
+    Without ``reference`` the angles are the principal ones, Y in [-90, 90].
+    With (..., 3) ``reference`` angles they are the equivalent angles closest
+    to those: either solution, any turn added to each axis, and at 90
+    degrees of Y the X and Z split of the reference.
+    """
+    x, y, z, w = np.moveaxis(np.asarray(quaternions, dtype=np.float64), -1, 0)
+    sin_y = np.clip(2.0 * (w * y - x * z), -1.0, 1.0)
+    euler = np.degrees(np.stack([
+        np.arctan2(2.0 * (w * x + y * z), 1.0 - 2.0 * (x * x + y * y)),
+        np.arcsin(sin_y),
+        np.arctan2(2.0 * (w * z + x * y), 1.0 - 2.0 * (y * y + z * z)),
+    ], axis=-1))
+
+    # At +90 degrees of Y only X - Z is defined, at -90 only X + Z
+    gimbal = np.abs(sin_y) > _GIMBAL_SIN
+    side = np.sign(sin_y)
+    coupled = np.degrees(2.0 * np.arctan2(x, w))
+    if gimbal.any():
+        euler[..., 0] = np.where(gimbal, wrap(coupled, 0.0), euler[..., 0])
+        euler[..., 1] = np.where(gimbal, 90.0 * side, euler[..., 1])
+        euler[..., 2] = np.where(gimbal, 0.0, euler[..., 2])
+    if reference is None:
+        return euler
+
+    reference = np.broadcast_to(np.asarray(reference, dtype=np.float64), euler.shape)
+    # (x, y, z) and (x + 180, 180 - y, z + 180) are the same rotation
+    other = euler * (1.0, -1.0, 1.0) + (180.0, 180.0, 180.0)
+    candidates = wrap(np.stack([euler, other]), reference)
+    cost = np.sum(np.abs(candidates - reference), axis=-1)
+    result = np.where((cost[1] < cost[0])[..., None], candidates[1], candidates[0])
+
+    if gimbal.any():
+        # keep X -+ Z and move both the same amount from the reference
+        linked = reference[..., 0] - side * reference[..., 2]
+        shift = (wrap(coupled, linked) - linked) * 0.5
+        result[..., 0] = np.where(gimbal, reference[..., 0] + shift, result[..., 0])
+        result[..., 2] = np.where(gimbal, reference[..., 2] - side * shift, result[..., 2])
+    return result
+
+
+def wrap(angles, reference):
+    """``angles`` in degrees plus the whole turns that bring them closest to ``reference``."""
+    return angles + 360.0 * np.round((reference - angles) / 360.0)
+
+
+def multiply(a, b):
+    """Hamilton product ``a * b`` of (..., 4) quaternions, b applied first."""
+    ax, ay, az, aw = np.moveaxis(a, -1, 0)
+    bx, by, bz, bw = np.moveaxis(b, -1, 0)
+    return np.stack([
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw,
+        aw * bw - ax * bx - ay * by - az * bz,
+    ], axis=-1)
+
+
+def conjugate(quaternions):
+    return quaternions * np.array([-1.0, -1.0, -1.0, 1.0])
+
+
+def log(quaternions):
+    """Logarithm of unit quaternions, as pure quaternions."""
+    vector = quaternions[..., :3]
+    sin_half = np.sqrt(np.sum(vector * vector, axis=-1))
+    half = np.arctan2(sin_half, quaternions[..., 3])
+    scale = np.divide(half, sin_half, out=np.ones_like(half), where=sin_half > 1e-12)
+    return np.concatenate([vector * scale[..., None], np.zeros(half.shape + (1,))], axis=-1)
+
+
+def exp(quaternions):
+    """Exponential of pure quaternions, as unit quaternions."""
+    vector = quaternions[..., :3]
+    half = np.sqrt(np.sum(vector * vector, axis=-1))
+    scale = np.divide(np.sin(half), half, out=np.ones_like(half), where=half > 1e-12)
+    return np.concatenate([vector * scale[..., None], np.cos(half)[..., None]], axis=-1)
+
+
+def slerp(a, b, t):
+    """Spherical interpolation from (..., 4) ``a`` to ``b`` by (...) ``t``, the short way."""
+    t = np.asarray(t, dtype=np.float64)[..., None]
+    dot = np.sum(a * b, axis=-1, keepdims=True)
+    b = np.where(dot < 0.0, -b, b)
+    dot = np.abs(dot)
+
+    angle = np.arccos(np.minimum(dot, 1.0))
+    sin_angle = np.sin(angle)
+    curved = dot < _LINEAR_DOT
+    safe = np.where(curved, sin_angle, 1.0)
+    wa = np.where(curved, np.sin((1.0 - t) * angle) / safe, 1.0 - t)
+    wb = np.where(curved, np.sin(t * angle) / safe, t)
+    result = a * wa + b * wb
+    return result / np.sqrt(np.sum(result * result, axis=-1, keepdims=True))
+
+
+class RotationSamples(object):
+    """
+    Quaternion keys of a rotation sample stream, ready for interpolation.
+
+    Args:
+        times: (S,) sample times, sorted on construction.
+        rotations: (S, 3) XYZ Euler angles in degrees.
+    """
+
+    def __init__(self, times, rotations):
+        times = np.asarray(times, dtype=np.float64).ravel()
+        rotations = np.asarray(rotations, dtype=np.float64).reshape(-1, 3)
+        if len(times) != len(rotations):
+            raise ValueError("%d sample times for %d rotations" % (len(times), len(rotations)))
+        if not len(times):
+            raise ValueError("A rotation stream needs at least one sample")
+
+        order = np.argsort(times, kind="stable")
+        self.times = times[order]
+        self.eulers = rotations[order]
+        keys = euler_to_quaternions(self.eulers)
+
+        # flip every key onto the hemisphere of the previous one
+        flips = np.sum(keys[1:] * keys[:-1], axis=-1) < 0.0
+        signs = np.concatenate([[1.0], np.where(np.cumsum(flips) % 2, -1.0, 1.0)])
+        self.keys = keys * signs[:, None]
+        self.controls = self.squad_controls(self.keys)
+
+    @staticmethod
+    def squad_controls(keys):
+        """Inner control points s_i = q_i exp(-(log(q_i^-1 q_i+1) + log(q_i^-1 q_i-1)) / 4)."""
+        previous = np.concatenate([keys[:1], keys[:-1]])
+        following = np.concatenate([keys[1:], keys[-1:]])
+        inverse = conjugate(keys)
+        tangent = log(multiply(inverse, following)) + log(multiply(inverse, previous))
+        return multiply(keys, exp(tangent * -0.25))
+
+    def __len__(self):
+        return len(self.times)
+
+    def intervals(self, times):
+        """Bracketing key and blend factor of every time, held past both ends."""
+        times = np.asarray(times, dtype=np.float64)
+        index = np.clip(np.searchsorted(self.times, times, side="right") - 1, 0, max(len(self.times) - 2, 0))
+        following = np.minimum(index + 1, len(self.times) - 1)
+        span = self.times[following] - self.times[index]
+        factor = np.divide(times - self.times[index], span, out=np.zeros_like(times), where=span > 0)
+        return index, following, np.clip(factor, 0.0, 1.0)
+
+    def quaternions(self, times, method=SLERP):
+        """(..., 4) interpolated quaternions at ``times``."""
+        return self.interpolate(*self.intervals(times), method=method)
+
+    def interpolate(self, index, following, factor, method=SLERP):
+        """(..., 4) quaternions from the keys of ``intervals``."""
+        a = self.keys[index]
+        b = self.keys[following]
+        if method == SLERP:
+            return slerp(a, b, factor)
+        if method == SQUAD:
+            outer = slerp(a, b, factor)
+            inner = slerp(self.controls[index], self.controls[following], factor)
+            return slerp(outer, inner, 2.0 * factor * (1.0 - factor))
+        raise ValueError("Unknown interpolation %r, expected one of %s" % (method, ", ".join(METHODS)))
+
+    def rotations(self, times, method=SLERP):
+        """
+        (..., 3) interpolated XYZ Euler angles in degrees at ``times``, the
+        solution closest to the blend of the bracketing samples' angles.
+        """
+        index, following, factor = self.intervals(times)
+        first = self.eulers[index]
+        reference = first + (self.eulers[following] - first) * factor[..., None]
+        return quaternions_to_euler(self.interpolate(index, following, factor, method), reference)
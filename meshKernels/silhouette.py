@@ -0,0 +1,79 @@
+"""
+Silhouette edges of a polygon mesh for a set of views.
+
+An interior edge lies on the silhouette of a view when one of its two faces
+points towards the viewer and the other away. Views are either directions
+(orthographic cameras, axis views) or eye positions (perspective cameras),
+where the view vector differs per face. Every view is tested for every edge
+at once through the edge -> face CSR arrays of ``MeshTopology``.
+"""
+import numpy as np
+
+from meshKernels import quadrics as qem
+
+# looking down +X, -X, +Y, -Y, +Z and -Z
+AXIS_VIEWS = np.array([
+    (1.0, 0.0, 0.0), (-1.0, 0.0, 0.0),
+    (0.0, 1.0, 0.0), (0.0, -1.0, 0.0),
+    (0.0, 0.0, 1.0), (0.0, 0.0, -1.0),
+])
+
+# the +Z view, protected by generateProxyModel when it is given no view
+DEFAULT_VIEWS = AXIS_VIEWS[4:5]
+
+
+def face_centroids(points, counts, connects):
+    """(F, 3) average of the vertices of every polygon."""
+    points = np.asarray(points, dtype=np.float64)[:, :3]
+    counts = np.asarray(counts, dtype=np.int64)
+    faces = np.repeat(np.arange(len(counts)), counts)
+    corners = points[np.asarray(connects, dtype=np.int64)]
+    sums = np.stack([np.bincount(faces, weights=corners[:, axis], minlength=len(counts)) for axis in range(3)], axis=1)
+    return sums / np.maximum(counts, 1)[:, None]
+
+
+def silhouette_mask(points, counts, connects, topology, directions=(), eyes=()):
+    """
+    Boolean mask over ``topology.edges`` of the edges on the silhouette of
+    any of the views.
+
+    Args:
+        points: (V, 3) mesh points.
+        counts: Number of vertices of every polygon.
+        connects: Flat polygon vertex ids.
+        topology: ``MeshTopology`` of the mesh.
+        directions: (D, 3) view directions.
+        eyes: (P, 3) eye positions of perspective views.
+    """
+    normals = qem.face_planes(points, counts, connects)[:, :3]
+    mask = np.zeros(topology.num_edges, dtype=bool)
+
+    # only edges shared by exactly two faces have a front and a back side
+    edges = np.flatnonzero(topology.edge_face_counts() == 2)
+    first = topology.edge_face_indices[topology.edge_face_offsets[edges]]
+    second = topology.edge_face_indices[topology.edge_face_offsets[edges] + 1]
+
+    directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+    if len(directions):
+        facing = normals @ directions.T
+        mask[edges] |= (np.sign(facing[first]) * np.sign(facing[second]) < 0).any(axis=1)
+
+    eyes = np.asarray(eyes, dtype=np.float64).reshape(-1, 3)
+    if len(eyes):
+        centroids = face_centroids(points, counts, connects)
+        # n . (c - e) per face and eye, without the (F, P, 3) view vectors
+        facing = (
+            np.einsum("ij,ij->i", normals, centroids)[:, None] - normals @ eyes.T
+        )
+        mask[edges] |= (np.sign(facing[first]) * np.sign(facing[second]) < 0).any(axis=1)
+    return mask
+
+
+def silhouette_edges(points, counts, connects, topology, directions=DEFAULT_VIEWS, eyes=()):
+    """
+    (E, 2) vertex pairs of the edges on the silhouette of any of the views,
+    the edges the proxy reducer keeps. The views default to the +Z view of
+    ``generateProxyModel``; see ``silhouette_mask`` for the arguments.
+    """
+    mask = silhouette_mask(points, counts, connects, topology, directions, eyes)
+    return topology.edges[mask].tolist()
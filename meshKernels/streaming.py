@@ -0,0 +1,276 @@
+"""
+Out-of-core simplification of meshes too large to hold in memory.
+
+This is the vertex clustering of Lindstrom's "Out-of-Core Simplification of
+Large Polygonal Models". Space is cut into a uniform grid and every occupied
+cell collapses into one vertex. The faces of a mesh dump are streamed in
+fixed size chunks: each triangle adds its area weighted plane quadric to the
+cells of its three corners and, when those cells are all different, survives
+as a triangle between the cells. Every cell is finally placed at the point
+that minimises its accumulated quadric, clamped to the cell.
+
+Cells are identified by their global grid coordinates, so a cluster cut by a
+chunk boundary keeps accumulating from the next chunk and the simplified
+chunks stitch together without seams. Memory is the chunk working set plus
+the per-cell accumulators, which grow with the output rather than the input.
+
+Run it as a batch job outside of Maya with::
+
+    python -m meshKernels.streaming scan.mkmesh proxy.mkmesh --target 500000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from meshKernels import quadrics as qem
+from meshKernels.cache import MEGABYTE
+from meshKernels.mesh_dump import MeshDump, write_mesh_dump
+from meshKernels.topology import triangulate
+
+# rough bytes of temporaries per streamed face, used to size the chunks
+_BYTES_PER_FACE = 1024
+# bytes of the accumulators per cell (key, quadric, position sum, weight)
+# and per surviving triangle (three cell keys)
+_BYTES_PER_CELL = 8 + 80 + 24 + 8
+_BYTES_PER_TRIANGLE = 24
+# bytes of temporaries per sampled point while choosing the resolution
+_BYTES_PER_SAMPLE = 128
+# merging and solving the accumulators briefly holds about two more copies
+_MERGE_OVERHEAD = 3
+
+
+def _sum_by_key(keys, columns):
+    """Sorted unique ``keys`` and the sums of the (N, C) ``columns`` rows per key."""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    sums = np.empty((len(unique), columns.shape[1]))
+    for column in range(columns.shape[1]):
+        sums[:, column] = np.bincount(inverse, weights=columns[:, column], minlength=len(unique))
+    return unique, sums
+
+
+def _unique_triangles(triangles):
+    """
+    Drop repeated (N, 3) triangles. Every row is first rotated to start at its
+    smallest id, which keeps the winding.
+    """
+    if not len(triangles):
+        return triangles
+    first = triangles.argmin(axis=1)[:, None]
+    triangles = np.take_along_axis(triangles, (first + np.arange(3)) % 3, axis=1)
+    order = np.lexsort(triangles.T[::-1])
+    triangles = triangles[order]
+    keep = np.concatenate([[True], (triangles[1:] != triangles[:-1]).any(axis=1)])
+    return triangles[keep]
+
+
+class ClusterGrid(object):
+    """
+    Quadric accumulators of the occupied cells of a uniform grid.
+
+    Chunk results are buffered and merged into the sorted accumulators once
+    they outgrow them, so every row is merged a logarithmic number of times.
+
+    Args:
+        lower: Lower corner of the bounding box of the mesh.
+        upper: Upper corner of the bounding box of the mesh.
+        resolution: Number of cells along the longest side of the box.
+    """
+
+    def __init__(self, lower, upper, resolution):
+        self.lower = np.asarray(lower, dtype=np.float64)
+        extent = np.asarray(upper, dtype=np.float64) - self.lower
+        self.resolution = max(int(resolution), 1)
+        self.cell_size = float(extent.max()) / self.resolution or 1.0
+        self.shape = np.maximum(np.ceil(extent / self.cell_size).astype(np.int64), 1)
+
+        # per cell: packed quadric, position sum and number of corners
+        self.keys = np.empty(0, dtype=np.int64)
+        self.values = np.empty((0, 14))
+        self.triangles = np.empty((0, 3), dtype=np.int64)
+        self.pending = []
+        self.pending_rows = 0
+
+    def cell_keys(self, positions):
+        """Flat grid index of the cell holding every (N, 3) position."""
+        cells = np.floor((positions - self.lower) / self.cell_size).astype(np.int64)
+        np.clip(cells, 0, self.shape - 1, out=cells)
+        return (cells[:, 0] * self.shape[1] + cells[:, 1]) * self.shape[2] + cells[:, 2]
+
+    def cell_boxes(self, keys):
+        """(lower, upper) corners of the cells with the given flat indices."""
+        cells = np.stack([
+            keys // (self.shape[1] * self.shape[2]),
+            keys // self.shape[2] % self.shape[1],
+            keys % self.shape[2],
+        ], axis=1)
+        lower = self.lower + cells * self.cell_size
+        return lower, lower + self.cell_size
+
+    def add_triangles(self, corners):
+        """Accumulate a chunk of triangles given as their (T, 3, 3) corners."""
+        corners = np.asarray(corners, dtype=np.float64)
+        keys = self.cell_keys(corners.reshape(-1, 3)).reshape(-1, 3)
+
+        normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        lengths = np.linalg.norm(normals, axis=1)
+        normals /= np.where(lengths > 0.0, lengths, 1.0)[:, None]
+        planes = np.concatenate([normals, -np.einsum("ij,ij->i", normals, corners[:, 0])[:, None]], axis=1)
+        quadrics = qem.plane_quadrics(planes) * (lengths * 0.5)[:, None]
+
+        values = np.concatenate([
+            np.repeat(quadrics, 3, axis=0),
+            corners.reshape(-1, 3),
+            np.ones((len(keys) * 3, 1)),
+        ], axis=1)
+        cells = _sum_by_key(keys.ravel(), values)
+
+        distinct = (keys[:, 0] != keys[:, 1]) & (keys[:, 1] != keys[:, 2]) & (keys[:, 2] != keys[:, 0])
+        triangles = _unique_triangles(keys[distinct])
+
+        self.pending.append((cells, triangles))
+        self.pending_rows += len(cells[0]) + len(triangles)
+        if self.pending_rows > len(self.keys) + len(self.triangles):
+            self.flush()
+
+    def flush(self):
+        """Merge the buffered chunk results into the accumulators."""
+        if not self.pending:
+            return
+        keys = np.concatenate([self.keys] + [cells[0] for cells, _ in self.pending])
+        values = np.concatenate([self.values] + [cells[1] for cells, _ in self.pending])
+        triangles = np.concatenate([self.triangles] + [tris for _, tris in self.pending])
+        self.pending = []
+        self.pending_rows = 0
+
+        self.keys, self.values = _sum_by_key(keys, values)
+        self.triangles = _unique_triangles(triangles)
+
+    @property
+    def nbytes(self):
+        rows = len(self.keys) + self.pending_rows
+        return rows * _BYTES_PER_CELL + len(self.triangles) * _BYTES_PER_TRIANGLE
+
+    def result(self):
+        """
+        Return the simplified mesh as (points, counts, connects), keeping only
+        the cells used by a surviving triangle.
+        """
+        self.flush()
+        triangles = np.searchsorted(self.keys, self.triangles)
+        used = np.zeros(len(self.keys), dtype=bool)
+        used[triangles.ravel()] = True
+
+        keys = self.keys[used]
+        values = self.values[used]
+        means = values[:, 10:13] / values[:, 13:14]
+        _, points = qem.optimal_collapse(values[:, :10], means, means)
+        lower, upper = self.cell_boxes(keys)
+        points = np.clip(points, lower, upper)
+
+        remap = np.cumsum(used) - 1
+        return points, np.full(len(triangles), 3, dtype=np.int64), remap[triangles].ravel()
+
+
+def choose_resolution(dump, target_vertex_count, bounds=None, sample_size=1 << 20):
+    """
+    Grid resolution that gives roughly ``target_vertex_count`` occupied cells.
+
+    The cells are counted on an evenly strided sample of the points. Past an
+    eighth of the sample the count saturates, so larger targets extrapolate
+    from there assuming the number of cells of a surface grows with the
+    square of the resolution.
+    """
+    lower, upper = dump.bounds() if bounds is None else bounds
+    stride = max(1, -(-dump.num_points // sample_size))
+    sample = np.asarray(dump.points[::stride], dtype=np.float64)
+    reachable = max(1, min(target_vertex_count, len(sample) // 8))
+
+    low, high = 1, 1 << 20
+    while low < high:
+        middle = (low + high) // 2
+        keys = np.sort(ClusterGrid(lower, upper, middle).cell_keys(sample))
+        occupied = 1 + np.count_nonzero(keys[1:] != keys[:-1])
+        if occupied < reachable:
+            low = middle + 1
+        else:
+            high = middle
+    return max(1, int(round(low * np.sqrt(float(target_vertex_count) / reachable))))
+
+
+def simplify_dump(dump, target_vertex_count=None, resolution=None, max_memory=512 * MEGABYTE, chunk_faces=None):
+    """
+    Simplify a mesh dump without loading it.
+
+    Args:
+        dump: ``MeshDump`` or path of a mesh dump.
+        target_vertex_count: Approximate vertex budget, used to pick the grid
+            resolution when ``resolution`` is not given.
+        resolution: Number of cells along the longest side of the bounding box.
+        max_memory: Byte budget for the chunk working set and the cell
+            accumulators together. A quarter of it sizes the chunks, and a
+            MemoryError is raised if the accumulators, with the copies made
+            while merging them, outgrow the rest.
+        chunk_faces: Faces per chunk, overriding the size derived from
+            ``max_memory``. A ValueError is raised when the chunk working
+            set leaves no room in ``max_memory`` for the accumulators.
+
+    Returns (points, counts, connects) of the simplified triangle mesh.
+    """
+    if not isinstance(dump, MeshDump):
+        dump = MeshDump(dump)
+    if resolution is None and target_vertex_count is None:
+        raise ValueError("Either a target vertex count or a grid resolution is required")
+
+    bounds = dump.bounds()
+    if chunk_faces is None:
+        # a quarter of the budget, and at least 1024 faces if that leaves the
+        # accumulators half of it
+        chunk_faces = max(1, min(max(1024, int(max_memory) // 4 // _BYTES_PER_FACE),
+                                 int(max_memory) // 2 // _BYTES_PER_FACE))
+    if resolution is None:
+        resolution = choose_resolution(
+            dump, target_vertex_count, bounds, sample_size=chunk_faces * _BYTES_PER_FACE // _BYTES_PER_SAMPLE)
+    accumulator_budget = int(max_memory) - chunk_faces * _BYTES_PER_FACE
+    if chunk_faces < 1 or accumulator_budget <= 0:
+        raise ValueError(
+            "Chunks of %d faces do not fit in the %d MB budget, use smaller chunks "
+            "or a larger budget" % (chunk_faces, max_memory // MEGABYTE)
+        )
+
+    grid = ClusterGrid(bounds[0], bounds[1], resolution)
+    for counts, connects in dump.iter_faces(chunk_faces):
+        grid.add_triangles(dump.points[triangulate(counts, connects)])
+        if grid.nbytes * _MERGE_OVERHEAD > accumulator_budget:
+            raise MemoryError(
+                "Grid resolution %d needs more than the %d MB budget, use a lower "
+                "resolution or a larger budget" % (resolution, max_memory // MEGABYTE)
+            )
+    return grid.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simplify a mesh dump without loading it into memory.")
+    parser.add_argument("input", help="mesh dump to simplify")
+    parser.add_argument("output", help="mesh dump to write")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("-t", "--target", type=int, help="approximate output vertex count")
+    group.add_argument("-r", "--resolution", type=int, help="cells along the longest side of the bounds")
+    parser.add_argument("-m", "--memory", type=int, default=512, help="memory budget in MB")
+    parser.add_argument("-c", "--chunk-faces", type=int, help="faces read per chunk")
+    args = parser.parse_args()
+
+    dump = MeshDump(args.input)
+    start = time.perf_counter()
+    points, counts, connects = simplify_dump(
+        dump, args.target, args.resolution, args.memory * MEGABYTE, args.chunk_faces,
+    )
+    write_mesh_dump(args.output, points, counts, connects)
+    print("%s: %d verts %d faces -> %d verts %d faces in %.2fs" % (
+        args.input, dump.num_points, dump.num_faces, len(points), len(counts),
+        time.perf_counter() - start,
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Compact, Maya-independent mesh topology index.
+
+``MeshTopology`` is built once from the bulk ``MFnMesh.getVertices`` output
+(and optionally ``getEdgeVertices``, to keep Maya's edge numbering) and then
+answers adjacency queries without touching Maya again:
+
+* vertex -> edge, vertex -> vertex and vertex -> face as CSR arrays
+* edge -> face as a CSR array
+* (min, max) vertex pair -> edge through an open-addressing hash table
+
+Every CSR adjacency is an ``offsets`` array of length N + 1 and a flat
+``indices`` array, so the neighbours of item ``i`` are
+``indices[offsets[i]:offsets[i + 1]]``.
+"""
+import numpy as np
+
+_EMPTY = -1
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+_MASK64 = (1 << 64) - 1
+
+
+def face_edges(counts, connects):
+    """
+    Return every (min, max) vertex pair walked by the polygons, one row per
+    face-vertex, without removing duplicates.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    connects = np.asarray(connects, dtype=np.int64)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    local = np.arange(len(connects)) - starts
+    nxt = starts + (local + 1) % np.repeat(counts, counts)
+    pairs = np.stack([connects, connects[nxt]], axis=1)
+    pairs.sort(axis=1)
+    return pairs
+
+
+def unique_edges(counts, connects):
+    """Return the unique undirected edges of a polygon mesh as an (E, 2) array."""
+    pairs = face_edges(counts, connects)
+    if not len(pairs):
+        return pairs
+    # sorting packed 64-bit keys is much faster than np.unique(axis=0)
+    stride = int(pairs.max()) + 1
+    keys = np.sort(pairs[:, 0] * stride + pairs[:, 1])
+    keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])]
+    return np.stack([keys // stride, keys % stride], axis=1)
+
+
+def triangulate(counts, connects):
+    """Fan-triangulate every polygon into an (F, 3) array of vertex ids."""
+    counts = np.asarray(counts, dtype=np.int64)
+    connects = np.asarray(connects, dtype=np.int64)
+    starts = np.cumsum(counts) - counts
+    # polygon i contributes counts[i] - 2 triangles (start, start + k, start + k + 1)
+    fans = np.maximum(counts - 2, 0)
+    first = np.repeat(starts, fans)
+    k = np.arange(fans.sum()) - np.repeat(np.cumsum(fans) - fans, fans) + 1
+    return np.stack([connects[first], connects[first + k], connects[first + k + 1]], axis=1)
+
+
+def build_csr(rows, cols, num_rows):
+    """Group ``cols`` by ``rows`` into (offsets, indices) CSR arrays."""
+    rows = np.asarray(rows, dtype=np.int64)
+    order = np.argsort(rows, kind="stable")
+    offsets = np.zeros(num_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_rows), out=offsets[1:])
+    return offsets, np.asarray(cols)[order].astype(np.int32)
+
+
+class EdgeHashTable(object):
+    """
+    Open-addressing (linear probing) hash table from vertex pairs to edge ids.
+
+    Keys and values live in two flat NumPy arrays sized to a power of two at
+    most half full, so lookups touch one or two slots on average.
+    """
+
+    def __init__(self, edges, num_vertices):
+        edges = np.asarray(edges, dtype=np.int64)
+        self.num_vertices = int(num_vertices)
+
+        size = 1 << max(1, int(2 * len(edges) - 1).bit_length())
+        self.mask = size - 1
+        self.shift = np.uint64(64 - (size.bit_length() - 1))
+        self.keys = np.full(size, _EMPTY, dtype=np.int64)
+        self.values = np.full(size, _EMPTY, dtype=np.int32)
+
+        keys = self.pack(edges[:, 0], edges[:, 1])
+        home = self.hash(keys)
+        pending = np.arange(len(keys))
+        probe = np.zeros(len(keys), dtype=np.int64)
+        while len(pending):
+            slots = (home[pending] + probe[pending]) & self.mask
+            free = self.keys[slots] == _EMPTY
+            # several pending keys may want the same free slot, the first one wins
+            _, first = np.unique(slots[free], return_index=True)
+            winners = np.flatnonzero(free)[first]
+            self.keys[slots[winners]] = keys[pending[winners]]
+            self.values[slots[winners]] = pending[winners]
+
+            placed = np.zeros(len(pending), dtype=bool)
+            placed[winners] = True
+            pending = pending[~placed]
+            probe[pending] += 1
+
+    def pack(self, a, b):
+        a = np.asarray(a, dtype=np.int64)
+        b = np.asarray(b, dtype=np.int64)
+        return np.minimum(a, b) * self.num_vertices + np.maximum(a, b)
+
+    def hash(self, keys):
+        hashed = (keys.astype(np.uint64) * _HASH_MULTIPLIER) >> self.shift
+        return hashed.astype(np.int64)
+
+    def get(self, a, b):
+        """Return the edge id of the pair (a, b), or -1 if it is not an edge."""
+        a, b = int(a), int(b)
+        if a > b:
+            a, b = b, a
+        key = a * self.num_vertices + b
+        slot = ((key * 0x9E3779B97F4A7C15) & _MASK64) >> int(self.shift)
+        keys = self.keys
+        while True:
+            stored = keys[slot]
+            if stored == key:
+                return int(self.values[slot])
+            if stored == _EMPTY:
+                return -1
+            slot = (slot + 1) & self.mask
+
+    def get_many(self, a, b):
+        """Vectorized ``get`` for arrays of vertex ids."""
+        keys = self.pack(a, b)
+        result = np.full(len(keys), _EMPTY, dtype=np.int64)
+        slots = self.hash(keys)
+        pending = np.arange(len(keys))
+        while len(pending):
+            stored = self.keys[slots[pending]]
+            hit = stored == keys[pending]
+            result[pending[hit]] = self.values[slots[pending[hit]]]
+            pending = pending[~hit & (stored != _EMPTY)]
+            slots[pending] = (slots[pending] + 1) & self.mask
+        return result
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.values.nbytes
+
+
+class MeshTopology(object):
+    """
+    Adjacency index of a polygon mesh.
+
+    Args:
+        counts: Number of vertices of every polygon.
+        connects: Flat polygon vertex ids.
+        edge_vertices: Optional (E, 2) array of edge end points, used as is so
+            that edge ids match the ones Maya reports.
+        num_vertices: Vertex count, defaults to the highest id in ``connects``
+            plus one.
+    """
+
+    def __init__(self, counts, connects, edge_vertices=None, num_vertices=None):
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.connects = np.asarray(connects, dtype=np.int64)
+        if num_vertices is None:
+            num_vertices = int(self.connects.max()) + 1 if len(self.connects) else 0
+        self.num_vertices = int(num_vertices)
+        self.num_faces = len(self.counts)
+
+        if edge_vertices is None:
+            edges = unique_edges(self.counts, self.connects)
+        else:
+            edges = np.sort(np.asarray(edge_vertices, dtype=np.int64).reshape(-1, 2), axis=1)
+        self.edges = edges.astype(np.int32)
+        self.num_edges = len(self.edges)
+
+        self.edge_table = EdgeHashTable(edges, self.num_vertices)
+
+        # vertex -> edge and vertex -> vertex share one offsets array, so the
+        # i-th neighbour of a vertex is the far end of its i-th edge
+        edge_ids = np.arange(self.num_edges)
+        self.vertex_offsets, self.vertex_edge_indices = build_csr(
+            np.concatenate([edges[:, 0], edges[:, 1]]),
+            np.concatenate([edge_ids, edge_ids]),
+            self.num_vertices,
+        )
+        _, self.vertex_vertex_indices = build_csr(
+            np.concatenate([edges[:, 0], edges[:, 1]]),
+            np.concatenate([edges[:, 1], edges[:, 0]]),
+            self.num_vertices,
+        )
+
+        corner_faces = np.repeat(np.arange(self.num_faces), self.counts)
+        self.vertex_face_offsets, self.vertex_face_indices = build_csr(
+            self.connects, corner_faces, self.num_vertices
+        )
+
+        corners = face_edges(self.counts, self.connects)
+        corner_edges = self.edge_table.get_many(corners[:, 0], corners[:, 1])
+        self.edge_face_offsets, self.edge_face_indices = build_csr(
+            corner_edges, corner_faces, self.num_edges
+        )
+
+    def vertex_edges(self, vertex):
+        return self.vertex_edge_indices[self.vertex_offsets[vertex]:self.vertex_offsets[vertex + 1]]
+
+    def vertex_neighbours(self, vertex):
+        return self.vertex_vertex_indices[self.vertex_offsets[vertex]:self.vertex_offsets[vertex + 1]]
+
+    def vertex_faces(self, vertex):
+        return self.vertex_face_indices[self.vertex_face_offsets[vertex]:self.vertex_face_offsets[vertex + 1]]
+
+    def edge_faces(self, edge):
+        return self.edge_face_indices[self.edge_face_offsets[edge]:self.edge_face_offsets[edge + 1]]
+
+    def edge_index(self, a, b):
+        """Edge id of the vertex pair (a, b), or -1 if they are not connected."""
+        return self.edge_table.get(a, b)
+
+    def edge_indices(self, a, b):
+        """Vectorized ``edge_index`` for arrays of vertex ids."""
+        return self.edge_table.get_many(a, b)
+
+    def vertex_valences(self):
+        return np.diff(self.vertex_offsets)
+
+    def edge_face_counts(self):
+        return np.diff(self.edge_face_offsets)
+
+    def boundary_edges(self):
+        """Ids of the edges that do not have exactly two faces."""
+        return np.flatnonzero(self.edge_face_counts() != 2)
+
+    def neighbour_lists(self):
+        """Vertex -> vertex adjacency as a list of per-vertex arrays."""
+        return np.split(self.vertex_vertex_indices, self.vertex_offsets[1:-1])
+
+    def vertex_face_lists(self):
+        """Vertex -> face adjacency as a list of per-vertex arrays."""
+        return np.split(self.vertex_face_indices, self.vertex_face_offsets[1:-1])
+
+    @property
+    def nbytes(self):
+        arrays = (
+            self.edges, self.vertex_offsets, self.vertex_edge_indices,
+            self.vertex_vertex_indices, self.vertex_face_offsets, self.vertex_face_indices,
+            self.edge_face_offsets, self.edge_face_indices,
+        )
+        return sum(array.nbytes for array in arrays) + self.edge_table.nbytes
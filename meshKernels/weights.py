@@ -0,0 +1,63 @@
+"""
+Compact index of the points a deformer actually moves.
+
+Painted weight maps usually cover a small part of a mesh (a wrinkle map on a
+face, a feather region on a wing), yet a deformer that walks every point pays
+for the whole mesh. ``WeightIndex`` keeps the ids and weights of the points
+with a non-zero weight, so a deformer can build it once when the weights are
+painted, then gather only those points, deform them and scatter the result
+back on every evaluation.
+"""
+import numpy as np
+
+# Below this fraction of weighted points, gathering them and measuring only
+# their edges beats the whole-mesh kernels (about a third on a 1M grid)
+SPARSE_FRACTION = 0.25
+
+
+class WeightIndex(object):
+    """
+    Ids and weights of the points with a non-zero weight.
+
+    Args:
+        weights: Dense per-point weights.
+    """
+
+    def __init__(self, weights):
+        self.weights = np.asarray(weights, dtype=np.float64).ravel()
+        self.count = len(self.weights)
+        self.indices = np.flatnonzero(self.weights)
+        self.values = self.weights[self.indices]
+
+    @classmethod
+    def from_maps(cls, count, *maps):
+        """
+        Index of the product of several weight maps. ``None`` stands for a map
+        that is not painted, where every point weighs 1.
+        """
+        weights = np.ones(count)
+        for values in maps:
+            if values is not None:
+                weights *= values
+        return cls(weights)
+
+    def __len__(self):
+        return len(self.indices)
+
+    @property
+    def sparse(self):
+        """True when few enough points are weighted to deform only those."""
+        return len(self.indices) < self.count * SPARSE_FRACTION
+
+    def matches(self, count):
+        return self.count == count
+
+    def gather(self, points):
+        """Rows of ``points`` with a non-zero weight."""
+        return np.asarray(points)[self.indices]
+
+    def scatter(self, points, values):
+        """Copy of ``points`` with the weighted rows replaced by ``values``."""
+        result = np.array(points, dtype=np.float64)
+        result[self.indices] = values
+        return result
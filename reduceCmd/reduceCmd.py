@@ -1,13 +1,22 @@
+import os
+
 import maya.api.OpenMaya as om
 import maya.cmds as cmds
+import numpy as np
+
+from meshKernels.edge_collapse import EdgeCollapseReducer
+from meshKernels.mesh_dump import write_mesh_dump
+from meshKernels.profiling import profiled
+from meshKernels.progressive import ProgressiveMesh
+
+# Progressive mesh records loaded by progressiveMesh, keyed on path, so that
+# sliding the budget only replays the collapses in between
+_progressiveMeshes = {}
 
 class ReduceCmd(om.MPxCommand):
     def __init__(self):
         om.MPxCommand.__init__(self)
         self.mMesh = cmds.ls(selection=True)[0]
-        self.mLeastCost = []
-        self.mCollapseVert = []
-        self.mEdgeFaces = []
         self.m_percentage = 0
         self.m_count = 0
         self.m_basePath = None
@@ -20,6 +29,11 @@ class ReduceCmd(om.MPxCommand):
     def newSyntax():
         syntax = om.MSyntax()
         syntax.addFlag("-p", "-percentage", om.MSyntax.kUnsigned)
+        syntax.addFlag("-df", "-dumpFile", om.MSyntax.kString)
+        # percentage of the vertices kept by each level of an LOD chain
+        syntax.addFlag("-l", "-lods", om.MSyntax.kUnsigned)
+        syntax.makeFlagMultiUse("-l")
+        syntax.addFlag("-pf", "-progressiveFile", om.MSyntax.kString)
         syntax.setObjectType(om.MSyntax.kSelectionList, 1, 1)
         syntax.useSelectionAsDefault(True)
         syntax.enableEdit(False)
@@ -46,63 +60,121 @@ class ReduceCmd(om.MPxCommand):
             path.pop()
         return om.MStatus.kFailure
 
+    @profiled("reduceCmd.doIt")
     def doIt(self, argList):
         argData = om.MArgDatabase(self.syntax(), argList)
-        selectedObj = argData.getObjects()
-        selectedObj.getDagPath(0, self.m_basePath)
+        selectedObj = argData.getObjectList()
+        self.m_basePath = selectedObj.getDagPath(0)
         if self.getShapeNode(self.m_basePath) != om.MStatus.kSuccess:
             om.MGlobal.displayError("Please select a polygon mesh")
             return om.MStatus.kFailure
 
-        self.m_percentage = argData.flagArgumentInt("-p", 0)
+        if argData.isFlagSet("-p"):
+            self.m_percentage = argData.flagArgumentInt("-p", 0)
 
+        # Pull the mesh out of Maya once, reduce it in NumPy and write it back once
         fnMesh = om.MFnMesh(self.m_basePath)
-        vertices = fnMesh.getPoints(om.MSpace.kWorld)
-        edges = fnMesh.getEdgeVertices()
-        faces = fnMesh.getVertices()
+        points = np.array(fnMesh.getPoints(om.MSpace.kObject))
+        counts, connects = fnMesh.getVertices()
 
-        self.computeAllEdgeCosts()
+        # Meshes too big to reduce in the session are dumped for the
+        # out-of-core batch job in meshKernels.streaming
+        if argData.isFlagSet("-df"):
+            write_mesh_dump(argData.flagArgumentString("-df", 0), points, np.array(counts), np.array(connects))
+            return om.MStatus.kSuccess
 
-        target_count = int(len(vertices) * (1 - self.m_percentage / 100.0))
-        while len(vertices) > target_count:
-            minCostIndex = self.findMinCostVert()
-            u, v = edges[minCostIndex]
-            self.collapse(u, v)
-            vertices = fnMesh.getPoints(om.MSpace.kWorld)
-            edges = fnMesh.getEdgeVertices()
-            self.computeAllEdgeCosts()
+        reducer = EdgeCollapseReducer(points, counts, connects)
+
+        # One collapse pass snapshotted at every level of an LOD chain
+        lods = [argData.getFlagArgumentList("-l", i).asInt(0) for i in range(argData.numberOfFlagUses("-l"))]
+        if lods:
+            targets = [int(len(points) * lod / 100.0) for lod in lods]
+        else:
+            targets = [int(len(points) * (1 - self.m_percentage / 100.0))]
+        levels = reducer.reduce_levels(targets)
+        self.m_count = reducer.collapse_count
+
+        # The record goes on to the most reduced mesh, so progressiveMesh can
+        # rebuild any budget from it
+        if argData.isFlagSet("-pf"):
+            reducer.reduce(0)
+            record = ProgressiveMesh.from_reducer(reducer, points, counts, connects)
+            record.save(argData.flagArgumentString("-pf", 0))
+
+        # LODs are written as new meshes next to the untouched original
+        if lods:
+            baseName = om.MFnDagNode(self.m_basePath.transform()).name()
+            self.setResult([
+                self.createMesh("%s_LOD%d" % (baseName, i + 1), *level) for i, level in enumerate(levels)
+            ])
+            return om.MStatus.kSuccess
 
+        self.writeMesh(fnMesh, *levels[0])
         return om.MStatus.kSuccess
 
-    def computeAllEdgeCosts(self):
-        self.mLeastCost = []
-        fnMesh = om.MFnMesh(self.m_basePath)
-        edges = fnMesh.getEdgeVertices()
-        for u, v in edges:
-            cost = self.computeEdgeCost(u, v)
-            self.mLeastCost.append(cost)
+    def writeMesh(self, fnMesh, points, counts, connects):
+        mayaPoints = om.MPointArray([om.MPoint(p) for p in points.tolist()])
+        fnMesh.createInPlace(mayaPoints, om.MIntArray(counts.tolist()), om.MIntArray(connects.tolist()))
 
-    def computeEdgeCost(self, u, v):
-        fnMesh = om.MFnMesh(self.m_basePath)
-        pointU = fnMesh.getPoint(u, om.MSpace.kWorld)
-        pointV = fnMesh.getPoint(v, om.MSpace.kWorld)
-        edgeLength = (pointU - pointV).length()
-        return edgeLength
+    def createMesh(self, name, points, counts, connects):
+        mayaPoints = om.MPointArray([om.MPoint(p) for p in points.tolist()])
+        transform = om.MFnMesh().create(mayaPoints, om.MIntArray(counts.tolist()), om.MIntArray(connects.tolist()))
+        return om.MFnDagNode(transform).setName(name)
 
-    def collapse(self, u, v):
-        fnMesh = om.MFnMesh(self.m_basePath)
-        points = fnMesh.getPoints(om.MSpace.kWorld)
-        midpoint = (points[u] + points[v]) / 2
-        points[u] = midpoint
-        points[v] = midpoint
-        fnMesh.setPoints(points, om.MSpace.kWorld)
-
-    def findMinCostVert(self):
-        leastIndex = 0
-        for i in range(len(self.mLeastCost)):
-            if self.mLeastCost[i] < self.mLeastCost[leastIndex]:
-                leastIndex = i
-        return leastIndex
+class ProgressiveMeshCmd(ReduceCmd):
+    """
+    Rebuild the selected mesh at a vertex budget from a progressive mesh
+    record written by ``reduceCmd -progressiveFile``.
+    """
+
+    @staticmethod
+    def creator():
+        return ProgressiveMeshCmd()
+
+    @staticmethod
+    def newSyntax():
+        syntax = om.MSyntax()
+        syntax.addFlag("-f", "-file", om.MSyntax.kString)
+        syntax.addFlag("-p", "-percentage", om.MSyntax.kUnsigned)
+        syntax.addFlag("-vc", "-vertexCount", om.MSyntax.kUnsigned)
+        syntax.setObjectType(om.MSyntax.kSelectionList, 1, 1)
+        syntax.useSelectionAsDefault(True)
+        syntax.enableEdit(False)
+        syntax.enableQuery(False)
+        return syntax
+
+    def getRecord(self, path):
+        mtime = os.path.getmtime(path)
+        cached = _progressiveMeshes.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, ProgressiveMesh.load(path))
+            _progressiveMeshes[path] = cached
+        return cached[1]
+
+    @profiled("progressiveMesh.doIt")
+    def doIt(self, argList):
+        argData = om.MArgDatabase(self.syntax(), argList)
+        selectedObj = argData.getObjectList()
+        self.m_basePath = selectedObj.getDagPath(0)
+        if self.getShapeNode(self.m_basePath) != om.MStatus.kSuccess:
+            om.MGlobal.displayError("Please select a polygon mesh")
+            return om.MStatus.kFailure
+        if not argData.isFlagSet("-f"):
+            om.MGlobal.displayError("A progressive mesh record is required (-file)")
+            return om.MStatus.kFailure
+
+        record = self.getRecord(argData.flagArgumentString("-f", 0))
+        if argData.isFlagSet("-vc"):
+            record.set_vertex_count(argData.flagArgumentInt("-vc", 0))
+        else:
+            if argData.isFlagSet("-p"):
+                self.m_percentage = argData.flagArgumentInt("-p", 0)
+            record.set_vertex_count(int(record.num_points * (1 - self.m_percentage / 100.0)))
+
+        points, counts, connects = record.result()
+        self.writeMesh(om.MFnMesh(self.m_basePath), points, counts, connects)
+        self.setResult(len(points))
+        return om.MStatus.kSuccess
 
 def initializePlugin(mobject):
     mplugin = om.MFnPlugin(mobject, "dilens", "0.1", "2024")
@@ -110,10 +182,18 @@ def initializePlugin(mobject):
         mplugin.registerCommand("reduceCmd", ReduceCmd.creator, ReduceCmd.newSyntax)
     except:
         om.MGlobal.displayError("Failed to register command: reduceCmd")
+    try:
+        mplugin.registerCommand("progressiveMesh", ProgressiveMeshCmd.creator, ProgressiveMeshCmd.newSyntax)
+    except:
+        om.MGlobal.displayError("Failed to register command: progressiveMesh")
 
 def uninitializePlugin(mobject):
     mplugin = om.MFnPlugin(mobject)
     try:
         mplugin.deregisterCommand("reduceCmd")
     except:
-        om.MGlobal.displayError("Failed to deregister command: reduceCmd")
\ No newline at end of file
+        om.MGlobal.displayError("Failed to deregister command: reduceCmd")
+    try:
+        mplugin.deregisterCommand("progressiveMesh")
+    except:
+        om.MGlobal.displayError("Failed to deregister command: progressiveMesh")
\ No newline at end of file
@@ -0,0 +1,13 @@
+import sys
+
+import pytest
+
+from benchmarks import maya_stub
+
+
+@pytest.fixture
+def load_plugin(monkeypatch):
+    """``maya_stub.load_plugin``, with the stub standing in for maya during this test only."""
+    for name in ("maya", "maya.api", "maya.api.OpenMaya", "maya.api.OpenMayaAnim"):
+        monkeypatch.setitem(sys.modules, name, sys.modules.get(name))
+    return maya_stub.load_plugin
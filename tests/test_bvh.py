@@ -0,0 +1,31 @@
+"""
+TriangleBVH closest points against brute force.
+"""
+import numpy as np
+import pytest
+
+from benchmarks import meshes
+from benchmarks.bench_collision import brute_force, shell_queries
+from meshKernels.bvh import TriangleBVH
+from meshKernels.topology import triangulate
+
+
+@pytest.mark.parametrize("leaf_size", [1, 2, 3, 5, 8])
+def test_matches_brute_force(leaf_size):
+    """Any leaf size, power of two or not, finds the nearest triangle."""
+    points, counts, connects = meshes.uv_sphere(12, 24)
+    triangles = triangulate(counts, connects)
+    queries = shell_queries(500, 0.5)
+
+    bvh = TriangleBVH(points, triangles, leaf_size=leaf_size)
+    np.testing.assert_allclose(bvh.closest_points(queries)[2], brute_force(points, triangles, queries), atol=1e-12)
+
+    # and after the collider moved
+    moved = points * (1.5, 0.5, 1.0) + (0.2, 0.0, 0.0)
+    bvh.refit(moved)
+    np.testing.assert_allclose(bvh.closest_points(queries)[2], brute_force(moved, triangles, queries), atol=1e-12)
+
+
+def test_rejects_empty_leaves():
+    with pytest.raises(ValueError):
+        TriangleBVH(np.zeros((3, 3)), [(0, 1, 2)], leaf_size=0)
@@ -0,0 +1,31 @@
+"""
+Vertex budgets of the edge collapse reducers on open meshes.
+"""
+import pytest
+
+from benchmarks import meshes
+from meshKernels.edge_collapse import EdgeCollapseReducer, reduce_proxy
+
+
+@pytest.mark.parametrize("triangulate", [False, True])
+@pytest.mark.parametrize("target", [0, 50, 150])
+def test_open_grid_keeps_counted_vertices(triangulate, target):
+    """Every vertex still counted by vertex_count is in the result."""
+    points, counts, connects = meshes.grid(15, triangulate=triangulate)
+    reducer = EdgeCollapseReducer(points, counts, connects)
+    reducer.reduce(target)
+
+    assert len(reducer.result()[0]) == reducer.vertex_count
+    assert reducer.collapse_count == len(points) - reducer.vertex_count
+
+
+def test_proxy_keeps_the_outline():
+    """The locked border of the proxy keeps all of its vertices."""
+    points, counts, connects = meshes.grid(20, triangulate=True)
+    reducer = reduce_proxy(points, counts, connects, 44)
+
+    reduced = reducer.result()[0]
+    assert len(reduced) == reducer.vertex_count
+    on_border = (reduced[:, 0] == points[:, 0].min()) | (reduced[:, 0] == points[:, 0].max())
+    on_border |= (reduced[:, 2] == points[:, 2].min()) | (reduced[:, 2] == points[:, 2].max())
+    assert on_border.sum() == 80
@@ -0,0 +1,46 @@
+"""
+FeatherSlider batch deform, run against ``benchmarks.maya_stub``.
+"""
+import numpy as np
+import pytest
+
+from benchmarks import maya_stub as om
+from meshKernels.deform import transform_points
+
+
+@pytest.fixture
+def FeatherSlider(load_plugin):
+    module = load_plugin("feather_slide/py/feather_slide.py", "feather_slide")
+    module.FeatherSlider.nodeInitializer()
+    return module.FeatherSlider
+
+
+def deform(FeatherSlider, points, weights, matrix):
+    node = FeatherSlider.creator()
+    block = om.MDataBlock({
+        node.envelope: 0.5,
+        node.input: {0: {node.inputGeom: om.MObject(points)}},
+        node.weightList: {0: {node.weights: dict(enumerate(weights))}},
+        node.featherMatrixAttr: om.MMatrix(matrix.ravel()),
+        node.instancedAttr: False,
+        node.batchAttr: True,
+        node.cacheAttr: False,
+    })
+    iterator = om.MItGeometry(points)
+    node.deform(block, iterator, None, 0)
+    return np.array(iterator.allPositions())[:, :3]
+
+
+def test_sparse_weights(FeatherSlider):
+    """Only the painted points move when under a quarter of them are painted."""
+    rng = np.random.RandomState(0)
+    points = rng.uniform(-1.0, 1.0, (100, 3))
+    weights = np.zeros(len(points))
+    weights[[3, 40, 77]] = (1.0, 0.5, 0.25)
+    matrix = np.eye(4)
+    matrix[3, :3] = (0.1, 0.2, 0.3)
+
+    deformed = deform(FeatherSlider, points, weights, matrix)
+
+    expected = points + (transform_points(points, matrix) - points) * weights[:, None] * 0.5
+    np.testing.assert_allclose(deformed, expected)
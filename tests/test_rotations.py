@@ -0,0 +1,44 @@
+"""
+Euler output of the rotation sample streams.
+"""
+import numpy as np
+import pytest
+
+from meshKernels.rotations import METHODS, RotationSamples, euler_to_quaternions, quaternions_to_euler
+
+
+def rotation_distance(a, b):
+    """Angle in degrees between the rotations of (..., 3) Euler angles ``a`` and ``b``."""
+    dot = np.abs(np.sum(euler_to_quaternions(a) * euler_to_quaternions(b), axis=-1))
+    return np.degrees(2.0 * np.arccos(np.minimum(dot, 1.0)))
+
+
+@pytest.mark.parametrize("method", METHODS)
+@pytest.mark.parametrize("x, z", [(0.0, 0.0), (10.0, 20.0), (-35.0, 120.0)])
+def test_rotations_continuous_through_90_degrees_of_y(method, x, z):
+    """Keys turning 0 to 270 degrees about Y come out unflipped, with the keys' X and Z."""
+    pitch = np.arange(0.0, 271.0, 30.0)
+    keys = np.stack([np.full_like(pitch, x), pitch, np.full_like(pitch, z)], axis=-1)
+    samples = RotationSamples(np.arange(len(pitch)), keys)
+
+    times = np.linspace(0.0, len(pitch) - 1, 721)
+    rotations = samples.rotations(times, method)
+    assert np.abs(np.diff(rotations, axis=0)).max() < 2.0
+    np.testing.assert_allclose(rotations[:, 0], x, atol=1e-6)
+    np.testing.assert_allclose(rotations[:, 2], z, atol=1e-6)
+    np.testing.assert_allclose(samples.rotations(samples.times, method), samples.eulers, atol=1e-6)
+
+
+def test_closest_euler_is_the_same_rotation():
+    rng = np.random.RandomState(0)
+    rotations = rng.uniform(-400.0, 400.0, (1000, 3))
+    rotations[::10, 1] = 90.0
+    rotations[5::10, 1] = -270.0
+    quaternions = euler_to_quaternions(rotations)
+
+    principal = quaternions_to_euler(quaternions)
+    assert rotation_distance(principal, rotations).max() < 1e-5
+    assert (np.abs(principal[:, 1]) <= 90.0).all()
+
+    closest = quaternions_to_euler(quaternions, rotations)
+    np.testing.assert_allclose(closest, rotations, atol=1e-6)
@@ -0,0 +1,46 @@
+"""
+WrinkleDeformer batch and per-point modes, run against ``benchmarks.maya_stub``.
+"""
+import numpy as np
+import pytest
+
+from benchmarks import maya_stub as om
+from benchmarks import meshes
+
+
+@pytest.fixture
+def WrinkleDeformer(load_plugin):
+    module = load_plugin("wrinkleDeformer/py/wrinkle_deformer.py", "wrinkle_deformer")
+    module.WrinkleDeformer.initialize()
+    return module.WrinkleDeformer
+
+
+def deform(WrinkleDeformer, batch, weights):
+    points, counts, connects = meshes.grid(6)
+    squashed = points * (0.7, 1.0, 0.8)
+    node = WrinkleDeformer()
+    block = om.MDataBlock({
+        node.intensityAttr: 0.5,
+        node.envelope: 0.6,
+        node.input: {0: {node.inputGeom: om.MObject((squashed, counts, connects))}},
+        node.restMeshAttr: om.MObject((points, counts, connects)),
+        node.weightList: {0: {node.weights: dict(enumerate(weights))}},
+        node.batchAttr: batch,
+        node.cacheAttr: False,
+    })
+    iterator = om.MItGeometry(squashed)
+    node.deform(block, iterator, None, 0)
+    return np.array(iterator.allPositions())[:, :3], squashed
+
+
+@pytest.mark.parametrize("painted", [49, 5])
+def test_batch_matches_loop(WrinkleDeformer, painted):
+    """Both modes apply the envelope, with dense and with sparse weights."""
+    weights = np.zeros(49)
+    weights[:painted] = np.random.RandomState(0).uniform(0.2, 1.0, painted)
+
+    batch, squashed = deform(WrinkleDeformer, True, weights)
+    loop, _ = deform(WrinkleDeformer, False, weights)
+
+    np.testing.assert_allclose(batch, loop)
+    assert not np.allclose(batch, squashed)
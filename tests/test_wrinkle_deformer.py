@@ -0,0 +1,41 @@
+"""
+WrinkleDeformer compression output, run inside ``mayapy``; skipped without Maya.
+"""
+import os
+import sys
+
+import pytest
+
+standalone = pytest.importorskip("maya.standalone")
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLUGIN = os.path.join(REPOSITORY, "wrinkleDeformer", "py", "wrinkle_deformer.py")
+
+
+@pytest.fixture(scope="module")
+def cmds():
+    standalone.initialize()
+    # the plugin imports meshKernels from the repository
+    sys.path.insert(0, REPOSITORY)
+    from maya import cmds
+    cmds.loadPlugin(PLUGIN)
+    yield cmds
+    cmds.file(new=True, force=True)
+    cmds.unloadPlugin(os.path.basename(PLUGIN))
+
+
+def test_compression_pulled_without_deforming(cmds):
+    """Pulling only the compression plug measures the current upstream input."""
+    cmds.file(new=True, force=True)
+    mesh, plane = cmds.polyPlane(width=1.0, height=1.0, subdivisionsX=4, subdivisionsY=4)
+    rest, _ = cmds.polyPlane(width=1.0, height=1.0, subdivisionsX=4, subdivisionsY=4)
+    wrinkle = cmds.deformer(mesh, type="WrinkleDeformer")[0]
+    cmds.connectAttr(rest + ".outMesh", wrinkle + ".restMesh")
+
+    # Squash the input upstream of the deformer, then read the compression
+    # before anything asked for the deformed mesh
+    cmds.setAttr(plane + ".width", 0.5)
+    compression = cmds.getAttr(wrinkle + ".compression[0]")
+
+    assert len(compression) == 25
+    assert max(compression) == pytest.approx(0.125)
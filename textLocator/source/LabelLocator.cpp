@@ -0,0 +1,163 @@
+#include "LabelLocator.h"
+
+#include <maya/MFnTypedAttribute.h>
+#include <maya/MFnNumericAttribute.h>
+#include <maya/MFnStringArrayData.h>
+#include <maya/MFnPointArrayData.h>
+#include <maya/MFnVectorArrayData.h>
+#include <maya/MFnCamera.h>
+#include <maya/MDagPath.h>
+#include <maya/MPoint.h>
+#include <maya/MVector.h>
+#include <maya/MVectorArray.h>
+#include <maya/MColor.h>
+#include <maya/MTypeId.h>
+#include <maya/MViewport2Renderer.h>
+
+MTypeId LabelLocator::id(0x80007);
+MObject LabelLocator::aLabels;
+MObject LabelLocator::aPositions;
+MObject LabelLocator::aColors;
+MObject LabelLocator::aDetailDistance;
+MObject LabelLocator::aDrawDistance;
+MString LabelLocator::drawDbClassification("drawdb/geometry/labelLocator");
+MString LabelLocator::drawRegistrantId("LabelLocatorPlugin");
+
+LabelLocator::LabelLocator() : mLabelsDirty(true) {}
+
+LabelLocator::~LabelLocator() {}
+
+MStatus LabelLocator::setDependentsDirty(const MPlug& plug, MPlugArray& plugArray)
+{
+    if (plug == aLabels || plug == aPositions || plug == aColors)
+        mLabelsDirty = true;
+    if (plug == aLabels || plug == aPositions || plug == aColors || plug == aDetailDistance || plug == aDrawDistance)
+        MHWRender::MRenderer::setGeometryDrawDirty(thisMObject());
+    return MPxLocatorNode::setDependentsDirty(plug, plugArray);
+}
+
+const LabelSet& LabelLocator::labels()
+{
+    if (!mLabelsDirty)
+        return mLabels;
+
+    MObject node = thisMObject();
+    MObject labelData, positionData, colorData;
+    MPlug(node, aLabels).getValue(labelData);
+    MPlug(node, aPositions).getValue(positionData);
+    MPlug(node, aColors).getValue(colorData);
+
+    MStringArray labels = MFnStringArrayData(labelData).array();
+    MPointArray positions = MFnPointArrayData(positionData).array();
+    MVectorArray colors = MFnVectorArrayData(colorData).array();
+
+    // A label needs a position, missing colours are white
+    unsigned int count = labels.length() < positions.length() ? labels.length() : positions.length();
+    mLabels.labels = labels;
+    mLabels.labels.setLength(count);
+    mLabels.positions = positions;
+    mLabels.positions.setLength(count);
+    mLabels.colors.setLength(count);
+    for (unsigned int i = 0; i < count; i++)
+    {
+        if (i < colors.length())
+            mLabels.colors[i] = MColor((float)colors[i].x, (float)colors[i].y, (float)colors[i].z);
+        else
+            mLabels.colors[i] = MColor(1.0f, 1.0f, 1.0f);
+    }
+
+    mLabelsDirty = false;
+    return mLabels;
+}
+
+void LabelLocator::cull(const MMatrix& localToClip, const MMatrix& localToWorld, const MPoint& cameraPos, LabelLod& lod)
+{
+    const LabelSet& set = labels();
+    MObject node = thisMObject();
+    double detailDistance, drawDistance;
+    MPlug(node, aDetailDistance).getValue(detailDistance);
+    MPlug(node, aDrawDistance).getValue(drawDistance);
+    double detailSquared = detailDistance * detailDistance;
+    double drawSquared = drawDistance * drawDistance;
+
+    lod.texts.clear();
+    lod.points.clear();
+    for (unsigned int i = 0; i < set.positions.length(); i++)
+    {
+        // Behind the camera or outside the frustum sides
+        MPoint clip = set.positions[i] * localToClip;
+        if (clip.w <= 0.0 || clip.x < -clip.w || clip.x > clip.w || clip.y < -clip.w || clip.y > clip.w)
+            continue;
+
+        MVector toCamera = set.positions[i] * localToWorld - cameraPos;
+        double distanceSquared = toCamera * toCamera;
+        if (drawDistance > 0.0 && distanceSquared > drawSquared)
+            continue;
+        if (detailDistance > 0.0 && distanceSquared > detailSquared)
+            lod.points.append(i);
+        else
+            lod.texts.append(i);
+    }
+}
+
+void LabelLocator::draw(M3dView& view, const MDagPath& path, M3dView::DisplayStyle style, M3dView::DisplayStatus status)
+{
+    MMatrix modelView, projection;
+    view.modelViewMatrix(modelView);
+    view.projectionMatrix(projection);
+
+    MDagPath cameraPath;
+    view.getCamera(cameraPath);
+    MPoint cameraPos = MFnCamera(cameraPath).eyePoint(MSpace::kWorld);
+
+    LabelLod lod;
+    cull(modelView * projection, path.inclusiveMatrix(), cameraPos, lod);
+    const LabelSet& set = labels();
+
+    view.beginGL();
+    for (unsigned int i = 0; i < lod.texts.length(); i++)
+    {
+        unsigned int label = lod.texts[i];
+        view.setDrawColor(set.colors[label]);
+        view.drawText(set.labels[label], set.positions[label], M3dView::kLeft);
+    }
+    view.endGL();
+}
+
+MStatus LabelLocator::initialize()
+{
+    MFnTypedAttribute tAttr;
+    MFnNumericAttribute nAttr;
+    MFnStringArrayData labelData;
+    MFnPointArrayData positionData;
+    MFnVectorArrayData colorData;
+
+    // Label i is drawn at position i in colour i
+    aLabels = tAttr.create("labels", "lbl", MFnData::kStringArray, labelData.create());
+    tAttr.setStorable(true);
+    addAttribute(aLabels);
+    aPositions = tAttr.create("positions", "lpos", MFnData::kPointArray, positionData.create());
+    tAttr.setStorable(true);
+    addAttribute(aPositions);
+    aColors = tAttr.create("colors", "lclr", MFnData::kVectorArray, colorData.create());
+    tAttr.setStorable(true);
+    addAttribute(aColors);
+
+    // Level of detail: text up to detailDistance from the camera, dots up to
+    // drawDistance, nothing further; 0 is unlimited
+    aDetailDistance = nAttr.create("detailDistance", "dtd", MFnNumericData::kDouble, 0.0);
+    nAttr.setMin(0.0);
+    nAttr.setKeyable(true);
+    addAttribute(aDetailDistance);
+    aDrawDistance = nAttr.create("drawDistance", "drd", MFnNumericData::kDouble, 0.0);
+    nAttr.setMin(0.0);
+    nAttr.setKeyable(true);
+    addAttribute(aDrawDistance);
+
+    return MS::kSuccess;
+}
+
+void* LabelLocator::creator()
+{
+    return new LabelLocator();
+}
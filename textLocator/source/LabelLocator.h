@@ -0,0 +1,64 @@
+#ifndef __LABEL_LOCATOR_H__
+#define __LABEL_LOCATOR_H__
+
+#include <maya/MPxLocatorNode.h>
+#include <maya/MString.h>
+#include <maya/MStringArray.h>
+#include <maya/MPointArray.h>
+#include <maya/MColorArray.h>
+#include <maya/MUintArray.h>
+#include <maya/MMatrix.h>
+#include <maya/M3dView.h>
+#include <maya/MPlug.h>
+#include <maya/MPlugArray.h>
+
+// Labels of the node, read once when one of the label attributes changes
+struct LabelSet
+{
+    MStringArray labels;
+    MPointArray positions;     // in the locator's space
+    MColorArray colors;
+};
+
+// Labels left after culling, by level of detail
+struct LabelLod
+{
+    MUintArray texts;    // close enough to read
+    MUintArray points;   // only drawn as a dot
+};
+
+// One locator drawing many labels, for annotating a shot without a node per
+// label
+class LabelLocator : public MPxLocatorNode
+{
+public:
+    LabelLocator();
+    virtual ~LabelLocator();
+    virtual void draw(M3dView& view, const MDagPath& path, M3dView::DisplayStyle style, M3dView::DisplayStatus status);
+    virtual MStatus setDependentsDirty(const MPlug& plug, MPlugArray& plugArray);
+
+    const LabelSet& labels();
+
+    // Labels in front of the camera and inside the frustum of localToClip,
+    // with text within detailDistance of cameraPos and dots up to
+    // drawDistance. A distance of 0 is unlimited.
+    void cull(const MMatrix& localToClip, const MMatrix& localToWorld, const MPoint& cameraPos, LabelLod& lod);
+
+    static void* creator();
+    static MStatus initialize();
+    static MTypeId id;
+    static MObject aLabels;
+    static MObject aPositions;
+    static MObject aColors;
+    static MObject aDetailDistance;
+    static MObject aDrawDistance;
+
+    static MString drawDbClassification;
+    static MString drawRegistrantId;
+
+private:
+    LabelSet mLabels;
+    bool mLabelsDirty;
+};
+
+#endif // __LABEL_LOCATOR_H__
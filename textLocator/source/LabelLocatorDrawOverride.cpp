@@ -0,0 +1,99 @@
+#include "LabelLocatorDrawOverride.h"
+
+#include <maya/MFnDependencyNode.h>
+#include <maya/MDoubleArray.h>
+#include <maya/MDagPath.h>
+#include <maya/MMatrix.h>
+#include <maya/MPoint.h>
+
+LabelLocatorDrawOverride::LabelLocatorDrawOverride(const MObject& obj)
+    // Always dirty: culling and level of detail follow the camera
+    : MHWRender::MPxDrawOverride(obj, NULL, true)
+{
+    mLocator = dynamic_cast<LabelLocator*>(MFnDependencyNode(obj).userNode());
+}
+
+LabelLocatorDrawOverride::~LabelLocatorDrawOverride()
+{
+    mLocator = NULL;
+}
+
+MHWRender::MPxDrawOverride* LabelLocatorDrawOverride::Creator(const MObject& obj)
+{
+    return new LabelLocatorDrawOverride(obj);
+}
+
+MHWRender::DrawAPI LabelLocatorDrawOverride::supportedDrawAPIs() const
+{
+    return MHWRender::kAllDevices;
+}
+
+bool LabelLocatorDrawOverride::isBounded(const MDagPath& objPath, const MDagPath& cameraPath) const
+{
+    return false;
+}
+
+MUserData* LabelLocatorDrawOverride::prepareForDraw(const MDagPath& objPath, const MDagPath& cameraPath,
+                                                    const MHWRender::MFrameContext& frameContext, MUserData* oldData)
+{
+    LabelLocatorData* data = dynamic_cast<LabelLocatorData*>(oldData);
+    if (!data)
+        data = new LabelLocatorData();
+    if (!mLocator)
+        return data;
+
+    // One pass over every label of the node, whatever their number
+    MMatrix localToWorld = objPath.inclusiveMatrix();
+    MMatrix viewProjection = frameContext.getMatrix(MHWRender::MFrameContext::kViewProjMtx);
+    MDoubleArray viewPosition = frameContext.getTuple(MHWRender::MFrameContext::kViewPosition);
+    MPoint cameraPos(viewPosition[0], viewPosition[1], viewPosition[2]);
+    mLocator->cull(localToWorld * viewProjection, localToWorld, cameraPos, data->lod);
+
+    // The readable labels are copied for addUIDrawables, the far ones become
+    // a single batch of points
+    const LabelSet& set = mLocator->labels();
+    unsigned int numTexts = data->lod.texts.length();
+    data->texts.setLength(numTexts);
+    data->textPositions.setLength(numTexts);
+    data->textColors.setLength(numTexts);
+    for (unsigned int i = 0; i < numTexts; i++)
+    {
+        unsigned int label = data->lod.texts[i];
+        data->texts[i] = set.labels[label];
+        data->textPositions[i] = set.positions[label];
+        data->textColors[i] = set.colors[label];
+    }
+
+    unsigned int numDots = data->lod.points.length();
+    data->dots.setLength(numDots);
+    data->dotColors.setLength(numDots);
+    for (unsigned int i = 0; i < numDots; i++)
+    {
+        data->dots[i] = set.positions[data->lod.points[i]];
+        data->dotColors[i] = set.colors[data->lod.points[i]];
+    }
+
+    return data;
+}
+
+void LabelLocatorDrawOverride::addUIDrawables(const MDagPath& objPath, MHWRender::MUIDrawManager& drawManager,
+                                              const MHWRender::MFrameContext& frameContext, const MUserData* data)
+{
+    const LabelLocatorData* labelData = dynamic_cast<const LabelLocatorData*>(data);
+    if (!labelData)
+        return;
+
+    // Every label of the node in one drawable
+    drawManager.beginDrawable();
+    for (unsigned int i = 0; i < labelData->texts.length(); i++)
+    {
+        drawManager.setColor(labelData->textColors[i]);
+        drawManager.text(labelData->textPositions[i], labelData->texts[i], MHWRender::MUIDrawManager::kLeft);
+    }
+    if (labelData->dots.length())
+    {
+        drawManager.setPointSize(3.0f);
+        drawManager.mesh(MHWRender::MUIDrawManager::kPoints, labelData->dots, NULL, &labelData->dotColors);
+    }
+    drawManager.endDrawable();
+}
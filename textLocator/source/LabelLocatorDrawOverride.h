@@ -0,0 +1,53 @@
+#ifndef __LABEL_LOCATOR_DRAW_OVERRIDE_H__
+#define __LABEL_LOCATOR_DRAW_OVERRIDE_H__
+
+#include <maya/MPxDrawOverride.h>
+#include <maya/MUserData.h>
+#include <maya/MUIDrawManager.h>
+#include <maya/MFrameContext.h>
+#include <maya/MStringArray.h>
+#include <maya/MPointArray.h>
+#include <maya/MColorArray.h>
+
+#include "LabelLocator.h"
+
+// The labels left after culling, in the locator's space: the readable ones
+// as text, the far ones as one batch of coloured points. Copied out of the
+// node in prepareForDraw, so addUIDrawables never reads a plug
+class LabelLocatorData : public MUserData
+{
+public:
+    LabelLocatorData() : MUserData(false) {}
+    virtual ~LabelLocatorData() {}
+
+    LabelLod lod;   // culling result, kept to reuse its arrays
+    MStringArray texts;
+    MPointArray textPositions;
+    MColorArray textColors;
+    MPointArray dots;
+    MColorArray dotColors;
+};
+
+class LabelLocatorDrawOverride : public MHWRender::MPxDrawOverride
+{
+public:
+    static MHWRender::MPxDrawOverride* Creator(const MObject& obj);
+    virtual ~LabelLocatorDrawOverride();
+
+    virtual MHWRender::DrawAPI supportedDrawAPIs() const;
+    virtual bool isBounded(const MDagPath& objPath, const MDagPath& cameraPath) const;
+
+    virtual MUserData* prepareForDraw(const MDagPath& objPath, const MDagPath& cameraPath,
+                                      const MHWRender::MFrameContext& frameContext, MUserData* oldData);
+
+    virtual bool hasUIDrawables() const { return true; }
+    virtual void addUIDrawables(const MDagPath& objPath, MHWRender::MUIDrawManager& drawManager,
+                                const MHWRender::MFrameContext& frameContext, const MUserData* data);
+
+private:
+    LabelLocatorDrawOverride(const MObject& obj);
+
+    LabelLocator* mLocator;
+};
+
+#endif // __LABEL_LOCATOR_DRAW_OVERRIDE_H__
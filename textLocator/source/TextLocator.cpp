@@ -1,40 +1,75 @@
-#include <maya/MPxLocatorNode.h>
-#include <maya/MString.h>
-#include <maya/M3dView.h>
-#include <maya/MDrawContext.h>
-#include <maya/MGlobal.h>
+#include "TextLocator.h"
+#include "TextLocatorDrawOverride.h"
+#include "LabelLocator.h"
+#include "LabelLocatorDrawOverride.h"
+
+#include <maya/MFnTypedAttribute.h>
+#include <maya/MFnStringData.h>
+#include <maya/MFnCamera.h>
+#include <maya/MFnPlugin.h>
+#include <maya/MDagPath.h>
+#include <maya/MPoint.h>
+#include <maya/MVector.h>
+#include <maya/MColor.h>
+#include <maya/MTypeId.h>
+#include <maya/MDrawRegistry.h>
+#include <maya/MViewport2Renderer.h>
+
+MTypeId TextLocator::id(0x80006);
+MObject TextLocator::aText;
+MString TextLocator::drawDbClassification("drawdb/geometry/textLocator");
+MString TextLocator::drawRegistrantId("TextLocatorPlugin");
+
+TextLocator::TextLocator() : mTextDirty(true)
+{
+    mLayout.generation = 0;
+}
+
+TextLocator::~TextLocator() {}
 
-class TextLocator : public MPxLocatorNode
+MStatus TextLocator::setDependentsDirty(const MPlug& plug, MPlugArray& plugArray)
 {
-public:
-    TextLocator();
-    virtual ~TextLocator();
+    if (plug == aText)
+    {
+        // Read and lay out the text again on the next draw
+        mTextDirty = true;
+        MHWRender::MRenderer::setGeometryDrawDirty(thisMObject());
+    }
+    return MPxLocatorNode::setDependentsDirty(plug, plugArray);
+}
 
-    virtual void draw(M3dView& view, const MDagPath& path, M3dView::DisplayStyle style, M3dView::DisplayStatus status);
+const MString& TextLocator::text()
+{
+    if (mTextDirty)
+    {
+        MPlug(thisMObject(), aText).getValue(mText);
 
-    static void* creator();
-    static MStatus initialize();
+        mLayout.lines.clear();
+        mText.split('\n', mLayout.lines);
+        mLayout.generation++;
+        mTextDirty = false;
+    }
+    return mText;
+}
 
-    static MTypeId id;
-    static MObject aText;
-};
+const TextLayout& TextLocator::layout()
+{
+    text();
+    return mLayout;
+}
 
 void TextLocator::draw(M3dView& view, const MDagPath& path, M3dView::DisplayStyle style, M3dView::DisplayStatus status)
 {
-    MObject thisNode = thisMObject();
-    MString text;
-    MGlobal::executeCommand("getAttr " + MString(thisNode.partialPathName()) + ".text", text);
+    const TextLayout& lines = layout();
 
-    if (status == M3dView::kActive || status == M3dView::kLead)
+    if ((status == M3dView::kActive || status == M3dView::kLead) && lines.lines.length())
     {
         view.beginGL();
-        glPushAttrib(GL_CURRENT_BIT);
 
-        // Get the camera's position and view direction
-        MPoint cameraPos;
-        MVector cameraDirection;
-        view.getCamera(cameraPos, cameraDirection);
-        cameraDirection = -cameraDirection;
+        // Get the camera's view direction
+        MDagPath cameraPath;
+        view.getCamera(cameraPath);
+        MVector cameraDirection = -MFnCamera(cameraPath).viewDirection(MSpace::kWorld);
 
         // Get the position of the locator
         MPoint locatorPos = path.inclusiveMatrix() * MPoint::origin;
@@ -42,11 +77,23 @@ void TextLocator::draw(M3dView& view, const MDagPath& path, M3dView::DisplayStyl
         // Calculate the text's position
         MPoint textPos = locatorPos + (cameraDirection * 0.1);
 
+        // Step between two lines at the depth of the text, kLineSpacing pixels down
+        MVector lineStep;
+        short x, y;
+        MPoint nearPos, farPos, lineNear, lineFar;
+        if (lines.lines.length() > 1 && view.worldToView(textPos, x, y))
+        {
+            view.viewToWorld(x, y, nearPos, farPos);
+            view.viewToWorld(x, y - kLineSpacing, lineNear, lineFar);
+            double depth = (textPos - nearPos).length() / (farPos - nearPos).length();
+            lineStep = (lineNear + (lineFar - lineNear) * depth) - textPos;
+        }
+
         // Draw text
-        glColor3f(1.0, 0.0, 0.0);
-        view.drawText(text, textPos, M3dView::kLeft);
+        view.setDrawColor(MColor(1.0f, 0.0f, 0.0f));
+        for (unsigned int i = 0; i < lines.lines.length(); i++)
+            view.drawText(lines.lines[i], textPos + lineStep * i, M3dView::kLeft);
 
-        glPopAttrib();
         view.endGL();
     }
     else
@@ -58,11 +105,11 @@ void TextLocator::draw(M3dView& view, const MDagPath& path, M3dView::DisplayStyl
 
 MStatus TextLocator::initialize()
 {
-    MFnNumericAttribute nAttr;
-    aText = nAttr.create("text", "txt", MFnNumericData::kString);
-    nAttr.setStorable(true);
+    MFnTypedAttribute tAttr;
+    MFnStringData stringData;
+    aText = tAttr.create("text", "txt", MFnData::kString, stringData.create(""));
+    tAttr.setStorable(true);
     addAttribute(aText);
-    attributeAffects(aText, outputGeom);
 
     return MS::kSuccess;
 }
@@ -75,7 +122,71 @@ void* TextLocator::creator()
 MStatus initializePlugin(MObject obj)
 {
     MFnPlugin plugin(obj, "MyPlugin", "1.0", "Any");
-    plugin.registerNode("textLocator", TextLocator::id, TextLocator::creator, TextLocator::initialize);
+    MStatus status = plugin.registerNode("textLocator", TextLocator::id, TextLocator::creator, TextLocator::initialize,
+                                         MPxNode::kLocatorNode, &TextLocator::drawDbClassification);
+    if (!status)
+    {
+        status.perror("registerNode");
+        return status;
+    }
+
+    status = MHWRender::MDrawRegistry::registerDrawOverrideCreator(TextLocator::drawDbClassification, TextLocator::drawRegistrantId,
+                                                                  TextLocatorDrawOverride::Creator);
+    if (!status)
+    {
+        status.perror("registerDrawOverrideCreator");
+        return status;
+    }
+
+    status = plugin.registerNode("labelLocator", LabelLocator::id, LabelLocator::creator, LabelLocator::initialize,
+                                 MPxNode::kLocatorNode, &LabelLocator::drawDbClassification);
+    if (!status)
+    {
+        status.perror("registerNode");
+        return status;
+    }
+
+    status = MHWRender::MDrawRegistry::registerDrawOverrideCreator(LabelLocator::drawDbClassification, LabelLocator::drawRegistrantId,
+                                                                  LabelLocatorDrawOverride::Creator);
+    if (!status)
+    {
+        status.perror("registerDrawOverrideCreator");
+        return status;
+    }
+
+    return MS::kSuccess;
+}
+
+MStatus uninitializePlugin(MObject obj)
+{
+    MFnPlugin plugin(obj);
+    MStatus status = MHWRender::MDrawRegistry::deregisterDrawOverrideCreator(LabelLocator::drawDbClassification, LabelLocator::drawRegistrantId);
+    if (!status)
+    {
+        status.perror("deregisterDrawOverrideCreator");
+        return status;
+    }
+
+    status = plugin.deregisterNode(LabelLocator::id);
+    if (!status)
+    {
+        status.perror("deregisterNode");
+        return status;
+    }
+
+    status = MHWRender::MDrawRegistry::deregisterDrawOverrideCreator(TextLocator::drawDbClassification, TextLocator::drawRegistrantId);
+    if (!status)
+    {
+        status.perror("deregisterDrawOverrideCreator");
+        return status;
+    }
+
+    status = plugin.deregisterNode(TextLocator::id);
+    if (!status)
+    {
+        status.perror("deregisterNode");
+        return status;
+    }
 
     return MS::kSuccess;
 }
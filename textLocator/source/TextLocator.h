@@ -3,9 +3,18 @@
 
 #include <maya/MPxLocatorNode.h>
 #include <maya/MString.h>
+#include <maya/MStringArray.h>
 #include <maya/M3dView.h>
 #include <maya/MDrawContext.h>
-#include <maya/MGlobal.h>
+#include <maya/MPlug.h>
+#include <maya/MPlugArray.h>
+
+// Lines of the text, split once when the text attribute changes
+struct TextLayout
+{
+    MStringArray lines;
+    unsigned int generation;    // bumped every time the text is laid out again
+};
 
 class TextLocator : public MPxLocatorNode
 {
@@ -13,10 +22,27 @@ public:
     TextLocator();
     virtual ~TextLocator();
     virtual void draw(M3dView& view, const MDagPath& path, M3dView::DisplayStyle style, M3dView::DisplayStatus status);
+    virtual MStatus setDependentsDirty(const MPlug& plug, MPlugArray& plugArray);
+
+    // Text and layout, read from the text plug only after it changed
+    const MString& text();
+    const TextLayout& layout();
+
     static void* creator();
     static MStatus initialize();
     static MTypeId id;
     static MObject aText;
+
+    static MString drawDbClassification;
+    static MString drawRegistrantId;
+
+    // Pixels between two lines of text
+    static const int kLineSpacing = 16;
+
+private:
+    MString mText;
+    TextLayout mLayout;
+    bool mTextDirty;
 };
 
 #endif // __TEXT_LOCATOR_H__
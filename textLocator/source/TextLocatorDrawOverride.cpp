@@ -0,0 +1,100 @@
+#include "TextLocatorDrawOverride.h"
+#include "TextLocator.h"
+
+#include <maya/MFnDependencyNode.h>
+#include <maya/MGeometryUtilities.h>
+#include <maya/MDoubleArray.h>
+#include <maya/MDagPath.h>
+#include <maya/MPoint.h>
+#include <maya/MMatrix.h>
+#include <maya/MVector.h>
+
+TextLocatorDrawOverride::TextLocatorDrawOverride(const MObject& obj)
+    // Always dirty: the lines are stacked in screen space, which follows the camera
+    : MHWRender::MPxDrawOverride(obj, NULL, true)
+{
+}
+
+TextLocatorDrawOverride::~TextLocatorDrawOverride() {}
+
+MHWRender::MPxDrawOverride* TextLocatorDrawOverride::Creator(const MObject& obj)
+{
+    return new TextLocatorDrawOverride(obj);
+}
+
+MHWRender::DrawAPI TextLocatorDrawOverride::supportedDrawAPIs() const
+{
+    return MHWRender::kAllDevices;
+}
+
+bool TextLocatorDrawOverride::isBounded(const MDagPath& objPath, const MDagPath& cameraPath) const
+{
+    return false;
+}
+
+MUserData* TextLocatorDrawOverride::prepareForDraw(const MDagPath& objPath, const MDagPath& cameraPath,
+                                                   const MHWRender::MFrameContext& frameContext, MUserData* oldData)
+{
+    TextLocatorData* data = dynamic_cast<TextLocatorData*>(oldData);
+    if (!data)
+        data = new TextLocatorData();
+
+    // Only the selected locators show their text
+    MHWRender::DisplayStatus status = MHWRender::MGeometryUtilities::displayStatus(objPath);
+    TextLocator* locator = dynamic_cast<TextLocator*>(MFnDependencyNode(objPath.node()).userNode());
+    data->visible = locator && (status == MHWRender::kActive || status == MHWRender::kLead);
+    if (!data->visible)
+        return data;
+
+    // The text plug is only read after it changed, the lines only copied then
+    const TextLayout& layout = locator->layout();
+    if (data->generation != layout.generation)
+    {
+        data->lines = layout.lines;
+        data->generation = layout.generation;
+    }
+
+    unsigned int numLines = data->lines.length();
+    data->positions.setLength(numLines);
+    if (!numLines)
+        return data;
+
+    // Text slightly in front of the locator, towards the camera
+    MDoubleArray viewDirection = frameContext.getTuple(MHWRender::MFrameContext::kViewDirection);
+    MVector cameraDirection(-viewDirection[0], -viewDirection[1], -viewDirection[2]);
+    MPoint textPos = objPath.inclusiveMatrix() * MPoint::origin + cameraDirection * 0.1;
+
+    // Step between two lines at the depth of the text, kLineSpacing pixels down
+    MVector lineStep;
+    int x, y;
+    MPoint nearPos, farPos, lineNear, lineFar;
+    if (numLines > 1 && frameContext.worldToViewport(textPos, x, y))
+    {
+        frameContext.viewportToWorld(x, y, nearPos, farPos);
+        frameContext.viewportToWorld(x, y - TextLocator::kLineSpacing, lineNear, lineFar);
+        double depth = (textPos - nearPos).length() / (farPos - nearPos).length();
+        lineStep = (lineNear + (lineFar - lineNear) * depth) - textPos;
+    }
+
+    // UI drawables are drawn in the locator's space
+    MMatrix worldToLocal = objPath.inclusiveMatrixInverse();
+    for (unsigned int i = 0; i < numLines; i++)
+        data->positions[i] = (textPos + lineStep * i) * worldToLocal;
+
+    return data;
+}
+
+void TextLocatorDrawOverride::addUIDrawables(const MDagPath& objPath, MHWRender::MUIDrawManager& drawManager,
+                                             const MHWRender::MFrameContext& frameContext, const MUserData* data)
+{
+    const TextLocatorData* locatorData = dynamic_cast<const TextLocatorData*>(data);
+    if (!locatorData || !locatorData->visible || !locatorData->lines.length())
+        return;
+
+    // Every line of the locator in one drawable
+    drawManager.beginDrawable();
+    drawManager.setColor(locatorData->color);
+    for (unsigned int i = 0; i < locatorData->lines.length(); i++)
+        drawManager.text(locatorData->positions[i], locatorData->lines[i], MHWRender::MUIDrawManager::kLeft);
+    drawManager.endDrawable();
+}
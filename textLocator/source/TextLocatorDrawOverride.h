@@ -0,0 +1,47 @@
+#ifndef __TEXT_LOCATOR_DRAW_OVERRIDE_H__
+#define __TEXT_LOCATOR_DRAW_OVERRIDE_H__
+
+#include <maya/MPxDrawOverride.h>
+#include <maya/MUserData.h>
+#include <maya/MUIDrawManager.h>
+#include <maya/MFrameContext.h>
+#include <maya/MStringArray.h>
+#include <maya/MPointArray.h>
+#include <maya/MColor.h>
+
+// What addUIDrawables draws: the lines are copied from the locator only when
+// it laid out its text again
+class TextLocatorData : public MUserData
+{
+public:
+    TextLocatorData() : MUserData(false), visible(false), generation(0), color(1.0f, 0.0f, 0.0f) {}
+    virtual ~TextLocatorData() {}
+
+    bool visible;
+    unsigned int generation;
+    MStringArray lines;
+    MPointArray positions;
+    MColor color;
+};
+
+class TextLocatorDrawOverride : public MHWRender::MPxDrawOverride
+{
+public:
+    static MHWRender::MPxDrawOverride* Creator(const MObject& obj);
+    virtual ~TextLocatorDrawOverride();
+
+    virtual MHWRender::DrawAPI supportedDrawAPIs() const;
+    virtual bool isBounded(const MDagPath& objPath, const MDagPath& cameraPath) const;
+
+    virtual MUserData* prepareForDraw(const MDagPath& objPath, const MDagPath& cameraPath,
+                                      const MHWRender::MFrameContext& frameContext, MUserData* oldData);
+
+    virtual bool hasUIDrawables() const { return true; }
+    virtual void addUIDrawables(const MDagPath& objPath, MHWRender::MUIDrawManager& drawManager,
+                                const MHWRender::MFrameContext& frameContext, const MUserData* data);
+
+private:
+    TextLocatorDrawOverride(const MObject& obj);
+};
+
+#endif // __TEXT_LOCATOR_DRAW_OVERRIDE_H__
@@ -1,14 +1,38 @@
 #include "WrinkleDeformer.h"
 #include <maya/MFnNumericAttribute.h>
+#include <maya/MFnTypedAttribute.h>
+#include <maya/MFnDoubleArrayData.h>
+#include <maya/MArrayDataBuilder.h>
+#include <maya/MDoubleArray.h>
 #include <maya/MFnPlugin.h>
 #include <maya/MItGeometry.h>
+#include <maya/MArrayDataHandle.h>
 #include <maya/MPointArray.h>
 #include <maya/MFnMesh.h>
+#include <maya/MProfiler.h>
+
+#include <vector>
 
 // Define the static members
 MTypeId     WrinkleDeformer::id(0x0011E182); // Unique ID for the node
 MObject     WrinkleDeformer::intensityAttr;  // Attribute for intensity
 MObject     WrinkleDeformer::paintMapAttr;   // Attribute for paint map
+MObject     WrinkleDeformer::restMeshAttr;   // Attribute for the rest mesh
+MObject     WrinkleDeformer::numThreadsAttr; // Attribute for the kernel thread count
+MObject     WrinkleDeformer::compressionAttr; // Attribute for the compression output
+
+namespace
+{
+void toFlatArray(const MPointArray& points, std::vector<double>& flat)
+{
+    flat.resize(points.length() * 3);
+    for (unsigned int i = 0; i < points.length(); ++i) {
+        flat[i * 3] = points[i].x;
+        flat[i * 3 + 1] = points[i].y;
+        flat[i * 3 + 2] = points[i].z;
+    }
+}
+}
 
 WrinkleDeformer::WrinkleDeformer() {}
 
@@ -39,99 +63,317 @@ MStatus WrinkleDeformer::initialize()
     nAttr.setUsesArrayDataBuilder(true);
     addAttribute(paintMapAttr);
 
+    // Create the rest mesh attribute, compression is measured against it
+    MFnTypedAttribute tAttr;
+    restMeshAttr = tAttr.create("restMesh", "rm", MFnData::kMesh);
+    tAttr.setStorable(false);
+    addAttribute(restMeshAttr);
+
+    // Create the thread count attribute, 0 uses every core
+    numThreadsAttr = nAttr.create("numThreads", "nth", MFnNumericData::kInt, 0);
+    nAttr.setMin(0);
+    addAttribute(numThreadsAttr);
+
+    // Create the per-vertex compression output, one double array per input
+    // geometry, so other nodes can reuse the map
+    compressionAttr = tAttr.create("compression", "cmp", MFnData::kDoubleArray);
+    tAttr.setArray(true);
+    tAttr.setUsesArrayDataBuilder(true);
+    tAttr.setWritable(false);
+    tAttr.setStorable(false);
+    addAttribute(compressionAttr);
+
     // Define the effect of the attributes on the deformer
     attributeAffects(intensityAttr, outputGeom);
     attributeAffects(paintMapAttr, outputGeom);
+    attributeAffects(restMeshAttr, outputGeom);
+    attributeAffects(numThreadsAttr, outputGeom);
+    attributeAffects(input, compressionAttr);
+    attributeAffects(restMeshAttr, compressionAttr);
 
     return MS::kSuccess;
 }
 
+// Category of the deformer's events in the Profiler window
+static int profilerCategory()
+{
+    static const int category = MProfiler::addCategory("WrinkleDeformer", "WrinkleDeformer plugin calls");
+    return category;
+}
+
 MStatus WrinkleDeformer::deform(MDataBlock& dataBlock, MItGeometry& iter, const MMatrix& mat, unsigned int multiIndex)
 {
+    MProfilingScope profilingScope(profilerCategory(), MProfiler::kColorE_L3, "deform");
+
     // Get the intensity attribute value
     MDataHandle intensityHandle = dataBlock.inputValue(intensityAttr);
     float intensity = intensityHandle.asFloat();
 
-    // Iterate over each point in the geometry
-    for (; !iter.isDone(); iter.next()) 
-    {
-        // Get the original position of the current point
-        MPoint point = iter.position();
+    MStatus status;
+    MObject inputMesh = getInputMesh(dataBlock, multiIndex, &status);
+    CHECK_MSTATUS_AND_RETURN_IT(status);
+
+    // Rest lengths and neighbours come from the cache, so each evaluation
+    // only has to read the current positions
+    const RestCache* cache = getRestCache(dataBlock, multiIndex, inputMesh);
+    if (cache == nullptr) {
+        return MS::kFailure;
+    }
 
-        // Calculate compression for the current point
-        float compression = calculateCompression(iter);
+    unsigned int numThreads = static_cast<unsigned int>(dataBlock.inputValue(numThreadsAttr).asInt());
+    float env = dataBlock.inputValue(envelope).asFloat();
+    const WrinkleRest& rest = cache->rest;
+
+    MPointArray points;
+    iter.allPositions(points);
+    const unsigned int numPoints = points.length();
+
+    // Only the points with a non-zero weight are deformed, the index of
+    // those is cached until the weights change
+    const WeightIndex& weightIndex = getWeightIndex(dataBlock, iter, multiIndex, numPoints);
+    const size_t numPainted = weightIndex.size();
+
+    // Compression needs the neighbours of the painted points, read the whole
+    // input mesh when only some of its vertices are iterated
+    std::vector<double> flatPoints;
+    if (numPoints == rest.numVertices()) {
+        toFlatArray(points, flatPoints);
+    } else {
+        status = getInputPoints(inputMesh, rest, flatPoints);
+        CHECK_MSTATUS_AND_RETURN_IT(status);
+    }
 
-        // Apply the wrinkle effect based on intensity and compression
-        point.y += intensity * compression; // Placeholder modification
+    // Copy the painted points into a flat xyz array, so the kernels never
+    // call back into Maya
+    std::vector<double> painted(numPainted * 3);
+    for (size_t i = 0; i < numPainted; ++i) {
+        const MPoint& point = points[weightIndex.points[i]];
+        painted[i * 3] = point.x;
+        painted[i * 3 + 1] = point.y;
+        painted[i * 3 + 2] = point.z;
+    }
 
-        // Set the new position of the point
-        iter.setPosition(point);
+    std::vector<float> compression;
+    if (weightIndex.isSparse()) {
+        // Measure only the edges of the painted vertices, the compression
+        // output is left to compute() when it is pulled
+        compression.resize(numPainted);
+        computeVertexCompression(rest, flatPoints.data(), weightIndex.vertices.data(), numPainted,
+                                 compression.data(), numThreads);
+        wrinkleDeform(painted.data(), numPainted, nullptr, compression.data(), weightIndex.weights.data(),
+                      intensity, env, numThreads);
+    } else {
+        compression.resize(rest.numVertices());
+        computeCompression(rest, flatPoints.data(), compression.data(), numThreads);
+        setCompressionOutput(dataBlock, multiIndex, compression);
+        wrinkleDeform(painted.data(), numPainted, weightIndex.vertices.data(), compression.data(),
+                      weightIndex.weights.data(), intensity, env, numThreads);
     }
 
+    for (size_t i = 0; i < numPainted; ++i) {
+        points[weightIndex.points[i]] = MPoint(painted[i * 3], painted[i * 3 + 1], painted[i * 3 + 2]);
+    }
+    iter.setAllPositions(points);
+
     return MS::kSuccess;
 }
 
-float WrinkleDeformer::calculateCompression(MItGeometry& geomIter)
+MStatus WrinkleDeformer::compute(const MPlug& plug, MDataBlock& dataBlock)
 {
+    if (plug.attribute() != compressionAttr) {
+        return MPxDeformerNode::compute(plug, dataBlock);
+    }
+    MProfilingScope profilingScope(profilerCategory(), MProfiler::kColorE_L3, "compute");
+
+    // The compression map was pulled on its own, by a shader or another
+    // wrinkle node, measure every input without deforming anything. Nothing
+    // evaluated the input geometry yet, so it is pulled from upstream here
     MStatus status;
+    unsigned int numThreads = static_cast<unsigned int>(dataBlock.inputValue(numThreadsAttr).asInt());
+    MArrayDataHandle inputHandle = dataBlock.inputArrayValue(input, &status);
+    CHECK_MSTATUS_AND_RETURN_IT(status);
+    std::vector<float> compression;
+    for (unsigned int i = 0; i < inputHandle.elementCount(); ++i) {
+        inputHandle.jumpToArrayElement(i);
+        unsigned int multiIndex = inputHandle.elementIndex();
+        MObject inputMesh = inputHandle.inputValue().child(inputGeom).asMesh();
+        const RestCache* cache = getRestCache(dataBlock, multiIndex, inputMesh);
+        if (cache == nullptr) {
+            continue;
+        }
+        status = computeInputCompression(inputMesh, cache->rest, numThreads, compression);
+        CHECK_MSTATUS_AND_RETURN_IT(status);
+        setCompressionOutput(dataBlock, multiIndex, compression);
+    }
+    dataBlock.setClean(plug);
+    return MS::kSuccess;
+}
+
+const WeightIndex& WrinkleDeformer::getWeightIndex(MDataBlock& dataBlock, MItGeometry& iter, unsigned int multiIndex,
+                                                   unsigned int numPoints)
+{
+    WeightIndex& weightIndex = mWeightIndices[multiIndex];
+    if (weightIndex.numPoints == numPoints && numPoints > 0) {
+        return weightIndex;
+    }
 
-    // Get the thisMObject (the MObject representing this node)
-    MObject thisNode = thisMObject();
-
-    // Access the original mesh (rest state)
-    MPlug inputPlug(thisNode, input);
-    inputPlug = inputPlug.elementByLogicalIndex(geomIter.index());
-    MDataHandle inputDataHandle = inputPlug.asMDataHandle();
-    MObject inputDataObject = inputDataHandle.asMesh();
-    
-    // Original positions of vertices
-    MFnMesh inputMeshFn(inputDataObject, &status);
-    CHECK_MSTATUS_AND_RETURN(status, 0.0f);
-    MPointArray origPoints;
-    inputMeshFn.getPoints(origPoints, MSpace::kWorld);
-
-    // Current position
-    MPoint currentPoint = geomIter.position(MSpace::kWorld);
-
-    // Initialize variables for distance calculation
-    double totalDistChange = 0.0;
-    int numAdjacentVerts = 0;
-
-    // Get the list of connected vertices
-    MIntArray connectedVertices;
-    geomIter.getConnectedVertices(connectedVertices);
-
-    for (unsigned int i = 0; i < connectedVertices.length(); ++i) {
-        // Original and current position of the connected vertex
-        MPoint origPosConnected = origPoints[connectedVertices[i]];
-        geomIter.setPosition(connectedVertices[i]);
-        MPoint currentPosConnected = geomIter.position(MSpace::kWorld);
-
-        // Calculate distance change
-        double origDist = (origPosConnected - origPoints[geomIter.index()]).length();
-        double currentDist = (currentPosConnected - currentPoint).length();
-
-        // Accumulate the change in distance
-        double distChange = origDist - currentDist;
-        if (distChange > 0) { // Consider only compression, not expansion
-            totalDistChange += distChange;
-            numAdjacentVerts++;
+    // An empty paint map leaves the weights as they are, elements missing
+    // from a painted one are 0
+    MArrayDataHandle paintMapHandle = dataBlock.inputArrayValue(paintMapAttr);
+    std::vector<float> paintMap;
+    for (unsigned int i = 0; i < paintMapHandle.elementCount(); ++i) {
+        paintMapHandle.jumpToArrayElement(i);
+        unsigned int index = paintMapHandle.elementIndex();
+        if (index >= paintMap.size()) {
+            paintMap.resize(index + 1, 0.0f);
+        }
+        paintMap[index] = paintMapHandle.inputValue().asFloat();
+    }
+    const bool hasPaintMap = paintMapHandle.elementCount() > 0;
+
+    weightIndex.clear();
+    weightIndex.numPoints = numPoints;
+    unsigned int point = 0;
+    for (iter.reset(); !iter.isDone(); iter.next(), ++point) {
+        unsigned int vertex = iter.index();
+        float weight = weightValue(dataBlock, multiIndex, vertex);
+        if (hasPaintMap) {
+            weight *= vertex < paintMap.size() ? paintMap[vertex] : 0.0f;
         }
+        weightIndex.add(point, vertex, weight);
+    }
+    iter.reset();
+    return weightIndex;
+}
 
-        // Reset the iterator's position
-        geomIter.setPosition(currentPoint, MSpace::kWorld);
+MObject WrinkleDeformer::getInputMesh(MDataBlock& dataBlock, unsigned int multiIndex, MStatus* status) const
+{
+    // deform() runs after the input was evaluated, read it without pulling
+    MArrayDataHandle inputHandle = dataBlock.outputArrayValue(input, status);
+    CHECK_MSTATUS_AND_RETURN(*status, MObject::kNullObj);
+    *status = inputHandle.jumpToElement(multiIndex);
+    CHECK_MSTATUS_AND_RETURN(*status, MObject::kNullObj);
+    return inputHandle.outputValue().child(inputGeom).asMesh();
+}
+
+MStatus WrinkleDeformer::getInputPoints(const MObject& inputMesh, const WrinkleRest& rest,
+                                        std::vector<double>& flatPoints) const
+{
+    MPointArray meshPoints;
+    MStatus status = MFnMesh(inputMesh).getPoints(meshPoints);
+    CHECK_MSTATUS_AND_RETURN_IT(status);
+    if (meshPoints.length() != rest.numVertices()) {
+        return MS::kFailure;
+    }
+    toFlatArray(meshPoints, flatPoints);
+    return MS::kSuccess;
+}
+
+MStatus WrinkleDeformer::computeInputCompression(const MObject& inputMesh, const WrinkleRest& rest,
+                                                 unsigned int numThreads, std::vector<float>& compression) const
+{
+    std::vector<double> flatMeshPoints;
+    MStatus status = getInputPoints(inputMesh, rest, flatMeshPoints);
+    CHECK_MSTATUS_AND_RETURN_IT(status);
+    compression.resize(rest.numVertices());
+    computeCompression(rest, flatMeshPoints.data(), compression.data(), numThreads);
+    return MS::kSuccess;
+}
+
+MStatus WrinkleDeformer::setCompressionOutput(MDataBlock& dataBlock, unsigned int multiIndex,
+                                              const std::vector<float>& compression) const
+{
+    MStatus status;
+    MDoubleArray values(static_cast<unsigned int>(compression.size()));
+    for (unsigned int i = 0; i < values.length(); ++i) {
+        values[i] = compression[i];
+    }
+    MFnDoubleArrayData dataFn;
+    MObject data = dataFn.create(values, &status);
+    CHECK_MSTATUS_AND_RETURN_IT(status);
+
+    MArrayDataHandle arrayHandle = dataBlock.outputArrayValue(compressionAttr, &status);
+    CHECK_MSTATUS_AND_RETURN_IT(status);
+    MArrayDataBuilder builder = arrayHandle.builder();
+    builder.addElement(multiIndex).setMObject(data);
+    arrayHandle.set(builder);
+    arrayHandle.setAllClean();
+    return MS::kSuccess;
+}
+
+MStatus WrinkleDeformer::setDependentsDirty(const MPlug& plug, MPlugArray& affected)
+{
+    // A new rest shape invalidates every cached rest state
+    if (plug == restMeshAttr) {
+        mRestCaches.clear();
+    }
+    // Painting rebuilds the weight indices on the next evaluation
+    if (plug == weightList || plug == weights || plug == paintMapAttr) {
+        mWeightIndices.clear();
     }
+    return MPxDeformerNode::setDependentsDirty(plug, affected);
+}
 
-    // Calculate average compression factor
-    float compressionFactor = 0.0f;
-    if (numAdjacentVerts > 0) {
-        double avgDistChange = totalDistChange / numAdjacentVerts;
-        compressionFactor = static_cast<float>(std::min(avgDistChange, 1.0));
+const WrinkleDeformer::RestCache* WrinkleDeformer::getRestCache(MDataBlock& dataBlock, unsigned int multiIndex,
+                                                                MObject& inputMesh)
+{
+    MStatus status;
+    MFnMesh inputMeshFn(inputMesh, &status);
+    CHECK_MSTATUS_AND_RETURN(status, nullptr);
+
+    // The topology counts are cheap to query and identify the cached state
+    RestCache& cache = mRestCaches[multiIndex];
+    if (cache.numVertices == inputMeshFn.numVertices() &&
+        cache.numPolygons == inputMeshFn.numPolygons() &&
+        cache.numFaceVertices == inputMeshFn.numFaceVertices()) {
+        return &cache;
     }
 
-    return compressionFactor;
+    MObject restMesh = dataBlock.inputValue(restMeshAttr).asMesh();
+    status = buildRestCache(inputMesh, restMesh, cache);
+    CHECK_MSTATUS_AND_RETURN(status, nullptr);
+
+    return &cache;
 }
 
+MStatus WrinkleDeformer::buildRestCache(MObject& topologyMesh, MObject& restMesh, RestCache& cache) const
+{
+    MStatus status;
+
+    MFnMesh topologyFn(topologyMesh, &status);
+    CHECK_MSTATUS_AND_RETURN_IT(status);
+
+    // Prefer the connected rest mesh, otherwise capture the input as it is now
+    MPointArray restPoints;
+    MFnMesh restFn;
+    if (!restMesh.isNull() && restFn.setObject(restMesh) == MS::kSuccess &&
+        restFn.numVertices() == topologyFn.numVertices()) {
+        restFn.getPoints(restPoints);
+    } else {
+        topologyFn.getPoints(restPoints);
+    }
+
+    // Store every undirected edge once with its rest length
+    const unsigned int numVertices = topologyFn.numVertices();
+    const int numEdges = topologyFn.numEdges();
+    WrinkleRest& rest = cache.rest;
+    rest.edgeVertices.resize(numEdges * 2);
+    rest.restLengths.resize(numEdges);
+    int2 ends;
+    for (int edge = 0; edge < numEdges; ++edge) {
+        topologyFn.getEdgeVertices(edge, ends);
+        rest.edgeVertices[edge * 2] = ends[0];
+        rest.edgeVertices[edge * 2 + 1] = ends[1];
+        rest.restLengths[edge] = (restPoints[ends[1]] - restPoints[ends[0]]).length();
+    }
+    rest.buildVertexEdges(numVertices);
+
+    cache.numVertices = topologyFn.numVertices();
+    cache.numPolygons = topologyFn.numPolygons();
+    cache.numFaceVertices = topologyFn.numFaceVertices();
+
+    return MS::kSuccess;
+}
 
 // Plug-in initialization and uninitialization routines
 MStatus initializePlugin(MObject obj)
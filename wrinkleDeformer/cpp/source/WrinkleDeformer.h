@@ -5,6 +5,14 @@
 #include <maya/MPxDeformerNode.h>
 #include <maya/MTypeId.h>
 #include <maya/MItGeometry.h>
+#include <maya/MPointArray.h>
+#include <maya/MPlugArray.h>
+
+#include <map>
+#include <vector>
+
+#include "WeightIndex.h"
+#include "WrinkleKernel.h"
 
 class WrinkleDeformer : public MPxDeformerNode
 {
@@ -22,18 +30,58 @@ public:
     // The main deformation function that will be overridden from the parent class
     virtual MStatus deform(MDataBlock& dataBlock, MItGeometry& iter, const MMatrix& mat, unsigned int multiIndex);
 
+    // Computes the compression output on its own when it is pulled without
+    // the output geometry
+    virtual MStatus compute(const MPlug& plug, MDataBlock& dataBlock);
+
+    // Drops the cached rest state when the rest mesh changes and the weight
+    // indices when the weights or the paint map are painted
+    virtual MStatus setDependentsDirty(const MPlug& plug, MPlugArray& affected);
+
     // Unique ID to identify this deformer node type
     static MTypeId id;
 
     // Attributes of the deformer
     static MObject intensityAttr; // Attribute to control the intensity of the wrinkle effect
     static MObject paintMapAttr;  // Attribute to control the paint map
+    static MObject restMeshAttr;  // Mesh the compression is measured against
+    static MObject numThreadsAttr; // Threads used by the deform kernels, 0 for all cores
+    static MObject compressionAttr; // Per-vertex compression of every input geometry
 
 private:
-    // Helper method to calculate compression for wrinkle effect
-    float calculateCompression(const MItGeometry& iter);
+    // Rest edges and lengths of one input geometry, keyed on its topology counts
+    struct RestCache
+    {
+        int numVertices = -1;
+        int numPolygons = -1;
+        int numFaceVertices = -1;
+        WrinkleRest rest;
+    };
+
+    // Returns the rest cache of the geometry at multiIndex, rebuilding it only
+    // when the input topology or the rest mesh changed
+    const RestCache* getRestCache(MDataBlock& dataBlock, unsigned int multiIndex, MObject& inputMesh);
+    MStatus buildRestCache(MObject& topologyMesh, MObject& restMesh, RestCache& cache) const;
+
+    // Returns the index of the iterated points whose weight times paint map
+    // value is not zero, reading the weights only when it has to be rebuilt
+    const WeightIndex& getWeightIndex(MDataBlock& dataBlock, MItGeometry& iter, unsigned int multiIndex,
+                                      unsigned int numPoints);
+
+    // Input mesh at multiIndex as deform() sees it, without evaluating it
+    MObject getInputMesh(MDataBlock& dataBlock, unsigned int multiIndex, MStatus* status) const;
+
+    // Flat xyz points of an input mesh
+    MStatus getInputPoints(const MObject& inputMesh, const WrinkleRest& rest, std::vector<double>& flatPoints) const;
+
+    // Compression of every vertex of an input mesh
+    MStatus computeInputCompression(const MObject& inputMesh, const WrinkleRest& rest,
+                                    unsigned int numThreads, std::vector<float>& compression) const;
+    MStatus setCompressionOutput(MDataBlock& dataBlock, unsigned int multiIndex,
+                                 const std::vector<float>& compression) const;
 
-    // Additional private members and methods can be declared here
+    std::map<unsigned int, RestCache> mRestCaches;
+    std::map<unsigned int, WeightIndex> mWeightIndices;
 };
 
 #endif // WRINKLEDEFORMER_H
@@ -1,31 +1,99 @@
-import maya.OpenMayaMPx as OpenMayaMPx
-import maya.OpenMaya as OpenMaya
+import maya.api.OpenMaya as OpenMaya
+import maya.api.OpenMayaAnim as OpenMayaAnim
+import numpy as np
 
-class WrinkleDeformer(OpenMayaMPx.MPxDeformerNode):
+from meshKernels.cache import MEGABYTE, OutputCache, cache_key
+from meshKernels.compression import RestState, topology_signature
+from meshKernels.deform import wrinkle_deform
+from meshKernels.profiling import iterated_points, profiled
+from meshKernels.weights import WeightIndex
+
+def maya_useNewAPI():
+    pass
+
+class WrinkleDeformer(OpenMayaAnim.MPxDeformerNode):
     kPluginNodeId = OpenMaya.MTypeId(0x0011E182)  # Unique ID for the plugin
     kPluginNodeName = "WrinkleDeformer"
 
     # Attribute handles
     intensityAttr = OpenMaya.MObject()
     paintMapAttr = OpenMaya.MObject()
+    restMeshAttr = OpenMaya.MObject()
+    compressionAttr = OpenMaya.MObject()
+    batchAttr = OpenMaya.MObject()
+    cacheAttr = OpenMaya.MObject()
+    cacheBudgetAttr = OpenMaya.MObject()
+    cacheHitsAttr = OpenMaya.MObject()
+    cacheMissesAttr = OpenMaya.MObject()
+    cacheEvictionsAttr = OpenMaya.MObject()
 
     def __init__(self):
-        OpenMayaMPx.MPxDeformerNode.__init__(self)
+        OpenMayaAnim.MPxDeformerNode.__init__(self)
+        # multiIndex -> RestState
+        self.restStates = {}
+        # multiIndex -> WeightIndex of the painted weights times the paint map
+        self.weightIndices = {}
+        # Deformed points of previously seen inputs, see the cache attribute
+        self.outputCache = OutputCache()
 
+    @profiled("WrinkleDeformer.deform", points=iterated_points)
     def deform(self, dataBlock, geomIter, matrix, multiIndex):
         # Get intensity attribute
         intensityHandle = dataBlock.inputValue(self.intensityAttr)
         intensity = intensityHandle.asFloat()
 
-        # Get paint map attribute
-        paintMapHandle = dataBlock.inputArrayValue(self.paintMapAttr)
+        # Rest edge lengths and neighbour lists come from the cache, so each
+        # evaluation only measures the current positions
+        restState = self.getRestState(dataBlock, multiIndex)
+
+        points = self.toArray(geomIter.allPositions())
+        wholeGeometry = len(points) == restState.topology.num_vertices
+
+        # Weights and paint map are only read again after they were edited
+        weightIndex = self.getWeightIndex(dataBlock, multiIndex, restState.topology.num_vertices)
+        envelope = dataBlock.inputValue(self.envelope).asFloat()
+
+        # Batch mode: the whole deformation is one array kernel and one write
+        if wholeGeometry and dataBlock.inputValue(self.batchAttr).asBool():
+            key, deformed = self.lookupCache(dataBlock, (points, weightIndex.weights), [multiIndex, intensity, envelope])
+            if deformed is None:
+                if weightIndex.sparse:
+                    # Only the painted vertices and their edges are measured,
+                    # the compression output is left to compute() when pulled
+                    compression = restState.compression(points, weightIndex.indices)
+                    deformed = weightIndex.scatter(points, wrinkle_deform(
+                        weightIndex.gather(points), compression, intensity, weightIndex.values, envelope))
+                else:
+                    compression = restState.compression(points)
+                    self.setCompressionOutput(dataBlock, multiIndex, compression)
+                    deformed = wrinkle_deform(points, compression, intensity, weightIndex.weights, envelope)
+                if key is not None:
+                    self.outputCache.put(key, deformed)
+            self.setCacheCounters(dataBlock)
 
+            geomIter.setAllPositions(self.toPointArray(deformed))
+            return
+
+        if wholeGeometry:
+            compression = restState.compression(points)
+        else:
+            # Only some vertices are deformed, measure the full input mesh
+            inputPoints = OpenMaya.MFnMesh(self.getInputMesh(dataBlock, multiIndex)).getPoints()
+            compression = restState.compression(self.toArray(inputPoints))
+        self.setCompressionOutput(dataBlock, multiIndex, compression)
+
+        weights = weightIndex.weights
         while geomIter.isDone() is False:
+            index = geomIter.index()
+            weight = weights[index] * envelope
+            if weight == 0.0:
+                # Unpainted points keep their position
+                geomIter.next()
+                continue
             point = geomIter.position()
-            weight = self.weightValue(dataBlock, multiIndex, geomIter.index())
 
-            # Analyze local geometry to detect compression
-            compressionFactor = self.calculateCompression(geomIter)
+            # Compression of the local geometry around this point
+            compressionFactor = compression[index]
 
             # Modify 'point' based on intensity, paintMap, and compression
             if compressionFactor > 0:
@@ -37,64 +105,154 @@ class WrinkleDeformer(OpenMayaMPx.MPxDeformerNode):
             geomIter.setPosition(point)
             geomIter.next()
 
-    def calculateCompression(self, geomIter):
+    @profiled("WrinkleDeformer.compute")
+    def compute(self, plug, dataBlock):
+        if plug.attribute() != WrinkleDeformer.compressionAttr:
+            return OpenMayaAnim.MPxDeformerNode.compute(self, plug, dataBlock)
+
+        # The compression map was pulled on its own, by a shader or another
+        # wrinkle node, measure every input without deforming anything.
+        # Nothing evaluated the input geometry yet, so pull it from upstream
+        inputHandle = dataBlock.inputArrayValue(self.input)
+        for i in range(len(inputHandle)):
+            inputHandle.jumpToPhysicalElement(i)
+            multiIndex = inputHandle.elementLogicalIndex()
+            inputMesh = inputHandle.inputValue().child(self.inputGeom).asMesh()
+            inputPoints = OpenMaya.MFnMesh(inputMesh).getPoints()
+            compression = self.getRestState(dataBlock, multiIndex, inputMesh).compression(self.toArray(inputPoints))
+            self.setCompressionOutput(dataBlock, multiIndex, compression)
+        dataBlock.setClean(plug)
+
+    def setCompressionOutput(self, dataBlock, multiIndex, compression):
+        """Publish the per-vertex compression of geometry multiIndex on the compression output."""
+        values = OpenMaya.MDoubleArray(compression.tolist())
+        arrayHandle = dataBlock.outputArrayValue(self.compressionAttr)
+        builder = arrayHandle.builder()
+        builder.addElement(multiIndex).setMObject(OpenMaya.MFnDoubleArrayData().create(values))
+        arrayHandle.set(builder)
+        arrayHandle.setAllClean()
+
+    def setDependentsDirty(self, plug, plugArray):
+        # A new rest shape invalidates every cached rest state
+        if plug.attribute() == WrinkleDeformer.restMeshAttr:
+            self.restStates = {}
+            self.outputCache.clear()
+        # Painting rebuilds the weight indices on the next evaluation
+        if plug.attribute() == self.weights or plug.attribute() == WrinkleDeformer.paintMapAttr:
+            self.weightIndices = {}
+        return OpenMayaAnim.MPxDeformerNode.setDependentsDirty(self, plug, plugArray)
+
+    def getRestState(self, dataBlock, multiIndex, inputMesh=None):
         """
-        Calculate the compression factor for the current vertex.
-        This method analyzes the local geometry to determine compression.
+        Return the cached rest state of the geometry at multiIndex, rebuilding
+        it only when there is none yet or the input topology changed.
+        inputMesh defaults to the input as deform() sees it.
         """
-        # Access the original mesh (rest state)
-        thisNode = self.thisMObject()
-        plug = OpenMaya.MPlug(thisNode, self.input)
-        plug = plug.elementByLogicalIndex(geomIter.index())
-        dataHandle = plug.asMDataHandle()
-        inputGeom = dataHandle.asMesh()
-
-        # Original positions of vertices
-        origPoints = OpenMaya.MPointArray()
-        inputGeom.getPoints(origPoints)
-
-        # Current position
-        currentPoint = geomIter.position()
-
-        # Calculate average change in distance to adjacent vertices
-        # Initialize variables for distance calculation
-        totalDistChange = 0.0
-        numAdjacentVerts = 0
-
-        # Get the list of connected vertices
-        connectedVertices = OpenMaya.MIntArray()
-        geomIter.getConnectedVertices(connectedVertices)
-
-        for i in range(connectedVertices.length()):
-            # Original and current position of the connected vertex
-            origPosConnected = origPoints[connectedVertices[i]]
-            currentPosConnected = geomIter.setPosition(connectedVertices[i])
-
-            # Calculate distance change
-            origDist = (origPosConnected - origPoints[geomIter.index()]).length()
-            currentDist = (currentPosConnected - currentPoint).length()
-
-            # Accumulate the change in distance
-            distChange = origDist - currentDist
-            if distChange > 0:  # Consider only compression, not expansion
-                totalDistChange += distChange
-                numAdjacentVerts += 1
-
-            # Reset the iterator's position
-            geomIter.setPosition(currentPoint)
-
-        # Calculate average compression factor
-        if numAdjacentVerts > 0:
-            avgDistChange = totalDistChange / numAdjacentVerts
-            compressionFactor = min(avgDistChange, 1.0)  # Normalize to a maximum of 1
-        else:
-            compressionFactor = 0.0
+        if inputMesh is None:
+            inputMesh = self.getInputMesh(dataBlock, multiIndex)
+        fnInput = OpenMaya.MFnMesh(inputMesh)
+        signature = topology_signature(fnInput.numVertices, fnInput.numPolygons, fnInput.numFaceVertices)
+
+        restState = self.restStates.get(multiIndex)
+        if restState is not None and restState.matches(signature):
+            return restState
+
+        # Prefer the connected rest mesh, otherwise capture the input as it is now
+        restMesh = dataBlock.inputValue(WrinkleDeformer.restMeshAttr).asMesh()
+        fnRest = fnInput
+        if not restMesh.isNull():
+            fnRest = OpenMaya.MFnMesh(restMesh)
+            if fnRest.numVertices != fnInput.numVertices:
+                fnRest = fnInput
+
+        counts, connects = fnInput.getVertices()
+        restState = RestState(self.toArray(fnRest.getPoints()), list(counts), list(connects))
+        self.restStates[multiIndex] = restState
+        return restState
+
+    def lookupCache(self, dataBlock, arrays, values):
+        """
+        Return the cache key and the cached output of these inputs, or
+        (None, None) when the cache is off.
+        """
+        if not dataBlock.inputValue(self.cacheAttr).asBool():
+            self.outputCache.clear()
+            return None, None
+
+        self.outputCache.set_budget(dataBlock.inputValue(self.cacheBudgetAttr).asFloat() * MEGABYTE)
+        key = cache_key(arrays, values)
+        return key, self.outputCache.get(key)
+
+    def setCacheCounters(self, dataBlock):
+        for attr, value in ((self.cacheHitsAttr, self.outputCache.hits),
+                            (self.cacheMissesAttr, self.outputCache.misses),
+                            (self.cacheEvictionsAttr, self.outputCache.evictions)):
+            handle = dataBlock.outputValue(attr)
+            handle.setInt(value)
+            handle.setClean()
+
+    def getInputMesh(self, dataBlock, multiIndex):
+        """Input mesh at multiIndex, read without evaluating it, for deform()."""
+        inputHandle = dataBlock.outputArrayValue(self.input)
+        inputHandle.jumpToLogicalElement(multiIndex)
+        return inputHandle.outputValue().child(self.inputGeom).asMesh()
+
+    def getWeightIndex(self, dataBlock, multiIndex, count):
+        """
+        Return the cached index of the vertices with a non-zero weight times
+        paint map value, rebuilding it when there is none yet or the vertex
+        count changed.
+        """
+        weightIndex = self.weightIndices.get(multiIndex)
+        if weightIndex is None or not weightIndex.matches(count):
+            weightIndex = WeightIndex.from_maps(
+                count, self.getWeights(dataBlock, multiIndex, count), self.getPaintMap(dataBlock, count))
+            self.weightIndices[multiIndex] = weightIndex
+        return weightIndex
+
+    def getPaintMap(self, dataBlock, count):
+        """Paint map as a dense array, or None when nothing is painted."""
+        paintMapHandle = dataBlock.inputArrayValue(self.paintMapAttr)
+        if len(paintMapHandle) == 0:
+            return None
+
+        values = np.zeros(count)
+        for i in range(len(paintMapHandle)):
+            paintMapHandle.jumpToPhysicalElement(i)
+            index = paintMapHandle.elementLogicalIndex()
+            if index < count:
+                values[index] = paintMapHandle.inputValue().asFloat()
+        return values
+
+    def getWeights(self, dataBlock, multiIndex, count):
+        """Painted deformer weights as a dense array, unpainted points weigh 1."""
+        weights = np.ones(count)
+        weightList = dataBlock.inputArrayValue(self.weightList)
+        try:
+            weightList.jumpToLogicalElement(multiIndex)
+        except RuntimeError:
+            return weights
+
+        weightHandle = OpenMaya.MArrayDataHandle(weightList.inputValue().child(self.weights))
+        for i in range(len(weightHandle)):
+            weightHandle.jumpToPhysicalElement(i)
+            index = weightHandle.elementLogicalIndex()
+            if index < count:
+                weights[index] = weightHandle.inputValue().asFloat()
+        return weights
+
+    @staticmethod
+    def toArray(points):
+        """(N, 3) array of an MPointArray, converted in one call."""
+        return np.array(points, dtype=np.float64).reshape(-1, 4)[:, :3]
+
+    @staticmethod
+    def toPointArray(array):
+        return OpenMaya.MPointArray(array.tolist())
 
-        return compressionFactor
-    
     @staticmethod
     def creator():
-        return OpenMayaMPx.asMPxPtr(WrinkleDeformer())
+        return WrinkleDeformer()
 
     @staticmethod
     def initialize():
@@ -102,32 +260,78 @@ class WrinkleDeformer(OpenMayaMPx.MPxDeformerNode):
 
         # Create intensity attribute
         WrinkleDeformer.intensityAttr = nAttr.create("intensity", "int", OpenMaya.MFnNumericData.kFloat, 0.0)
-        nAttr.setKeyable(True)
-        nAttr.setStorable(True)
-        nAttr.setWritable(True)
-        nAttr.setReadable(True)
+        nAttr.keyable = True
+        nAttr.storable = True
+        nAttr.writable = True
+        nAttr.readable = True
         nAttr.setMin(0.0)
         nAttr.setMax(1.0)
         WrinkleDeformer.addAttribute(WrinkleDeformer.intensityAttr)
 
         # Create paint map attribute
         WrinkleDeformer.paintMapAttr = nAttr.create("paintMap", "pm", OpenMaya.MFnNumericData.kFloat, 0.0)
-        nAttr.setArray(True)
-        nAttr.setUsesArrayDataBuilder(True)
+        nAttr.array = True
+        nAttr.usesArrayDataBuilder = True
         WrinkleDeformer.addAttribute(WrinkleDeformer.paintMapAttr)
 
+        # Create batch mode attribute
+        WrinkleDeformer.batchAttr = nAttr.create("batch", "bat", OpenMaya.MFnNumericData.kBoolean, True)
+        nAttr.storable = True
+        WrinkleDeformer.addAttribute(WrinkleDeformer.batchAttr)
+
+        # Create output cache attributes, the cache only serves batch mode
+        WrinkleDeformer.cacheAttr = nAttr.create("cache", "cch", OpenMaya.MFnNumericData.kBoolean, False)
+        nAttr.storable = True
+        WrinkleDeformer.addAttribute(WrinkleDeformer.cacheAttr)
+
+        WrinkleDeformer.cacheBudgetAttr = nAttr.create("cacheBudget", "cbg", OpenMaya.MFnNumericData.kFloat, 256.0)
+        nAttr.storable = True
+        nAttr.setMin(0.0)
+        WrinkleDeformer.addAttribute(WrinkleDeformer.cacheBudgetAttr)
+
+        # Hit, miss and eviction counters, read them with getAttr
+        WrinkleDeformer.cacheHitsAttr = nAttr.create("cacheHits", "chi", OpenMaya.MFnNumericData.kInt, 0)
+        WrinkleDeformer.cacheMissesAttr = nAttr.create("cacheMisses", "cmi", OpenMaya.MFnNumericData.kInt, 0)
+        WrinkleDeformer.cacheEvictionsAttr = nAttr.create("cacheEvictions", "cev", OpenMaya.MFnNumericData.kInt, 0)
+        for attr in (WrinkleDeformer.cacheHitsAttr, WrinkleDeformer.cacheMissesAttr, WrinkleDeformer.cacheEvictionsAttr):
+            nAttr.setObject(attr)
+            nAttr.writable = False
+            nAttr.storable = False
+            WrinkleDeformer.addAttribute(attr)
+
+        # Create rest mesh attribute, compression is measured against it
+        tAttr = OpenMaya.MFnTypedAttribute()
+        WrinkleDeformer.restMeshAttr = tAttr.create("restMesh", "rm", OpenMaya.MFnData.kMesh)
+        tAttr.storable = False
+        WrinkleDeformer.addAttribute(WrinkleDeformer.restMeshAttr)
+
+        # Create the per-vertex compression output, one double array per
+        # input geometry, so other nodes can reuse the map
+        WrinkleDeformer.compressionAttr = tAttr.create("compression", "cmp", OpenMaya.MFnData.kDoubleArray)
+        tAttr.array = True
+        tAttr.usesArrayDataBuilder = True
+        tAttr.writable = False
+        tAttr.storable = False
+        WrinkleDeformer.addAttribute(WrinkleDeformer.compressionAttr)
+
         # Set affects
-        outputGeom = OpenMayaMPx.cvar.MPxGeometryFilter_outputGeom
+        outputGeom = WrinkleDeformer.outputGeom
         WrinkleDeformer.attributeAffects(WrinkleDeformer.intensityAttr, outputGeom)
         WrinkleDeformer.attributeAffects(WrinkleDeformer.paintMapAttr, outputGeom)
+        WrinkleDeformer.attributeAffects(WrinkleDeformer.restMeshAttr, outputGeom)
+        WrinkleDeformer.attributeAffects(WrinkleDeformer.batchAttr, outputGeom)
+        WrinkleDeformer.attributeAffects(WrinkleDeformer.cacheAttr, outputGeom)
+        WrinkleDeformer.attributeAffects(WrinkleDeformer.cacheBudgetAttr, outputGeom)
+        WrinkleDeformer.attributeAffects(WrinkleDeformer.input, WrinkleDeformer.compressionAttr)
+        WrinkleDeformer.attributeAffects(WrinkleDeformer.restMeshAttr, WrinkleDeformer.compressionAttr)
 
 # Initialize the plugin when Maya loads it
 def initializePlugin(obj):
-    plugin = OpenMayaMPx.MFnPlugin(obj, "Your Name", "1.0", "Any")
+    plugin = OpenMaya.MFnPlugin(obj, "Your Name", "1.0", "Any")
     plugin.registerNode(WrinkleDeformer.kPluginNodeName, WrinkleDeformer.kPluginNodeId, 
-                        WrinkleDeformer.creator, WrinkleDeformer.initialize, OpenMayaMPx.MPxNode.kDeformerNode)
+                        WrinkleDeformer.creator, WrinkleDeformer.initialize, OpenMaya.MPxNode.kDeformerNode)
 
 # Uninitialize the plugin when Maya unloads it
 def uninitializePlugin(obj):
-    plugin = OpenMayaMPx.MFnPlugin(obj)
+    plugin = OpenMaya.MFnPlugin(obj)
     plugin.deregisterNode(WrinkleDeformer.kPluginNodeId)